@@ -0,0 +1,3 @@
+"""
+Benchmarks for the document matcher (see run.py)
+"""
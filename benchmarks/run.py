@@ -0,0 +1,303 @@
+"""
+Benchmark Harness - latency, throughput and memory of the main pipeline stages
+
+Stages measured per corpus:
+    load_corpus   - open the corpus and read every text once
+    fit_corpus    - DocumentMatcher.fit_corpus()
+    query_single  - find_similar_documents(), one query at a time
+    query_batch   - find_similar_documents_batch(), batch_size queries at a time
+
+For each stage: p50/p95/p99 latency over its repetitions, throughput
+(documents/sec for load and fit, queries/sec for the query stages) and the
+process's peak RSS once the stage is done. Every corpus runs in a fresh
+process, so peak RSS is per corpus and not left over from the previous one.
+
+Usage (from the repository root):
+    python -m benchmarks.run generate synthetic-10k synthetic-100k synthetic-1m
+    python -m benchmarks.run run reuters synthetic-10k --output benchmarks/baseline.json
+    python -m benchmarks.run run reuters synthetic-10k --output current.json
+    python -m benchmarks.run compare benchmarks/baseline.json current.json --threshold 0.2
+
+compare exits with status 1 when any stage got slower (p50 or p95) or
+bigger (peak RSS) than the baseline by more than the threshold, so it can
+gate a CI job.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import numpy as np
+import scipy
+import sklearn
+
+from benchmarks.synthetic import ensure_corpus
+from src.corpus_loader import CorpusLoader
+from src.document_matcher import DocumentMatcher
+from src.text_store import PackedTextStore
+from src.vocabulary import PROFILES
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# metrics compare() checks; lower is better for all of them
+GATED_METRICS = ("p50_ms", "p95_ms", "peak_rss_mb")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def summarize(latencies: List[float], n_items: int) -> dict:
+    """
+    Latency percentiles and throughput of one stage
+
+    Args:
+        latencies: seconds per repetition
+        n_items: documents or queries handled over all repetitions
+    """
+    latencies_ms = np.array(latencies) * 1000
+    total_seconds = float(np.sum(latencies))
+    return {
+        "runs": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "throughput": n_items / total_seconds if total_seconds > 0 else float("inf"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed(function: Callable, repeat: int) -> List[float]:
+    """Run function repeat times, returning the seconds each run took (its prints are swallowed)"""
+    latencies = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def open_corpus(name: str, data_dir: str):
+    """
+    (texts, doc_ids) of a benchmark corpus
+
+    Reuters goes through CorpusLoader with a packed text store in data_dir;
+    synthetic corpora are opened as text stores directly.
+    """
+    if name == "reuters":
+        loader = CorpusLoader(store_path=os.path.join(data_dir, "reuters"))
+        return loader.load_corpus()
+    store = PackedTextStore(ensure_corpus(name, data_dir))
+    return store, store.doc_ids
+
+
+def bench_corpus(name: str, options: dict) -> dict:
+    """
+    All stages on one corpus (runs inside a fresh worker process)
+
+    Args:
+        name: "reuters" or a synthetic corpus name
+        options: repeat, n_queries, batch_size, engine, storage, data_dir,
+            vocabulary (profile, default full)
+    """
+    data_dir = options["data_dir"]
+    results = {}
+
+    # the corpus (and the packed store behind it) is prepared untimed, so the
+    # first load doesn't measure the one-off NLTK download or text generation
+    with contextlib.redirect_stdout(io.StringIO()):
+        corpus, doc_ids = open_corpus(name, data_dir)
+
+    def load():
+        texts, _ = open_corpus(name, data_dir)
+        for _ in texts:
+            pass
+
+    latencies = timed(load, options["repeat"])
+    results["load_corpus"] = summarize(latencies, len(corpus) * len(latencies))
+
+    matcher = DocumentMatcher(
+        engine=options["engine"], storage=options["storage"], vocabulary=options.get("vocabulary", "full")
+    )
+    latencies = timed(lambda: matcher.fit_corpus(corpus, doc_ids), options["repeat"])
+    results["fit_corpus"] = summarize(latencies, len(corpus) * len(latencies))
+
+    # evenly spaced corpus documents as queries
+    step = max(1, len(corpus) // options["n_queries"])
+    queries = [corpus[i] for i in range(0, len(corpus), step)][:options["n_queries"]]
+    percentile = options["percentile"]
+
+    latencies = []
+    for query in queries:
+        latencies.extend(timed(lambda: matcher.find_similar_documents(query, percentile), 1))
+    results["query_single"] = summarize(latencies, len(queries))
+
+    batch_size = options["batch_size"]
+    latencies = []
+    for start in range(0, len(queries), batch_size):
+        batch = queries[start:start + batch_size]
+        latencies.extend(timed(lambda: list(matcher.find_similar_documents_batch(batch, percentile, batch_size)), 1))
+    results["query_batch"] = summarize(latencies, len(queries))
+
+    matcher.close()
+    return {
+        "n_docs": len(corpus),
+        "n_terms": int(matcher.corpus_vectors.shape[1]),
+        "stages": results,
+    }
+
+
+def run_benchmarks(corpora: List[str], options: dict, isolate: bool = True) -> dict:
+    """
+    Benchmark every corpus and collect the results with environment info
+
+    Args:
+        corpora: corpus names
+        options: see bench_corpus
+        isolate: run each corpus in its own process (for meaningful peak RSS)
+    """
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "sklearn": sklearn.__version__,
+            "options": options,
+        },
+        "corpora": {},
+    }
+    for name in corpora:
+        print(f"Benchmarking {name}...")
+        if isolate:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                result = pool.apply(bench_corpus, (name, options))
+        else:
+            result = bench_corpus(name, options)
+        report["corpora"][name] = result
+        for stage, numbers in result["stages"].items():
+            print(f"  {stage:13s} p50 {numbers['p50_ms']:10.2f} ms | p95 {numbers['p95_ms']:10.2f} ms | "
+                  f"p99 {numbers['p99_ms']:10.2f} ms | {numbers['throughput']:12.1f}/s | "
+                  f"peak RSS {numbers['peak_rss_mb']:8.1f} MB")
+    return report
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """
+    Stage-by-stage comparison of two reports
+
+    Only corpora and stages present in both are compared.
+
+    Args:
+        baseline: report written earlier by run
+        current: new report
+        threshold: allowed relative increase, e.g. 0.2 = 20% slower/bigger
+
+    Returns:
+        one row per (corpus, stage, metric): baseline, current, change, regressed
+    """
+    rows = []
+    for name, base_corpus in baseline["corpora"].items():
+        current_corpus = current["corpora"].get(name)
+        if current_corpus is None:
+            continue
+        for stage, base_numbers in base_corpus["stages"].items():
+            current_numbers = current_corpus["stages"].get(stage)
+            if current_numbers is None:
+                continue
+            for metric in GATED_METRICS:
+                before, after = base_numbers[metric], current_numbers[metric]
+                change = (after - before) / before if before > 0 else 0.0
+                rows.append({
+                    "corpus": name,
+                    "stage": stage,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": change,
+                    "regressed": change > threshold,
+                })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Document matcher benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate synthetic corpora ahead of time")
+    generate.add_argument("corpora", nargs="+", help="e.g. synthetic-10k synthetic-100k synthetic-1m")
+    generate.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+
+    run = commands.add_parser("run", help="benchmark corpora and write a JSON report")
+    run.add_argument("corpora", nargs="+", help="reuters and/or synthetic corpus names")
+    run.add_argument("--output", required=True, help="JSON report path")
+    run.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    run.add_argument("--repeat", type=int, default=3, help="repetitions of load and fit (default: 3)")
+    run.add_argument("--queries", type=int, default=200, help="queries per query stage (default: 200)")
+    run.add_argument("--batch-size", type=int, default=64, help="queries per batch (default: 64)")
+    run.add_argument("--percentile", type=float, default=90.0, help="query percentile (default: 90)")
+    run.add_argument("--engine", choices=DocumentMatcher.ENGINES, default="matmul")
+    run.add_argument("--storage", choices=("float64", "float32", "int8"), default="float64")
+    run.add_argument("--vocabulary", choices=tuple(PROFILES), default="full")
+
+    compare = commands.add_parser("compare", help="fail if a report regressed against a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.2,
+                         help="allowed relative increase per metric (default: 0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        for name in args.corpora:
+            print(ensure_corpus(name, args.data_dir))
+        return 0
+
+    if args.command == "run":
+        options = {
+            "repeat": args.repeat,
+            "n_queries": args.queries,
+            "batch_size": args.batch_size,
+            "percentile": args.percentile,
+            "engine": args.engine,
+            "storage": args.storage,
+            "vocabulary": args.vocabulary,
+            "data_dir": args.data_dir,
+        }
+        report = run_benchmarks(args.corpora, options)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    rows = compare_reports(baseline, current, args.threshold)
+    for row in rows:
+        flag = "REGRESSED" if row["regressed"] else "ok"
+        print(f"{row['corpus']:16s} {row['stage']:13s} {row['metric']:12s} "
+              f"{row['baseline']:10.2f} -> {row['current']:10.2f} ({row['change']:+7.1%}) {flag}")
+    regressions = [row for row in rows if row["regressed"]]
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}" if regressions
+          else f"\nNo regressions beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
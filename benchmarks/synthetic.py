@@ -0,0 +1,127 @@
+"""
+Synthetic Corpora - Reuters-like text at any scale, generated offline
+
+Word frequencies follow a Zipf law (a few very common words, a long tail
+of rare ones) like real text. Each document also has a topic, and a
+share of its words comes from that topic's own vocabulary, so documents
+on the same topic really are more similar to each other. Document lengths
+are log-normal, around 130 words on average like Reuters.
+
+Generation only uses a seeded NumPy RNG, so the same (n_docs, seed) always
+gives the same corpus and nothing is downloaded. Corpora are written as a
+packed text store (src/text_store.py), streamed chunk by chunk, so even
+the 1M-document corpus never has to be in memory as a whole.
+"""
+
+import os
+import string
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from src.text_store import build_text_store, read_store_meta
+
+# the standard scaling ladder; any "synthetic-<n>[k|m]" name works, see corpus_size()
+SIZES = {
+    "synthetic-10k": 10_000,
+    "synthetic-100k": 100_000,
+    "synthetic-1m": 1_000_000,
+}
+
+VOCABULARY_SIZE = 50_000
+N_TOPICS = 200
+TOPIC_WORDS = 400
+TOPIC_SHARE = 0.3   # fraction of a document's words drawn from its topic
+
+
+def make_vocabulary(size: int) -> List[str]:
+    """Distinct lowercase pseudo-words (2+ letters, so the default tokenizer keeps them)"""
+    letters = string.ascii_lowercase
+    words = []
+    for i in range(size):
+        word = ""
+        n = i + 26  # start at two letters
+        while n:
+            n, digit = divmod(n, 26)
+            word = letters[digit] + word
+        words.append(word)
+    return words
+
+
+def synthetic_documents(
+    n_docs: int,
+    seed: int = 0,
+    chunk_size: int = 10_000
+) -> Iterator[Tuple[str, str]]:
+    """
+    Generate (doc_id, text) pairs
+
+    Args:
+        n_docs: number of documents
+        seed: RNG seed (same seed, same corpus)
+        chunk_size: documents generated per vectorized step
+
+    Yields:
+        (doc_id, text), doc IDs look like "synthetic/000042"
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(VOCABULARY_SIZE))
+
+    # Zipf-Mandelbrot word frequencies, sampled by inverse CDF
+    ranks = np.arange(1, VOCABULARY_SIZE + 1)
+    weights = 1.0 / (ranks + 2.7) ** 1.07
+    cdf = np.cumsum(weights / weights.sum())
+
+    # topic vocabularies lean towards the mid/rare range, where words are informative
+    topics = rng.integers(200, VOCABULARY_SIZE, size=(N_TOPICS, TOPIC_WORDS))
+
+    width = len(str(n_docs - 1))
+    for start in range(0, n_docs, chunk_size):
+        count = min(chunk_size, n_docs - start)
+        lengths = np.maximum(rng.lognormal(mean=4.7, sigma=0.6, size=count).astype(np.int64), 5)
+        total = int(lengths.sum())
+
+        doc_topic = np.repeat(rng.integers(0, N_TOPICS, size=count), lengths)
+        word_ids = np.searchsorted(cdf, rng.random(total))
+        from_topic = rng.random(total) < TOPIC_SHARE
+        word_ids[from_topic] = topics[doc_topic[from_topic], rng.integers(0, TOPIC_WORDS, size=int(from_topic.sum()))]
+        words = vocabulary[np.minimum(word_ids, VOCABULARY_SIZE - 1)].tolist()
+
+        position = 0
+        for i, length in enumerate(lengths.tolist()):
+            yield f"synthetic/{start + i:0{width}d}", " ".join(words[position:position + length])
+            position += length
+
+
+def corpus_size(name: str) -> int:
+    """Number of documents for a synthetic corpus name, e.g. synthetic-10k or synthetic-2500"""
+    if name in SIZES:
+        return SIZES[name]
+    prefix, _, size = name.partition("-")
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(size[-1:].lower(), 1)
+    digits = size[:-1] if multiplier > 1 else size
+    if prefix != "synthetic" or not digits.isdigit() or int(digits) == 0:
+        raise ValueError(f"Unknown synthetic corpus '{name}', expected e.g. {sorted(SIZES)}")
+    return int(digits) * multiplier
+
+
+def ensure_corpus(name: str, data_dir: str, seed: int = 0) -> str:
+    """
+    Path of the packed text store for a synthetic corpus, generating it if missing
+
+    Args:
+        name: synthetic corpus name (see corpus_size)
+        data_dir: directory holding the generated corpora
+        seed: RNG seed
+
+    Returns:
+        text store directory
+    """
+    n_docs = corpus_size(name)
+    path = os.path.join(data_dir, name)
+    source = f"synthetic:n={n_docs}:seed={seed}"
+    meta = read_store_meta(path)
+    if meta is None or meta.get("source") != source:
+        print(f"Generating {name} ({n_docs} documents) in {path}...")
+        build_text_store(path, synthetic_documents(n_docs, seed), source=source)
+    return path
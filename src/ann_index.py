@@ -0,0 +1,214 @@
+"""
+ANN Index - approximate nearest-neighbor search for top-k queries
+
+Exact scoring touches every document (matmul) or every posting of the
+query's terms (postings), so it grows with the corpus. For very large
+corpora, this index narrows the search down first:
+
+1. Truncated SVD projects every TF-IDF row to a short dense vector
+   (LSA, n_components dimensions), normalized so dot product = cosine.
+2. k-means splits the projected documents into n_lists clusters and keeps
+   one inverted list of documents per cluster (an "IVF" index).
+3. A query is projected the same way, the n_probe clusters whose centroids
+   are closest to it are picked, and only their documents become candidates.
+4. The candidates are re-ranked exactly against their real TF-IDF rows, so
+   every returned score is the true cosine similarity. Only whether a
+   document made it into the candidates is approximate.
+
+n_probe is the recall/latency knob and can be set per query: more lists
+probed = more candidates = higher recall, slower. Probing every list gives
+the exact answer. recall_at_k() measures the trade-off against the exact engine.
+
+Percentile thresholds need the similarity of every document, so this index
+only answers top-k queries.
+"""
+
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+try:
+    from .quantized import QuantizedCSR, score_matrix
+    from .selection import select_top
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from quantized import QuantizedCSR, score_matrix
+    from selection import select_top
+
+
+class ANNIndex:
+    """
+    SVD projection + inverted lists over k-means clusters
+
+    Attributes:
+        svd: fitted TruncatedSVD (TF-IDF space -> n_components dims)
+        centroids: (n_lists x n_components) unit-length cluster centers
+        list_indptr: documents of list c are list_docs[list_indptr[c]:list_indptr[c+1]]
+        list_docs: document rows grouped by cluster, ascending within each list
+        n_docs: number of indexed documents
+    """
+
+    def __init__(
+        self,
+        corpus_vectors,
+        n_components: int = 128,
+        n_lists: Optional[int] = None,
+        random_state: int = 0
+    ):
+        """
+        Args:
+            corpus_vectors: fitted (n_docs x n_terms) TF-IDF matrix
+            n_components: dimensions of the SVD projection
+            n_lists: number of clusters (default: about sqrt(n_docs))
+            random_state: seed for SVD and k-means, builds are reproducible
+        """
+        n_docs, n_terms = corpus_vectors.shape
+        # SVD needs fewer components than either side of the matrix
+        n_components = max(1, min(n_components, n_docs - 1, n_terms - 1))
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_docs))
+        n_lists = max(1, min(n_lists, n_docs))
+
+        self.svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+        projected = self._normalize(self.svd.fit_transform(corpus_vectors))
+
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_lists,
+            random_state=random_state,
+            n_init=3,
+            batch_size=max(1024, 4 * n_lists)
+        )
+        labels = kmeans.fit_predict(projected)
+        self.centroids = self._normalize(kmeans.cluster_centers_)
+
+        # stable sort keeps documents ascending inside each list
+        self.list_docs = np.argsort(labels, kind="stable")
+        self.list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=self.list_indptr[1:])
+        self.n_docs = n_docs
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Unit-length float32 rows (zero rows stay zero)"""
+        return normalize(vectors).astype(np.float32)
+
+    def candidates(self, query_vector, n_probe: int) -> np.ndarray:
+        """
+        Documents in the n_probe lists closest to the query
+
+        Args:
+            query_vector: 1 x n_terms TF-IDF vector
+            n_probe: number of lists to scan
+
+        Returns:
+            candidate document rows, ascending
+        """
+        n_probe = max(1, min(n_probe, self.n_lists))
+        projected = self._normalize(self.svd.transform(query_vector))[0]
+        closeness = self.centroids @ projected
+        if n_probe < self.n_lists:
+            probed = np.argpartition(-closeness, n_probe - 1)[:n_probe]
+        else:
+            probed = np.arange(self.n_lists)
+
+        lists = [self.list_docs[self.list_indptr[c]:self.list_indptr[c + 1]] for c in probed.tolist()]
+        return np.sort(np.concatenate(lists))
+
+    def search(self, corpus_vectors, query_vector, top_k: int, n_probe: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Approximate top-k with exact re-ranking
+
+        Args:
+            corpus_vectors: the TF-IDF matrix this index was built from
+                (any storage mode, see quantized.py)
+            query_vector: 1 x n_terms TF-IDF vector
+            top_k: number of results
+            n_probe: number of lists to scan
+
+        Returns:
+            (indices, scores, n_candidates) - the best top_k candidates with a
+            nonzero similarity, best first, scored exactly
+        """
+        rows = self.candidates(query_vector, n_probe)
+        # same product as the exact engine, restricted to the candidate rows
+        if isinstance(corpus_vectors, QuantizedCSR):
+            scores = corpus_vectors.score_rows(rows, query_vector)
+        else:
+            scores = score_matrix(corpus_vectors[rows], query_vector)[0]
+        positive = scores > 0
+        indices, scores = select_top(scores[positive], 0.0, top_k, indices=rows[positive])
+        return indices, scores, len(rows)
+
+
+def recall_at_k(
+    matcher,
+    queries: Sequence[str],
+    k: int = 10,
+    n_probes: Sequence[int] = (1, 2, 4, 8, 16)
+) -> List[dict]:
+    """
+    Recall@k of the ANN index against the exact engine, per n_probe
+
+    Recall is the fraction of the exact top-k (documents with a nonzero
+    similarity) that the approximate search also returns, averaged over queries.
+
+    Args:
+        matcher: fitted DocumentMatcher
+        queries: query texts
+        k: result size
+        n_probes: n_probe values to measure
+
+    Returns:
+        one dict per n_probe: n_probe, recall, mean_candidates, mean_ms,
+        plus exact_ms (mean latency of the exact engine) for reference
+    """
+    start = time.perf_counter()
+    exact = [
+        set(results.indices[results.scores > 0].tolist())
+        for results in matcher.find_matches_batch(queries, 0, top_k=k, batch_size=1)
+    ]
+    exact_ms = 1000 * (time.perf_counter() - start) / max(len(queries), 1)
+
+    report = []
+    for n_probe in n_probes:
+        recalls = []
+        candidates = []
+        start = time.perf_counter()
+        for query, expected in zip(queries, exact):
+            results = matcher.find_matches_approx(query, top_k=k, n_probe=n_probe)
+            candidates.append(results.stats.get("candidates", 0))
+            if expected:
+                recalls.append(len(expected.intersection(results.indices.tolist())) / len(expected))
+        elapsed = time.perf_counter() - start
+
+        report.append({
+            "n_probe": n_probe,
+            "recall": float(np.mean(recalls)) if recalls else 1.0,
+            "mean_candidates": float(np.mean(candidates)) if candidates else 0.0,
+            "mean_ms": 1000 * elapsed / max(len(queries), 1),
+            "exact_ms": exact_ms,
+        })
+    return report
+
+
+def format_recall_report(report: List[dict], k: int) -> str:
+    """Recall@k report as a printable table"""
+    lines = [
+        f"{'n_probe':>8} | {'recall@' + str(k):>9} | {'candidates':>10} | {'ms/query':>8}",
+        "-" * 46,
+    ]
+    for row in report:
+        lines.append(
+            f"{row['n_probe']:>8} | {row['recall']:>9.3f} | {row['mean_candidates']:>10.1f} | {row['mean_ms']:>8.3f}"
+        )
+    if report:
+        lines.append(f"exact engine: {report[0]['exact_ms']:.3f} ms/query")
+    return "\n".join(lines)
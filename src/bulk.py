@@ -0,0 +1,159 @@
+"""
+Bulk Queries - run many queries non-interactively and stream the results
+
+Queries come from either
+    - a directory of .txt files (one query per file, ID = file name), or
+    - a JSONL file, one {"id": ..., "text": ...} object per line
+      ("percentile" and "top_k" may be given per line to override the defaults)
+
+They are read lazily and scored in batches through
+DocumentMatcher.find_matches_batch(), and each batch's results are written
+and flushed before the next batch is read. Memory use stays bounded by one
+batch no matter how many queries there are, and partial results are on
+disk while the run is still going.
+
+Output formats:
+    jsonl - one line per query: {"query_id", "threshold", "count", "matches": [[doc_id, score], ...]}
+    csv   - one row per match:   query_id, rank, doc_id, similarity
+"""
+
+import csv
+import itertools
+import json
+import os
+import time
+from typing import Iterator, Optional, Tuple
+
+try:
+    from .result_output import output_format
+    from .selection import check_query_options
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from result_output import output_format
+    from selection import check_query_options
+
+# formats of a bulk run's output (one line per query or one row per match,
+# unlike result_output's per-match formats of a single result)
+BULK_FORMATS = ("jsonl", "csv")
+
+
+def iter_queries(source: str) -> Iterator[Tuple[str, str, Optional[float], Optional[int]]]:
+    """
+    Read queries lazily from a directory of .txt files or a JSONL file
+
+    Args:
+        source: directory path or .jsonl file path
+
+    Yields:
+        (query_id, text, percentile, top_k) - percentile/top_k are None
+        unless the JSONL line sets them
+    """
+    if os.path.isdir(source):
+        # sorted so runs are reproducible
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if name.endswith(".txt") and os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    yield name, f.read(), None, None
+        return
+
+    with open(source, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{source}:{line_number}: invalid JSON ({e})")
+            if not isinstance(query, dict) or not isinstance(query.get("text"), str):
+                raise ValueError(f"{source}:{line_number}: expected an object with a 'text' string")
+
+            # same rules as the server's /query, checked here so a bad line
+            # is reported with its line number instead of failing mid-batch
+            percentile = query.get("percentile")
+            if percentile is not None:
+                try:
+                    percentile = float(percentile)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{source}:{line_number}: 'percentile' must be a number")
+                if not 0 <= percentile <= 100:
+                    raise ValueError(f"{source}:{line_number}: 'percentile' must be between 0 and 100")
+            top_k = query.get("top_k")
+            if top_k is not None and (not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1):
+                raise ValueError(f"{source}:{line_number}: 'top_k' must be a positive integer")
+
+            yield str(query.get("id", line_number)), query["text"], percentile, top_k
+
+
+def run_bulk(
+    matcher,
+    source: str,
+    output_path: str,
+    percentile: float,
+    top_k: Optional[int] = None,
+    batch_size: int = 256,
+    fmt: Optional[str] = None
+) -> dict:
+    """
+    Score every query from source and stream the results to output_path
+
+    Args:
+        matcher: fitted DocumentMatcher
+        source: directory of .txt files or JSONL file (see iter_queries)
+        output_path: results file, written incrementally
+        percentile: default percentile threshold (0-100)
+        top_k: default cap on matches per query (None = all above the threshold)
+        batch_size: queries scored together (also the flush interval)
+        fmt: "jsonl" or "csv" (default: from the output file extension)
+
+    Returns:
+        run summary: queries, matches, seconds, queries_per_sec
+    """
+    fmt = output_format(output_path, fmt, BULK_FORMATS, default="jsonl")
+    # the defaults are checked before the output file is created
+    check_query_options(percentile, top_k)
+    queries = iter_queries(source)
+    n_queries = 0
+    n_matches = 0
+    start = time.perf_counter()
+
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer is not None:
+            writer.writerow(["query_id", "rank", "doc_id", "similarity"])
+
+        while True:
+            batch = list(itertools.islice(queries, batch_size))
+            if not batch:
+                break
+            query_ids, texts, percentiles, top_ks = zip(*batch)
+            percentiles = [percentile if p is None else p for p in percentiles]
+            top_ks = [top_k if k is None else k for k in top_ks]
+
+            # scored first (one batch is bounded), so the output timer only covers writing
+            results = list(matcher.find_matches_batch(texts, percentiles, top_ks, batch_size=batch_size))
+            with matcher.recorder.timer("output"):
+                for query_id, result in zip(query_ids, results):
+                    if writer is not None:
+                        for rank, (doc_id, score) in enumerate(result, 1):
+                            writer.writerow([query_id, rank, doc_id, f"{score:.6f}"])
+                    else:
+                        f.write(json.dumps({
+                            "query_id": query_id,
+                            "threshold": result.threshold,
+                            "count": len(result),
+                            "matches": [[doc_id, score] for doc_id, score in result],
+                        }) + "\n")
+                    n_matches += len(result)
+
+                # results of every finished batch are on disk before the next one is read
+                f.flush()
+            n_queries += len(batch)
+
+    seconds = time.perf_counter() - start
+    return {
+        "queries": n_queries,
+        "matches": n_matches,
+        "seconds": seconds,
+        "queries_per_sec": n_queries / seconds if seconds > 0 else float("inf"),
+    }
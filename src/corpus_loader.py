@@ -6,10 +6,74 @@ Reuters is a collection of about 10,788 news articles from 1987
 It's got financial news which works well for testing similarity.
 
 --no preprocessing
+
+With a store_path, the texts are also packed into one memory-mapped file
+the first time (see text_store.py). Later loads and lookups read from that
+file instead of going through NLTK's reader one document at a time.
+
+NLTK itself is only imported when the texts actually have to come from it
+(importing it takes about a second). Whether the corpus is already
+downloaded is checked by looking for it on disk, see reuters_available().
 """
 
-import nltk
-from typing import List, Tuple
+import logging
+import os
+import sys
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from .text_store import PackedTextStore, build_text_store, read_store_meta
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from text_store import PackedTextStore, build_text_store, read_store_meta
+
+# label stored with the packed texts, so a store built from something else isn't picked up
+STORE_SOURCE = "nltk:reuters"
+
+logger = logging.getLogger(__name__)
+
+
+def nltk_data_dirs() -> List[str]:
+    """
+    NLTK's default data search path, worked out without importing NLTK
+
+    Same directories, in the same order, as nltk.data.path on a fresh import.
+    """
+    dirs = [os.path.expanduser(d) for d in os.environ.get("NLTK_DATA", "").split(os.pathsep) if d]
+    if "APPENGINE_RUNTIME" not in os.environ and os.path.expanduser("~/") != "~/":
+        dirs.append(os.path.expanduser("~/nltk_data"))
+
+    if sys.platform.startswith("win"):
+        dirs += [
+            os.path.join(sys.prefix, "nltk_data"),
+            os.path.join(sys.prefix, "share", "nltk_data"),
+            os.path.join(sys.prefix, "lib", "nltk_data"),
+            os.path.join(os.environ.get("APPDATA", "C:\\"), "nltk_data"),
+            r"C:\nltk_data",
+            r"D:\nltk_data",
+            r"E:\nltk_data",
+        ]
+    else:
+        dirs += [
+            os.path.join(sys.prefix, "nltk_data"),
+            os.path.join(sys.prefix, "share", "nltk_data"),
+            os.path.join(sys.prefix, "lib", "nltk_data"),
+            "/usr/share/nltk_data",
+            "/usr/local/share/nltk_data",
+            "/usr/lib/nltk_data",
+            "/usr/local/lib/nltk_data",
+        ]
+    return dirs
+
+
+def reuters_available() -> bool:
+    """True if the Reuters corpus is already downloaded (unzipped or as the zip NLTK reads directly)"""
+    for data_dir in nltk_data_dirs():
+        corpora = os.path.join(data_dir, "corpora")
+        if os.path.isdir(os.path.join(corpora, "reuters")) or os.path.isfile(os.path.join(corpora, "reuters.zip")):
+            return True
+    return False
 
 
 class CorpusLoader:
@@ -24,10 +88,17 @@ class CorpusLoader:
     The corpus and doc_ids get set when load_corpus() is called
     """
 
-    def __init__(self):
-        """Initialize with empty values - actual loading happens in load_corpus()"""
+    def __init__(self, store_path: Optional[str] = None):
+        """
+        Initialize with empty values - actual loading happens in load_corpus()
+
+        Args:
+            store_path: directory for the packed text store (None = always read through NLTK)
+        """
         self.corpus = None      # will hold the document texts
         self.doc_ids = None     # will hold document identifiers
+        self.store_path = store_path
+        self.store = None       # PackedTextStore once opened
 
     def download_reuters(self):
         """
@@ -38,11 +109,42 @@ class CorpusLoader:
 
         Put this in a separate method so it's not cluttering up load_corpus()
         """
-        # nltk.download() already checks if the corpus is present
-        # and skips the download if so, no manual check needed
+        # nltk.download() checks for the corpus itself, but only after NLTK is
+        # imported and its package index consulted - a directory probe is enough
+        if reuters_available():
+            return
+        import nltk
         nltk.download('reuters', quiet=True)
 
-    def load_corpus(self) -> Tuple[List[str], List[str]]:
+    def open_store(self, rebuild: bool = False) -> Optional[PackedTextStore]:
+        """
+        Open the packed text store, building it from NLTK first if needed
+
+        Args:
+            rebuild: rewrite the store even if a valid one exists
+
+        Returns:
+            the store, or None if no store_path was given
+        """
+        if self.store_path is None:
+            return None
+        if self.store is not None and not rebuild:
+            return self.store
+
+        meta = read_store_meta(self.store_path)
+        if rebuild or meta is None or meta.get("source") != STORE_SOURCE:
+            logger.info("Packing Reuters texts into a single file (first run only)...")
+            self.download_reuters()
+            from nltk.corpus import reuters
+            documents = ((doc_id, reuters.raw(doc_id)) for doc_id in reuters.fileids())
+            build_text_store(self.store_path, documents, source=STORE_SOURCE)
+
+        if self.store is not None:
+            self.store.close()
+        self.store = PackedTextStore(self.store_path)
+        return self.store
+
+    def load_corpus(self) -> Tuple[Sequence[str], List[str]]:
         """
         Main loading method - gets all Reuters documents
 
@@ -56,7 +158,17 @@ class CorpusLoader:
             (documents, doc_ids) - two lists with the texts and their IDs
 
         Important: using reuters.raw() which gives the complete unprocessed text.
+
+        With a store_path the documents come back as a PackedTextStore
+        (read-only, list-like, memory-mapped) instead of a list, so the texts
+        are only read from disk when something looks at them.
         """
+        store = self.open_store()
+        if store is not None:
+            self.corpus, self.doc_ids = store, store.doc_ids
+            logger.info(f"Loaded {len(self.corpus)} documents from Reuters corpus (packed text store)")
+            return self.corpus, self.doc_ids
+
         # first make sure we have the data
         self.download_reuters()
 
@@ -71,10 +183,42 @@ class CorpusLoader:
         # using list comprehension here to do it in one line
         self.corpus = [reuters.raw(doc_id) for doc_id in self.doc_ids]
 
-        print(f"Loaded {len(self.corpus)} documents from Reuters corpus")
+        logger.info(f"Loaded {len(self.corpus)} documents from Reuters corpus")
 
         return self.corpus, self.doc_ids
 
+    def iter_corpus(self, chunk_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        """
+        Stream the corpus in chunks instead of loading it all at once
+
+        Same documents and order as load_corpus(), but only one chunk of raw
+        text is in memory at a time, and nothing is kept on the loader.
+        Each call starts a fresh pass over the corpus, so it can be handed
+        to DocumentMatcher.fit_corpus_streaming() which reads it twice.
+
+        Args:
+            chunk_size: documents per chunk
+
+        Yields:
+            lists of (doc_id, text) tuples, at most chunk_size long
+        """
+        store = self.open_store()
+        if store is not None:
+            yield from store.iter_chunks(chunk_size)
+            return
+
+        self.download_reuters()
+        from nltk.corpus import reuters
+
+        chunk = []
+        for doc_id in reuters.fileids():
+            chunk.append((doc_id, reuters.raw(doc_id)))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
     def get_document_by_id(self, doc_id: str) -> str:
         """
         Get a specific document by its ID
@@ -88,5 +232,9 @@ class CorpusLoader:
         Returns:
             the full text of that document
         """
+        store = self.open_store()
+        if store is not None:
+            return store.get(doc_id)
+
         from nltk.corpus import reuters
         return reuters.raw(doc_id)
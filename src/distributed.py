@@ -0,0 +1,402 @@
+"""
+Distributed Mode - scatter-gather over shard nodes with one global IDF
+
+Sharding the corpus naively (one DocumentMatcher per part) doesn't work:
+each part would compute IDF over its own documents, so the same term gets
+a different weight on every shard and the scores can't be compared. Here
+the shards only hold their rows; IDF and the percentile threshold are
+computed over the whole corpus by a coordinator:
+
+    coordinator                                shard nodes
+    fit()      "document_frequencies"  --->    terms + DF of their documents
+               add up -> global IDF
+               "set_idf" (terms, IDF)  --->    vectorize their rows with it
+    query      "score" (text, m)       --->    score their rows, send back
+                                               their m best scores
+               exact threshold from the merged tops
+               "select" (threshold)    --->    their rows >= threshold
+               merge: by score, ties in global row order
+
+m is percentile_support(N, percentile): the percentile of all N scores only
+depends on the global top m, and those are always within the shards' own
+top m. So the threshold is exactly np.percentile over every score in the
+corpus, and results are exactly what one matcher over the whole corpus
+(with the same vectors) returns, while only O(m + matches) scores travel.
+
+m grows with the corpus (half of it at the 50th percentile). A coordinator
+created with threshold_error has the nodes send a QuantileSketch of their
+scores instead (see quantile_sketch.py): the sketches merge into one for
+the whole corpus, so round 1 is a few KB per node whatever the corpus
+size, and the threshold is within threshold_error * N ranks of the exact one.
+
+Nodes talk multiprocessing.connection (pickled messages over TCP with an
+auth key), so they can run on other machines; serve_node() is the whole
+node program. LocalCluster starts nodes as local processes, which is what
+the tests use.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .document_matcher import DocumentMatcher
+    from .instrumentation import NULL_RECORDER
+    from .match_results import MatchResults
+    from .quantile_sketch import QuantileSketch
+    from .selection import check_query_options, percentile_support, sorted_percentile
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from document_matcher import DocumentMatcher
+    from instrumentation import NULL_RECORDER
+    from match_results import MatchResults
+    from quantile_sketch import QuantileSketch
+    from selection import check_query_options, percentile_support, sorted_percentile
+
+logger = logging.getLogger(__name__)
+
+
+class ShardNode:
+    """
+    State and request handlers of one shard node
+
+    Holds a DocumentMatcher over its part of the corpus. Every request is
+    a (command, kwargs) message handled by the method of the same name.
+    """
+
+    COMMANDS = ("load", "document_frequencies", "set_idf", "score", "select")
+
+    def __init__(self, corpus: Sequence[str] = (), doc_ids: Sequence[str] = (), **matcher_options):
+        """
+        Args:
+            corpus: this node's document texts (or send them later with load)
+            doc_ids: their IDs
+            matcher_options: DocumentMatcher arguments (engine, storage, ...)
+        """
+        self.load(corpus, doc_ids, **matcher_options)
+
+    def load(self, corpus: Sequence[str], doc_ids: Sequence[str], **matcher_options) -> int:
+        """Replace this node's documents (vectorized on the next set_idf)"""
+        if len(corpus) != len(doc_ids):
+            raise ValueError("corpus and doc_ids must have the same length")
+        self.corpus = list(corpus)
+        self.doc_ids = list(doc_ids)
+        self.matcher = DocumentMatcher(**matcher_options)
+        self._pending = {}   # query_id -> similarity distribution waiting for its threshold
+        return len(self.corpus)
+
+    def document_frequencies(self) -> dict:
+        """Vocabulary, DF and term counts of this node's documents, plus their IDs"""
+        terms, df, tf = self.matcher.count_document_frequencies(self.corpus)
+        return {"terms": terms, "df": df, "tf": tf, "doc_ids": self.doc_ids}
+
+    def set_idf(self, terms: List[str], idf: np.ndarray) -> int:
+        """Vectorize this node's documents with the global vocabulary and IDF"""
+        self.matcher.fit_corpus_with_idf(self.corpus, self.doc_ids, terms, idf)
+        self._pending.clear()
+        return len(self.corpus)
+
+    def score(self, query_id: int, query: str, top: int = 0, sketch_error: Optional[float] = None) -> dict:
+        """
+        Score a query against this node's rows (first round)
+
+        The full distribution is kept for select(); only its top scores go
+        back, or with sketch_error a QuantileSketch of all of them.
+
+        Returns:
+            {"scores": up to top nonzero scores (float64, descending),
+             "sketch": the sketch (only with sketch_error),
+             "nonzero": number of rows with a nonzero score,
+             "empty": True if the query shares no term with the vocabulary}
+        """
+        distribution = self.matcher.similarity_distribution(query)
+        if distribution is None:
+            return {"scores": np.zeros(0), "nonzero": 0, "empty": True}
+        # a coordinator asks one query at a time, so only the latest one is kept
+        # (nothing piles up when a query fails halfway)
+        self._pending = {query_id: distribution}
+        reply = {"scores": distribution.scores[:top], "nonzero": len(distribution.scores), "empty": False}
+        if sketch_error is not None:
+            sketch = QuantileSketch(sketch_error, seed=query_id)
+            sketch.update(distribution.scores)
+            sketch.update_repeated(0.0, distribution.n_zeros)
+            reply["sketch"] = sketch
+        return reply
+
+    def select(self, query_id: int, threshold: float, top_k: Optional[int]) -> dict:
+        """Rows scoring >= threshold for a scored query (second round), best first"""
+        distribution = self._pending.pop(query_id)
+        rows, scores = self.matcher.select_from_distribution(distribution, threshold, top_k)
+        return {"rows": rows, "scores": scores}
+
+
+def _serve_connection(node: ShardNode, conn) -> bool:
+    """Answer one coordinator's requests; False once it asked the node to shut down"""
+    while True:
+        try:
+            command, kwargs = conn.recv()
+        except (EOFError, ConnectionError):
+            # the coordinator went away, wait for the next one
+            return True
+        if command == "shutdown":
+            conn.send(("ok", None))
+            return False
+        try:
+            if command not in ShardNode.COMMANDS:
+                raise ValueError(f"Unknown command '{command}'")
+            conn.send(("ok", getattr(node, command)(**kwargs)))
+        except Exception as e:
+            # report it to the coordinator instead of taking the node down
+            logger.exception(f"Request '{command}' failed")
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def serve_node(address: Tuple[str, int], authkey: bytes, node: Optional[ShardNode] = None, ready=None):
+    """
+    Run a shard node until a coordinator sends "shutdown"
+
+    Coordinators are served one connection at a time, each until it disconnects.
+
+    Args:
+        address: (host, port) to listen on (port 0 = any free port)
+        authkey: shared secret; connections without it are refused
+        node: node state (default: an empty ShardNode, documents come with "load")
+        ready: optional connection the actual listening address is sent to
+    """
+    node = node if node is not None else ShardNode()
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"Shard node listening on {listener.address}")
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        while True:
+            with listener.accept() as conn:
+                if not _serve_connection(node, conn):
+                    return
+
+
+class LocalCluster:
+    """
+    Shard nodes running as local processes, standing in for separate machines
+
+    Usage:
+        with LocalCluster(4) as cluster:
+            coordinator = Coordinator(cluster.addresses, cluster.authkey)
+            ...
+    """
+
+    def __init__(self, n_nodes: int, host: str = "127.0.0.1"):
+        """
+        Args:
+            n_nodes: number of node processes
+            host: interface they listen on
+        """
+        self.authkey = os.urandom(16)
+        self.addresses = []
+        self._processes = []
+        for _ in range(n_nodes):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=serve_node, args=((host, 0), self.authkey, None, sender), daemon=True
+            )
+            process.start()
+            sender.close()
+            self.addresses.append(receiver.recv())
+            receiver.close()
+            self._processes.append(process)
+
+    def close(self):
+        """Stop every node process"""
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def __enter__(self) -> "LocalCluster":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Coordinator:
+    """
+    Front end of a distributed index: global IDF, exact thresholds, merged results
+
+    Usage:
+        coordinator = Coordinator(addresses, authkey)
+        coordinator.load(corpus, doc_ids)    # or start the nodes with their documents
+        coordinator.fit()
+        results = coordinator.find_matches("oil prices", 90)
+    """
+
+    def __init__(
+        self,
+        addresses: Sequence[Tuple[str, int]],
+        authkey: bytes,
+        threshold_error: Optional[float] = None,
+        recorder=None
+    ):
+        """
+        Args:
+            addresses: (host, port) of every shard node, in corpus order
+            authkey: the nodes' shared secret
+            threshold_error: merge quantile sketches from the nodes instead of
+                their top scores, with this rank error (fraction of the corpus);
+                None = exact thresholds
+            recorder: instrumentation.MetricsRecorder (default: records nothing)
+        """
+        self.addresses = list(addresses)
+        self.threshold_error = threshold_error
+        self.recorder = recorder if recorder is not None else NULL_RECORDER
+        self._connections = [Client(address, authkey=authkey) for address in self.addresses]
+        self._query_ids = itertools.count()
+        self.doc_ids = None      # all doc IDs, shard by shard
+        self.offsets = None      # first global row of every shard
+        self.terms = None        # global vocabulary
+        self.idf = None          # global IDF, one per term
+        self._matcher_options = {}  # what the nodes' matchers were created with
+
+    def _call_all(self, command: str, per_node: Optional[List[dict]] = None, **kwargs) -> list:
+        """
+        Send one request to every node, then collect the replies
+
+        All requests go out before any reply is read, so the nodes work in parallel.
+
+        Args:
+            command: ShardNode method to run
+            per_node: optional kwargs per node, merged over kwargs
+        """
+        for i, conn in enumerate(self._connections):
+            conn.send((command, dict(kwargs, **(per_node[i] if per_node else {}))))
+        # read every reply before raising, so no connection is left out of step
+        replies = [conn.recv() for conn in self._connections]
+        for address, (status, value) in zip(self.addresses, replies):
+            if status != "ok":
+                raise RuntimeError(f"Shard node {address} failed '{command}': {value}")
+        return [value for _, value in replies]
+
+    def load(self, corpus: Sequence[str], doc_ids: Sequence[str], **matcher_options):
+        """
+        Split a corpus into contiguous parts, one per node, and send them over
+
+        Args:
+            corpus: document texts
+            doc_ids: their IDs
+            matcher_options: DocumentMatcher arguments for the nodes (engine, storage, ...)
+        """
+        bounds = np.linspace(0, len(corpus), len(self._connections) + 1).astype(int)
+        parts = [
+            {"corpus": list(corpus[start:end]), "doc_ids": list(doc_ids[start:end])}
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        self._call_all("load", per_node=parts, **matcher_options)
+        self._matcher_options = dict(matcher_options)
+
+    def fit(self):
+        """
+        Compute the global IDF from the nodes' document frequencies and push it to them
+
+        Vocabulary and IDF are the same as fit_corpus() on the whole corpus,
+        including the cuts of the nodes' vocabulary profile (made on the global counts).
+        """
+        with self.recorder.timer("fit"):
+            reports = self._call_all("document_frequencies")
+
+            # global vocabulary in sorted order (like TfidfVectorizer.fit), counts summed over nodes
+            terms = sorted(set().union(*(report["terms"] for report in reports)))
+            column = {term: i for i, term in enumerate(terms)}
+            df = np.zeros(len(terms), dtype=np.int64)
+            tf = np.zeros(len(terms), dtype=np.int64)
+            for report in reports:
+                columns = [column[term] for term in report["terms"]]
+                df[columns] += report["df"]
+                tf[columns] += report["tf"]
+
+            sizes = [len(report["doc_ids"]) for report in reports]
+            self.doc_ids = [doc_id for report in reports for doc_id in report["doc_ids"]]
+            self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+            matcher = DocumentMatcher(**self._matcher_options)
+            keep = matcher.prune_vocabulary(df, tf, len(self.doc_ids))
+            self.terms = [term for term, kept in zip(terms, keep.tolist()) if kept]
+            self.idf = matcher.idf_from_df(df[keep], len(self.doc_ids))
+            self._call_all("set_idf", terms=self.terms, idf=self.idf)
+
+        logger.info(f"Distributed index: {len(self.doc_ids)} documents on {len(sizes)} shards, "
+                    f"{len(self.terms)} terms")
+
+    def find_matches(self, query_document: str, percentile: float, top_k: Optional[int] = None) -> MatchResults:
+        """
+        find_matches() over the whole distributed corpus
+
+        Args:
+            query_document: the user's input text
+            percentile: threshold value (0-100), over every document on every shard
+            top_k: optional cap on the number of matches returned
+
+        Returns:
+            MatchResults with global rows (into self.doc_ids), best first
+        """
+        if self.doc_ids is None:
+            raise ValueError("Must call fit() before finding similar documents")
+        check_query_options(percentile, top_k)
+        recorder = self.recorder
+        recorder.count("queries")
+        query_id = next(self._query_ids)
+        n_docs = len(self.doc_ids)
+
+        # round 1: every shard's top scores, enough for the exact threshold
+        # (or just a sketch of them all)
+        with recorder.timer("score"):
+            if self.threshold_error is not None:
+                replies = self._call_all("score", query_id=query_id, query=query_document,
+                                         sketch_error=self.threshold_error)
+            else:
+                top = percentile_support(n_docs, percentile)
+                replies = self._call_all("score", query_id=query_id, query=query_document, top=top)
+        if replies[0]["empty"]:
+            # same vocabulary everywhere, so either every shard or none sees no terms
+            recorder.count("empty_queries")
+            return MatchResults.empty(self.doc_ids)
+
+        candidates = sum(reply["nonzero"] for reply in replies)
+        with recorder.timer("threshold"):
+            if self.threshold_error is not None:
+                sketch = replies[0]["sketch"]
+                for reply in replies[1:]:
+                    sketch.merge(reply["sketch"])
+                threshold = sketch.percentile(percentile)
+            else:
+                tops = -np.sort(-np.concatenate([reply["scores"] for reply in replies]))[:top]
+                threshold = sorted_percentile(tops, percentile, n_implicit_zeros=n_docs - len(tops))
+
+        # round 2: every shard's matches, merged by score with ties in global row order
+        with recorder.timer("select"):
+            replies = self._call_all("select", query_id=query_id, threshold=threshold, top_k=top_k)
+            rows = np.concatenate([offset + reply["rows"] for offset, reply in zip(self.offsets, replies)])
+            scores = np.concatenate([reply["scores"] for reply in replies])
+            order = np.lexsort((rows, -scores))[:top_k]
+
+        stats = {"candidates": candidates, "shards": len(replies)}
+        recorder.observe("result_size", len(order))
+        return MatchResults(rows[order], scores[order], self.doc_ids, threshold, stats)
+
+    def close(self, shutdown_nodes: bool = False):
+        """
+        Disconnect from the nodes
+
+        Args:
+            shutdown_nodes: also stop the node programs
+        """
+        if shutdown_nodes:
+            self._call_all("shutdown")
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
@@ -14,12 +14,87 @@ The formulas (for reference):
 
     Cosine Similarity = (A · B) / (||A|| × ||B||)
     the dot product divided by magnitudes
+
+sklearn and the ANN index are imported on first use, not at import time:
+sklearn alone takes about a second to import, which short-lived processes
+would otherwise pay before doing anything.
 """
 
+import itertools
+import json
+import logging
+import os
+
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Tuple
+from scipy import sparse
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+try:
+    from . import index_store
+    from .duplicates import iter_duplicate_clusters, iter_duplicate_pairs
+    from .instrumentation import NULL_RECORDER
+    from .match_results import MatchResults
+    from .neighbor_graph import NeighborGraph
+    from .parallel_scoring import ShardedScorer
+    from .postings import PostingsIndex
+    from .quantized import (
+        STORAGE_MODES, QuantizedCSR, measure_drift, memory_footprint, score_matrix, to_float, to_storage
+    )
+    from .quantile_sketch import sketched_matches
+    from .query_cache import CachedScores, QueryCache
+    from .query_encoder import QueryEncoder
+    from .result_output import print_page
+    from .selection import (
+        check_query_options, percentile_support, percentile_threshold, percentile_thresholds, select_top,
+        sorted_percentile
+    )
+    from .vocabulary import limit_features, profile_settings, vectorizer_options
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    import index_store
+    from duplicates import iter_duplicate_clusters, iter_duplicate_pairs
+    from instrumentation import NULL_RECORDER
+    from match_results import MatchResults
+    from neighbor_graph import NeighborGraph
+    from parallel_scoring import ShardedScorer
+    from postings import PostingsIndex
+    from quantized import (
+        STORAGE_MODES, QuantizedCSR, measure_drift, memory_footprint, score_matrix, to_float, to_storage
+    )
+    from quantile_sketch import sketched_matches
+    from query_cache import CachedScores, QueryCache
+    from query_encoder import QueryEncoder
+    from result_output import print_page
+    from selection import (
+        check_query_options, percentile_support, percentile_threshold, percentile_thresholds, select_top,
+        sorted_percentile
+    )
+    from vocabulary import limit_features, profile_settings, vectorizer_options
+
+# progress and warnings go through logging; main.py decides where they end up
+logger = logging.getLogger(__name__)
+
+
+def _ann_index_class():
+    """ANNIndex, imported on first use (it pulls in sklearn's clustering and SVD)"""
+    try:
+        from .ann_index import ANNIndex
+    except ImportError:
+        from ann_index import ANNIndex
+    return ANNIndex
+
+
+def import_sklearn():
+    """
+    Import the sklearn parts the matcher needs, e.g. ahead of time to measure or overlap the cost
+
+    Everything that needs them imports them itself anyway, so calling this is optional.
+    """
+    import sklearn.feature_extraction.text  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
 
 
 class DocumentMatcher:
@@ -28,23 +103,119 @@ class DocumentMatcher:
 
     Workflow:
     1. fit_corpus() - compute TF-IDF vectors for the whole corpus
+       (fit_corpus_streaming() for corpora too big to hold in memory)
     2. find_similar_documents() - find docs similar to a query
+       (find_similar_documents_batch() for many queries at once)
     3. print_results() - display the results
 
     Storing the vectorizer and corpus_vectors so don't have to recompute TF-IDF every time.
+    save_index() / load_index() persist them to disk so later runs can skip
+    fit_corpus() entirely (fit_or_load() does the check automatically).
+    add_documents() / remove_documents() change the corpus without a refit.
+    find_matches_approx() answers top-k queries from an approximate
+    nearest-neighbor index (see ann_index.py) for very large corpora.
+    find_duplicates() / find_duplicate_clusters() compare the corpus with
+    itself, block by block (see duplicates.py).
+    find_matches_by_id() / find_neighbors() answer "more like this document"
+    from its stored row, the latter from a precomputed neighbor graph
+    (see neighbor_graph.py).
+    With threshold_error set, percentile thresholds come from a quantile
+    sketch over row blocks instead of the full similarity vector
+    (see quantile_sketch.py).
+
+    Stage timings and query sizes go to self.recorder (see instrumentation.py),
+    a no-op unless a MetricsRecorder is passed in.
     """
 
-    def __init__(self):
+    # scoring engines for find_matches():
+    #   "matmul"   - one sparse matrix product against every document
+    #   "postings" - term-at-a-time over an inverted index, only touches
+    #                documents that share a term with the query (see postings.py)
+    #   "sharded"  - the matmul engine split into row shards scored by a
+    #                process pool over shared memory (see parallel_scoring.py)
+    #   "maxscore" - the postings engine with dynamic pruning: only the top
+    #                matches the percentile / top_k needs are fully scored
+    ENGINES = ("matmul", "postings", "sharded", "maxscore")
+
+    def __init__(
+        self,
+        engine: str = "matmul",
+        n_workers: Optional[int] = None,
+        idf_drift_threshold: float = 0.05,
+        cache_bytes: int = 0,
+        ann: bool = False,
+        storage: str = "float64",
+        vocabulary: Union[str, dict] = "full",
+        threshold_error: Optional[float] = None,
+        recorder=None
+    ):
         """
         Initialize with empty values
 
         Everything set when fit_corpus() is called.
         Following sklearn's fit/transform pattern.
+
+        Args:
+            engine: scoring engine, one of ENGINES (all give identical results)
+            n_workers: worker processes for the sharded engine (default: all CPUs)
+            idf_drift_threshold: after add/remove_documents(), the stored vectors
+                are only reweighted once some term's IDF has drifted by more than
+                this fraction from the IDF they were computed with
+            cache_bytes: memory budget of the query result cache (0 = no cache);
+                cached queries are answered at any percentile without rescoring
+            ann: build the approximate nearest-neighbor index as part of fitting
+                (otherwise it's built on the first find_matches_approx() call)
+            storage: how corpus_vectors is kept in memory, one of STORAGE_MODES
+                ("float32" halves the values, "int8" quantizes them to one byte
+                plus a scale per row, see quantized.py)
+            vocabulary: vocabulary profile, a name from vocabulary.PROFILES or a
+                settings dict (min_df / max_df / max_features cuts, or feature
+                hashing into a fixed number of columns); "full" keeps every term
+            threshold_error: approximate percentile thresholds with a quantile
+                sketch whose rank error is this fraction of the corpus (e.g.
+                0.005); rows are then scored block by block, so memory doesn't
+                grow with the corpus. None = exact thresholds
+            recorder: instrumentation.MetricsRecorder collecting stage timers
+                and counters (default: NULL_RECORDER, records nothing)
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {self.ENGINES}")
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_MODES}")
+        if engine == "sharded" and storage == "int8":
+            raise ValueError("The sharded engine needs float storage (float64 or float32)")
+        if threshold_error is not None:
+            if not 0 < threshold_error < 1:
+                raise ValueError("threshold_error must be between 0 and 1")
+            if cache_bytes:
+                raise ValueError("The query cache keeps whole score distributions, use it without threshold_error")
+        self._vectorizer_options = vectorizer_options(vocabulary)
+
+        self.engine = engine
+        self.n_workers = n_workers
+        self.idf_drift_threshold = idf_drift_threshold
+        self.ann = ann
+        self.storage = storage
+        self.vocabulary = vocabulary
+        self.threshold_error = threshold_error
+        self.recorder = recorder if recorder is not None else NULL_RECORDER
         self.vectorizer = None      # TfidfVectorizer object
         self.corpus_vectors = None  # TF-IDF matrix (stored as sparse matrix for efficiency)
         self.corpus = None          # original texts
         self.doc_ids = None         # document identifiers
+        self.fingerprint = None     # hash of corpus + vectorizer settings (see index_store)
+        self._postings = None       # inverted index, built on first use by the postings/maxscore engines
+        self._sharded = None        # process pool + shared matrix, started on first use
+        self._index_path = None     # saved index corpus_vectors is memory-mapped from, if any
+        self._ann = None            # ANN index, see build_ann_index()
+        self._ann_params = {}       # settings it's (re)built with
+        self._graph = None          # k-nearest-neighbor graph, see build_neighbor_graph()
+        self._graph_params = {}     # settings it's (re)built with, empty = no graph wanted
+        self._drift = None          # ranking drift of compact storage vs float64, see ranking_drift()
+        self._cache = QueryCache(cache_bytes) if cache_bytes else None
+        self._encoder = None        # fast query vectorizer, see _query_encoder()
+        self._encoder_source = None  # (vocabulary_, idf_) it was built from
+        self._reset_updates()
 
     def fit_corpus(self, corpus: List[str], doc_ids: List[str]):
         """
@@ -70,18 +241,822 @@ class DocumentMatcher:
 
         # initialize vectorizer with default settings
         # (no stopwords removal, standard tokenization)
-        self.vectorizer = TfidfVectorizer()
+        self.vectorizer = self._make_vectorizer()
 
         # fit_transform does two steps:
         # 1) fit - learn vocabulary and IDF values
         # 2) transform - convert docs to TF-IDF vectors
-        print("Computing TF-IDF vectors for corpus...")
-        self.corpus_vectors = self.vectorizer.fit_transform(corpus)
+        logger.info("Computing TF-IDF vectors for corpus...")
+        with self.recorder.timer("fit"):
+            self.corpus_vectors = self.vectorizer.fit_transform(corpus)
+            # sklearn remaps columns after sorting the vocabulary, which leaves the
+            # column indices within each row unsorted - put the matrix in canonical form
+            self.corpus_vectors.sort_indices()
+            self._store(self.corpus_vectors, check_drift=True)
+            self.fingerprint = self.compute_fingerprint(corpus, doc_ids)
+            self._index_path = None
+            self._reset_updates()
+            self._invalidate_derived()
+            if self.ann:
+                self.build_ann_index(**self._ann_params)
 
         # show results
-        print(f"TF-IDF matrix shape: {self.corpus_vectors.shape}")
-        print(f"  - {self.corpus_vectors.shape[0]} documents")
-        print(f"  - {self.corpus_vectors.shape[1]} unique terms in vocabulary")
+        logger.info(f"TF-IDF matrix shape: {self.corpus_vectors.shape}")
+        logger.info(f"  - {self.corpus_vectors.shape[0]} documents")
+        logger.info(f"  - {self.corpus_vectors.shape[1]} unique terms in vocabulary")
+        self._log_storage()
+        self._record_fit("fit_corpus")
+
+    def fit_corpus_streaming(self, make_chunks: Callable[[], Iterable[Sequence[Tuple[str, str]]]]):
+        """
+        Out-of-core version of fit_corpus() for corpora that don't fit in RAM
+
+        Reads the corpus twice, one chunk at a time:
+        1. document-frequency pass - count in how many docs each term appears
+           (this gives the vocabulary, the IDF weights and the exact nnz)
+        2. vectorize pass - TF-IDF vectors for each chunk, written straight
+           into the preallocated CSR arrays of the final matrix
+
+        Peak memory is one chunk of raw text plus the final matrix; the raw
+        texts are never all in memory and self.corpus stays None.
+        Vocabulary, IDF and fingerprint are identical to fit_corpus() on the
+        same documents; the vectors match up to last-bit rounding (sklearn's
+        own fit_transform and transform differ by that much too).
+
+        Args:
+            make_chunks: callable returning a fresh iterable of chunks of
+                (doc_id, text) tuples on every call, e.g.
+                lambda: loader.iter_corpus(chunk_size=1000)
+        """
+        with self.recorder.timer("fit"):
+            # pass 1: document frequencies (and term counts, for max_features) with the same analyzer
+            from sklearn.feature_extraction.text import CountVectorizer
+            counter = CountVectorizer(analyzer=self._make_vectorizer().build_analyzer())
+            document_frequency = {}
+            term_frequency = {}
+            doc_ids = []
+            hasher = index_store.fingerprint_hasher(self._vectorizer_settings())
+
+            logger.info("Counting document frequencies...")
+            for chunk in make_chunks():
+                counts = counter.fit_transform([text for _, text in chunk])
+                chunk_df = np.bincount(counts.indices, minlength=counts.shape[1])
+                chunk_tf = np.asarray(counts.sum(axis=0)).ravel()
+                for term, column in counter.vocabulary_.items():
+                    document_frequency[term] = document_frequency.get(term, 0) + int(chunk_df[column])
+                    term_frequency[term] = term_frequency.get(term, 0) + int(chunk_tf[column])
+                for doc_id, text in chunk:
+                    doc_ids.append(doc_id)
+                    index_store.update_fingerprint(hasher, doc_id, text)
+
+            # vocabulary in sorted order, like TfidfVectorizer.fit, cut down to the profile's
+            terms = sorted(document_frequency)
+            df = np.array([document_frequency[term] for term in terms], dtype=np.int64)
+            tf = np.array([term_frequency[term] for term in terms], dtype=np.int64)
+            keep = self.prune_vocabulary(df, tf, len(doc_ids))
+            terms = [term for term, kept in zip(terms, keep.tolist()) if kept]
+            df = df[keep]
+            vocabulary = {term: column for column, term in enumerate(terms)}
+            vectorizer = self._fitted_vectorizer(vocabulary, self.idf_from_df(df, len(doc_ids)))
+            del document_frequency, term_frequency
+
+            # every (doc, term) pair is one nonzero, so nnz is known up front
+            nnz = int(df.sum())
+            index_dtype = np.int32 if max(nnz, len(terms)) < np.iinfo(np.int32).max else np.int64
+            data = np.empty(nnz, dtype=np.float64)
+            indices = np.empty(nnz, dtype=index_dtype)
+            indptr = np.zeros(len(doc_ids) + 1, dtype=index_dtype)
+
+            # pass 2: vectorize chunk by chunk into the final arrays
+            logger.info("Computing TF-IDF vectors for corpus (streaming)...")
+            row = 0
+            for chunk in make_chunks():
+                vectors = vectorizer.transform([text for _, text in chunk])
+                vectors.sort_indices()
+                start = indptr[row]
+                end = start + vectors.nnz
+                data[start:end] = vectors.data
+                indices[start:end] = vectors.indices
+                indptr[row + 1:row + len(chunk) + 1] = start + vectors.indptr[1:]
+                row += len(chunk)
+
+            if row != len(doc_ids):
+                raise ValueError("make_chunks() returned a different corpus on the second pass")
+
+            self.vectorizer = vectorizer
+            matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(doc_ids), len(terms)))
+            matrix.has_sorted_indices = True
+            self._store(matrix, check_drift=True)
+            self.corpus = None
+            self.doc_ids = doc_ids
+            self.fingerprint = hasher.hexdigest()
+            self._index_path = None
+            self._reset_updates()
+            self._invalidate_derived()
+            if self.ann:
+                self.build_ann_index(**self._ann_params)
+
+        logger.info(f"TF-IDF matrix shape: {self.corpus_vectors.shape}")
+        self._log_storage()
+        self._record_fit("fit_corpus_streaming")
+
+    def count_document_frequencies(self, corpus: List[str]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Vocabulary, document frequencies and term counts of some documents under this matcher's settings
+
+        The first pass of fit_corpus_streaming() for one list of texts, before
+        any vocabulary cuts. Shards in distributed mode report these so the
+        coordinator can add them up into the vocabulary and IDF of the whole
+        corpus (see distributed.py).
+
+        Returns:
+            (terms in sorted order, int64 array: in how many documents each appears,
+             int64 array: how often each appears in total)
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+        analyzer = self._make_vectorizer().build_analyzer()
+        if not any(analyzer(text) for text in corpus):
+            # CountVectorizer refuses an empty vocabulary
+            return [], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        counter = CountVectorizer(analyzer=analyzer)
+        counts = counter.fit_transform(corpus)
+        # CountVectorizer sorts its vocabulary, so columns are already in term order
+        terms = counter.get_feature_names_out().tolist()
+        df = np.bincount(counts.indices, minlength=len(terms)).astype(np.int64)
+        return terms, df, np.asarray(counts.sum(axis=0)).ravel().astype(np.int64)
+
+    def fit_corpus_with_idf(self, corpus: List[str], doc_ids: List[str], terms: List[str], idf: np.ndarray):
+        """
+        fit_corpus() with a vocabulary and IDF weights computed elsewhere
+
+        In distributed mode every shard holds only part of the corpus, but its
+        vectors have to be weighted with the IDF of the whole corpus, or scores
+        from different shards couldn't be compared. With the global terms and
+        IDF this gives exactly the rows a single matcher would hold for these
+        documents.
+
+        Args:
+            corpus: document texts
+            doc_ids: corresponding document IDs
+            terms: global vocabulary, in column order
+            idf: IDF weight per term (see idf_from_df())
+        """
+        if len(terms) != len(idf):
+            raise ValueError("terms and idf must have the same length")
+        self.corpus = corpus
+        self.doc_ids = doc_ids
+        self.vectorizer = self._fitted_vectorizer(
+            {term: column for column, term in enumerate(terms)}, np.asarray(idf, dtype=np.float64)
+        )
+
+        logger.info("Computing TF-IDF vectors with the given IDF...")
+        with self.recorder.timer("fit"):
+            self._store(self._vectorize(corpus), check_drift=True)
+            # not the result of fitting these documents, so no fingerprint
+            self.fingerprint = None
+            self._index_path = None
+            self._reset_updates()
+            self._invalidate_derived()
+            if self.ann:
+                self.build_ann_index(**self._ann_params)
+
+        logger.info(f"TF-IDF matrix shape: {self.corpus_vectors.shape}")
+        self._log_storage()
+        self._record_fit("fit_corpus_with_idf")
+
+    def _store(self, matrix, check_drift: bool = False):
+        """
+        Keep a float CSR matrix as corpus_vectors, in the configured storage mode
+
+        Args:
+            matrix: TF-IDF matrix in float64 (or float32)
+            check_drift: compare the rankings of the compact copy against
+                matrix and keep the numbers for ranking_drift()
+        """
+        stored = to_storage(matrix, self.storage)
+        if check_drift:
+            # only meaningful when something was actually lost
+            lossy = stored is not matrix and matrix.dtype == np.float64
+            self._drift = measure_drift(matrix, stored) if lossy else None
+        self.corpus_vectors = stored
+
+    def _log_storage(self):
+        """One line on memory use (and ranking drift) of compact storage"""
+        if self.storage == "float64":
+            return
+        footprint = self.memory_footprint()
+        logger.info(f"  - {self.storage} storage: {footprint['total_bytes'] / 2**20:.1f} MB "
+                    f"(float64: {footprint['float64_bytes'] / 2**20:.1f} MB)")
+        if self._drift is not None:
+            logger.info(f"  - ranking drift vs float64: overlap@{self._drift['k']} {self._drift['overlap_at_k']:.3f}, "
+                        f"max score error {self._drift['max_score_error']:.2e}")
+
+    def _record_fit(self, method: str):
+        """Structured event describing the matrix a fit just produced"""
+        if self.recorder.enabled:
+            self.recorder.event(
+                "fit", method=method, documents=self.corpus_vectors.shape[0],
+                terms=self.corpus_vectors.shape[1], nnz=int(self.corpus_vectors.nnz), storage=self.storage
+            )
+
+    def memory_footprint(self) -> dict:
+        """
+        Memory taken by corpus_vectors
+
+        Returns:
+            dict with storage mode, bytes per array, total_bytes, and
+            float64_bytes (what the same matrix takes at full precision)
+        """
+        if self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before asking for the memory footprint")
+        return dict(memory_footprint(self.corpus_vectors), storage=self.storage)
+
+    def ranking_drift(self) -> Optional[dict]:
+        """
+        How much compact storage changed the rankings, measured when the corpus was fitted
+
+        Sampled corpus rows are used as queries against the float64 matrix and
+        the compact one. None for float64 storage (nothing to compare) or when
+        no float64 matrix was available (e.g. loaded from a compact index).
+
+        Returns:
+            dict with overlap_at_k, max_score_error, mean_score_error, k, n_queries
+        """
+        return self._drift
+
+    def _invalidate_derived(self, keep_graph: bool = False):
+        """
+        Drop everything derived from corpus_vectors (rebuilt lazily when next needed)
+
+        keep_graph: the neighbor graph was already brought up to date (see _after_update())
+        """
+        self._postings = None
+        self._ann = None
+        if not keep_graph:
+            self._graph = None
+        if self._cache is not None:
+            self._cache.clear()
+        if self._sharded is not None:
+            self._sharded.close()
+            self._sharded = None
+
+    def cache_stats(self) -> Optional[dict]:
+        """Hit/miss/eviction counters and size of the query cache (None if caching is off)"""
+        return self._cache.stats() if self._cache is not None else None
+
+    def close(self):
+        """Release background resources (the sharded engine's worker pool and shared memory)"""
+        self._invalidate_derived()
+
+    def _sharded_scorer(self) -> ShardedScorer:
+        """Worker pool for the sharded engine, started the first time it's needed"""
+        if self._sharded is None:
+            # a memory-mapped index can be mapped by the workers directly from disk
+            self._sharded = ShardedScorer(self.corpus_vectors, self.n_workers, self._index_path)
+        return self._sharded
+
+    def _postings_index(self) -> PostingsIndex:
+        """Inverted index over corpus_vectors, built the first time it's needed"""
+        if self._postings is None:
+            if isinstance(self.corpus_vectors, QuantizedCSR):
+                # postings keep the int8 values, the row scales are applied per query
+                self._postings = PostingsIndex(self.corpus_vectors.int_csr(), self.corpus_vectors.scales)
+            else:
+                self._postings = PostingsIndex(self.corpus_vectors)
+        return self._postings
+
+    def build_ann_index(self, n_components: int = 128, n_lists: Optional[int] = None, random_state: int = 0):
+        """
+        (Re)build the approximate nearest-neighbor index used by find_matches_approx()
+
+        The settings are remembered: after add/remove_documents() the index
+        is rebuilt with them on the next approximate query.
+
+        Args:
+            n_components: dimensions of the SVD projection
+            n_lists: number of k-means clusters (default: about sqrt(n_docs))
+            random_state: seed, builds are reproducible
+        """
+        if self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before building the ANN index")
+        self._ann_params = {"n_components": n_components, "n_lists": n_lists, "random_state": random_state}
+        self._ann = _ann_index_class()(to_float(self.corpus_vectors), **self._ann_params)
+
+    def _ann_index(self):
+        """ANN index, built the first time it's needed"""
+        if self._ann is None:
+            self.build_ann_index(**self._ann_params)
+        return self._ann
+
+    def build_neighbor_graph(self, k: int = 10, block_size: int = 1000):
+        """
+        (Re)build the k-nearest-neighbor graph used by find_neighbors()
+
+        Every document is scored against every other one, block by block,
+        so this is as expensive as find_duplicates(); do it offline and
+        save_index() afterwards, the graph is stored with the index.
+        add/remove_documents() update it incrementally; after anything that
+        reweights all vectors (IDF drift, compact(), refit) it's rebuilt
+        with the same settings on the next lookup.
+
+        Args:
+            k: neighbors kept per document
+            block_size: documents compared at a time, bounds memory
+        """
+        if self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before building the neighbor graph")
+        self._graph_params = {"k": k, "block_size": block_size}
+        self._graph = NeighborGraph.build(self.corpus_vectors, k, block_size, self._deleted)
+
+    def neighbor_graph_k(self) -> Optional[int]:
+        """Neighbors per document of the neighbor graph (None if no graph was built or loaded)"""
+        return self._graph_params.get("k")
+
+    def _neighbor_graph(self) -> Optional[NeighborGraph]:
+        """Neighbor graph, rebuilt if it went stale (None if none was ever built)"""
+        if self._graph is None and self._graph_params:
+            self.build_neighbor_graph(**self._graph_params)
+        return self._graph
+
+    def _make_vectorizer(self) -> "TfidfVectorizer":
+        """Fresh (unfitted) vectorizer with this matcher's settings (its vocabulary profile)"""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        return TfidfVectorizer(**self._vectorizer_options)
+
+    def _limits_vocabulary(self) -> bool:
+        """True if the vocabulary profile cuts terms by document frequency or count"""
+        settings = profile_settings(self.vocabulary)
+        return any(settings.get(key) is not None for key in ("min_df", "max_df", "max_features"))
+
+    def prune_vocabulary(self, df: np.ndarray, tf: np.ndarray, n_docs: int) -> np.ndarray:
+        """
+        Terms the vocabulary profile keeps, for fits that count terms themselves
+
+        Same cuts as the vectorizer's own fit() (see vocabulary.limit_features).
+
+        Args:
+            df: number of documents containing each term (terms in sorted order)
+            tf: total count of each term
+            n_docs: number of documents
+
+        Returns:
+            boolean mask over the terms
+        """
+        vectorizer = self._make_vectorizer()
+        return limit_features(
+            df, tf, n_docs, vectorizer.min_df, vectorizer.max_df, vectorizer.max_features
+        )
+
+    def _fitted_vectorizer(self, vocabulary: dict, idf: np.ndarray) -> "TfidfVectorizer":
+        """
+        Vectorizer with this matcher's settings and a given vocabulary and IDF, without fitting
+
+        Also used whenever the vocabulary changes size: a vectorizer that went
+        through fit() remembers its feature count and would reject the new one.
+        """
+        vectorizer = self._make_vectorizer()
+        vectorizer.vocabulary_ = vocabulary
+        vectorizer.idf_ = idf
+        return vectorizer
+
+    def idf_from_df(self, df: np.ndarray, n_docs: int) -> np.ndarray:
+        """
+        IDF weights from document frequencies
+
+        Same formula (and float operations) as sklearn's TfidfTransformer.fit,
+        smoothed by default: idf = ln((1 + n) / (1 + df)) + 1
+
+        Args:
+            df: number of documents containing each term
+            n_docs: number of documents
+        """
+        smooth = int(self._make_vectorizer().smooth_idf)
+        df = df.astype(np.float64) + smooth
+        idf = np.full_like(df, fill_value=n_docs + smooth, dtype=np.float64)
+        idf /= df
+        np.log(idf, out=idf)
+        idf += 1.0
+        return idf
+
+    def _vectorizer_settings(self) -> dict:
+        """Vectorizer settings in JSON-friendly form, stored alongside a saved index"""
+        params = self._make_vectorizer().get_params()
+        return json.loads(json.dumps(params, sort_keys=True, default=str))
+
+    def compute_fingerprint(self, corpus: List[str], doc_ids: List[str]) -> str:
+        """
+        Fingerprint of a corpus under this matcher's vectorizer settings
+
+        A saved index is only reused if its fingerprint matches this value.
+        """
+        return index_store.corpus_fingerprint(corpus, doc_ids, self._vectorizer_settings())
+
+    def save_index(self, path: str):
+        """
+        Save the fitted TF-IDF index to a directory
+
+        Stores vocabulary, IDF weights, the CSR arrays of corpus_vectors and
+        the doc IDs as flat .npy arrays (see index_store for the layout),
+        plus the neighbor graph if one was built.
+
+        Args:
+            path: output directory (replaced if it already exists)
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before saving an index")
+        if self._n_deleted:
+            raise ValueError("Index has removed documents, call compact() before saving it")
+        if self._index_path is not None and os.path.abspath(self._index_path) == os.path.abspath(path):
+            # the old files get deleted, so stop reading from them first
+            self._release_index_files()
+
+        # vocabulary_ maps term -> column, store the terms in column order
+        terms = [None] * len(self.vectorizer.vocabulary_)
+        for term, column in self.vectorizer.vocabulary_.items():
+            terms[column] = term
+        terms_blob, terms_offsets = index_store.pack_strings(terms)
+        ids_blob, ids_offsets = index_store.pack_strings(list(self.doc_ids))
+
+        arrays = {
+            "data": self.corpus_vectors.data,
+            "indices": self.corpus_vectors.indices,
+            "indptr": self.corpus_vectors.indptr,
+            "idf": self.vectorizer.idf_,
+            "terms_blob": terms_blob,
+            "terms_offsets": terms_offsets,
+            "doc_ids_blob": ids_blob,
+            "doc_ids_offsets": ids_offsets,
+        }
+        if isinstance(self.corpus_vectors, QuantizedCSR):
+            arrays["scales"] = self.corpus_vectors.scales
+        graph = self._neighbor_graph()
+        if graph is not None:
+            arrays["knn_neighbors"] = graph.neighbors
+            arrays["knn_scores"] = graph.scores
+        meta = {
+            "fingerprint": self.fingerprint,
+            "shape": list(self.corpus_vectors.shape),
+            "storage": self.storage,
+            "ranking_drift": self._drift,
+            "neighbor_graph": self._graph_params,
+            "vectorizer": self._vectorizer_settings(),
+        }
+        index_store.save_index(path, arrays, meta)
+
+    def _release_index_files(self):
+        """
+        Copy everything still memory-mapped from the loaded index into RAM
+
+        Needed before that index directory is overwritten: Windows can't
+        delete mapped files, and on POSIX the matcher would go on reading
+        the unlinked old ones.
+        """
+        matrix = self.corpus_vectors
+        arrays = (np.array(matrix.data), np.array(matrix.indices), np.array(matrix.indptr))
+        if isinstance(matrix, QuantizedCSR):
+            self.corpus_vectors = QuantizedCSR(*arrays, np.array(matrix.scales), matrix.shape)
+        else:
+            self.corpus_vectors = sparse.csr_matrix(arrays, shape=matrix.shape, copy=False)
+            self.corpus_vectors.has_sorted_indices = True
+        self.vectorizer.idf_ = np.array(self.vectorizer.idf_)
+        if self._graph is not None:
+            self._graph = NeighborGraph(np.array(self._graph.neighbors), np.array(self._graph.scores))
+        self._index_path = None
+        # postings, ANN index and sharded workers may hold views of the mapped arrays
+        self._invalidate_derived(keep_graph=True)
+
+    def load_index(self, path: str, mmap: bool = True):
+        """
+        Load an index written by save_index() instead of calling fit_corpus()
+
+        With mmap=True the CSR arrays stay memory-mapped read-only, so loading
+        is near-instant and processes opening the same index share its pages.
+        The original texts are not part of the index, so self.corpus stays None.
+        An index saved with a different storage mode is converted on load
+        (into RAM, so it's no longer memory-mapped).
+
+        Args:
+            path: index directory
+            mmap: memory-map the arrays instead of reading them into RAM
+        """
+        with self.recorder.timer("load_index"):
+            self._load_index(path, mmap)
+
+    def _load_index(self, path: str, mmap: bool):
+        """load_index() without the timer"""
+        arrays, meta = index_store.load_index(path, mmap=mmap)
+
+        if meta["vectorizer"] != self._vectorizer_settings():
+            raise ValueError(f"Index at '{path}' was built with different vectorizer settings")
+
+        terms = index_store.unpack_strings(arrays["terms_blob"], arrays["terms_offsets"])
+
+        # rebuild a fitted vectorizer from the stored state (no refit)
+        vocabulary = {term: column for column, term in enumerate(terms)}
+        vectorizer = self._fitted_vectorizer(vocabulary, np.asarray(arrays["idf"]))
+
+        # copy=False keeps the memory-mapped buffers instead of copying them into RAM
+        saved_storage = meta.get("storage", "float64")
+        if saved_storage == "int8":
+            corpus_vectors = QuantizedCSR(
+                arrays["data"], arrays["indices"], arrays["indptr"], arrays["scales"], meta["shape"]
+            )
+        else:
+            corpus_vectors = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]),
+                shape=tuple(meta["shape"]),
+                copy=False
+            )
+            corpus_vectors.has_sorted_indices = True
+
+        self.vectorizer = vectorizer
+        self.corpus = None
+        self.doc_ids = index_store.unpack_strings(arrays["doc_ids_blob"], arrays["doc_ids_offsets"])
+        self.fingerprint = meta["fingerprint"]
+        if saved_storage == self.storage:
+            self.corpus_vectors = corpus_vectors
+            self._drift = meta.get("ranking_drift")
+            self._index_path = path if mmap else None
+        else:
+            self._store(to_float(corpus_vectors), check_drift=True)
+            self._index_path = None
+        self._reset_updates()
+        self._invalidate_derived()
+        self._graph_params = meta.get("neighbor_graph") or {}
+        if "knn_neighbors" in arrays and saved_storage == self.storage:
+            # scored from the stored rows, so only valid for the same storage mode
+            self._graph = NeighborGraph(arrays["knn_neighbors"], arrays["knn_scores"])
+        if self.ann:
+            self.build_ann_index(**self._ann_params)
+
+    def fit_or_load(self, corpus: List[str], doc_ids: List[str], index_path: str) -> bool:
+        """
+        Load the index from index_path if it matches the corpus, otherwise fit and save it
+
+        The fingerprint covers the corpus contents and the vectorizer settings,
+        so a stale index (different corpus or settings) is rebuilt automatically.
+        So is one saved with a different storage mode, rather than converting
+        (possibly up from int8, which can't restore the lost precision).
+
+        Args:
+            corpus: list of document texts
+            doc_ids: corresponding document IDs
+            index_path: index directory
+
+        Returns:
+            True if the index was loaded from disk, False if it was (re)fitted
+        """
+        fingerprint = self.compute_fingerprint(corpus, doc_ids)
+        meta = index_store.read_meta(index_path)
+
+        if (meta is not None and meta.get("fingerprint") == fingerprint
+                and meta.get("storage", "float64") == self.storage):
+            self.load_index(index_path)
+            # the caller already has the texts in memory, keep them like fit_corpus() does
+            self.corpus = corpus
+            return True
+
+        self.fit_corpus(corpus, doc_ids)
+        self.save_index(index_path)
+        return False
+
+    def _reset_updates(self):
+        """Forget incremental-update bookkeeping (called whenever a new corpus is fitted or loaded)"""
+        self._df = None             # live document frequency per term, computed on first update
+        self._deleted = None        # bool mask of tombstoned rows, None while nothing was removed
+        self._n_deleted = 0
+        self._id_to_row = None      # doc_id -> row, built on first update
+
+    def _document_frequencies(self) -> np.ndarray:
+        """Number of live documents containing each term (from the matrix, computed once)"""
+        if self._df is None:
+            indices = self.corpus_vectors.indices
+            if self._deleted is not None:
+                # only count nonzeros of live rows
+                row_of = np.repeat(np.arange(self.corpus_vectors.shape[0]), np.diff(self.corpus_vectors.indptr))
+                indices = indices[~self._deleted[row_of]]
+            self._df = np.bincount(indices, minlength=self.corpus_vectors.shape[1]).astype(np.int64)
+        return self._df
+
+    def _row_lookup(self) -> dict:
+        """doc_id -> row of corpus_vectors for live documents"""
+        if self._id_to_row is None:
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+            if self._deleted is not None:
+                for row in np.flatnonzero(self._deleted).tolist():
+                    if self._id_to_row.get(self.doc_ids[row]) == row:
+                        del self._id_to_row[self.doc_ids[row]]
+        return self._id_to_row
+
+    def _live_rows(self) -> Optional[np.ndarray]:
+        """Row indices of live documents, or None if nothing has been removed"""
+        if not self._n_deleted:
+            return None
+        return np.flatnonzero(~self._deleted)
+
+    def n_documents(self) -> int:
+        """Number of live (not removed) documents in the index"""
+        return self.corpus_vectors.shape[0] - self._n_deleted
+
+    def add_documents(self, texts: List[str], ids: List[str]):
+        """
+        Add documents to a fitted index without refitting
+
+        New terms are appended to the vocabulary and document frequencies are
+        updated. The new rows are weighted with the IDF the existing rows use
+        (plus fresh IDF values for new terms), so all stored vectors stay
+        consistent with each other and with query vectors. Once the true IDF
+        has drifted past idf_drift_threshold, everything is reweighted in one go.
+
+        Args:
+            texts: raw document texts
+            ids: their document IDs (must not already be in the index)
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before adding documents")
+        if len(texts) != len(ids):
+            raise ValueError("texts and ids must have the same length")
+
+        lookup = self._row_lookup()
+        duplicates = [doc_id for doc_id in ids if doc_id in lookup]
+        if duplicates or len(set(ids)) != len(ids):
+            raise ValueError(f"Document IDs already in the index: {duplicates or 'repeated in ids'}")
+
+        # grow the vocabulary with terms never seen before (sorted, for a stable column order);
+        # a profile with cuts keeps its vocabulary, new terms are ignored like in queries
+        analyzer = self.vectorizer.build_analyzer()
+        term_sets = [set(analyzer(text)) for text in texts]
+        vocabulary = dict(self.vectorizer.vocabulary_)
+        if self._limits_vocabulary():
+            term_sets = [term_set & vocabulary.keys() for term_set in term_sets]
+        new_terms = sorted(set().union(*term_sets) - vocabulary.keys())
+        n_terms = len(vocabulary)
+        for offset, term in enumerate(new_terms):
+            vocabulary[term] = n_terms + offset
+        n_terms += len(new_terms)
+
+        # document frequencies over the live corpus including the new docs
+        df = np.concatenate((self._document_frequencies(), np.zeros(len(new_terms), dtype=np.int64)))
+        for term_set in term_sets:
+            df[[vocabulary[term] for term in term_set]] += 1
+        self._df = df
+        n_live = self.n_documents() + len(texts)
+
+        # new terms get their current IDF; existing terms keep the applied one
+        if new_terms:
+            new_idf = self.idf_from_df(df[len(df) - len(new_terms):], n_live)
+            idf = np.concatenate((self.vectorizer.idf_, new_idf))
+            self.vectorizer = self._fitted_vectorizer(vocabulary, idf)
+        new_rows = self._vectorize(texts)
+
+        # append the rows (the old matrix just gets wider, its arrays are reused)
+        old = to_float(self.corpus_vectors)
+        matrix = sparse.csr_matrix(
+            (
+                np.concatenate((old.data, new_rows.data)),
+                np.concatenate((old.indices, new_rows.indices)),
+                np.concatenate((old.indptr, old.indptr[-1] + new_rows.indptr[1:]))
+            ),
+            shape=(old.shape[0] + len(texts), n_terms)
+        )
+        matrix.has_sorted_indices = True
+        # int8 rows come back to the same values when requantized, only the new rows change
+        self._store(matrix)
+
+        first_row = old.shape[0]
+        self.doc_ids = list(self.doc_ids) + list(ids)
+        for offset, doc_id in enumerate(ids):
+            lookup[doc_id] = first_row + offset
+        if self.corpus is not None:
+            self.corpus = list(self.corpus) + list(texts)
+        if self._deleted is not None:
+            self._deleted = np.concatenate((self._deleted, np.zeros(len(texts), dtype=bool)))
+
+        self._after_update(added_from=first_row)
+
+    def remove_documents(self, ids: List[str]):
+        """
+        Remove documents from a fitted index without refitting
+
+        Rows are tombstoned, not deleted: they stay in corpus_vectors but are
+        excluded from every query (including the percentile distribution).
+        compact() drops them for good.
+
+        Args:
+            ids: document IDs to remove
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before removing documents")
+
+        lookup = self._row_lookup()
+        missing = [doc_id for doc_id in ids if doc_id not in lookup]
+        if missing:
+            raise ValueError(f"Document IDs not in the index: {missing}")
+
+        rows = np.array([lookup.pop(doc_id) for doc_id in ids], dtype=np.int64)
+        df = self._document_frequencies()
+        indptr, indices = self.corpus_vectors.indptr, self.corpus_vectors.indices
+        removed_terms = np.concatenate([indices[:0]] + [indices[indptr[row]:indptr[row + 1]] for row in rows.tolist()])
+        np.subtract.at(df, removed_terms, 1)
+
+        if self._deleted is None:
+            self._deleted = np.zeros(self.corpus_vectors.shape[0], dtype=bool)
+        self._deleted[rows] = True
+        self._n_deleted += len(rows)
+
+        self._after_update(removed_rows=rows)
+
+    def idf_drift(self) -> float:
+        """
+        Largest relative difference between the IDF the stored vectors use and
+        the IDF the live corpus would give now
+        """
+        current = self.idf_from_df(self._document_frequencies(), self.n_documents())
+        applied = self.vectorizer.idf_
+        return float(np.max(np.abs(current - applied) / applied)) if len(applied) else 0.0
+
+    def reweight_idf(self):
+        """
+        Reweight every stored vector to the IDF of the live corpus
+
+        A TF-IDF row is tf * idf / norm, so swapping idf only needs a
+        per-column scale followed by renormalizing each row - no raw text.
+        """
+        from sklearn.preprocessing import normalize
+
+        current = self.idf_from_df(self._document_frequencies(), self.n_documents())
+        matrix = to_float(self.corpus_vectors)
+        data = matrix.data * (current / self.vectorizer.idf_)[matrix.indices]
+        reweighted = sparse.csr_matrix((data, matrix.indices, matrix.indptr), shape=matrix.shape)
+        reweighted = normalize(reweighted, norm="l2", copy=False)
+        reweighted.has_sorted_indices = True
+        self._store(reweighted)
+        self.vectorizer.idf_ = current
+        self._index_path = None
+        # every stored vector changed, so every neighbor score did too
+        self._graph = None
+
+    def compact(self):
+        """
+        Drop tombstoned rows and bring all weights up to date with the live corpus
+
+        Also drops terms that no live document contains any more, so afterwards
+        the index is equivalent to a fresh fit_corpus() on the live documents.
+        Rebuilds corpus_vectors once; call it periodically after many updates.
+        """
+        live = self._live_rows()
+        if live is not None:
+            df = self._document_frequencies()
+            self.corpus_vectors = to_float(self.corpus_vectors)[live]
+            self.doc_ids = [self.doc_ids[row] for row in live.tolist()]
+            if self.corpus is not None:
+                self.corpus = [self.corpus[row] for row in live.tolist()]
+            self._deleted = None
+            self._n_deleted = 0
+            self._id_to_row = None
+
+            # renumber the remaining terms, keeping their relative column order
+            # (so the indices within each row stay sorted)
+            keep = df > 0
+            new_column = np.cumsum(keep) - 1
+            matrix = self.corpus_vectors
+            self.corpus_vectors = sparse.csr_matrix(
+                (matrix.data, new_column[matrix.indices].astype(matrix.indices.dtype), matrix.indptr),
+                shape=(matrix.shape[0], int(keep.sum()))
+            )
+            self.corpus_vectors.sort_indices()
+            vocabulary = {
+                term: int(new_column[column])
+                for term, column in self.vectorizer.vocabulary_.items() if keep[column]
+            }
+            self.vectorizer = self._fitted_vectorizer(vocabulary, self.vectorizer.idf_[keep])
+            self._df = df[keep]
+
+        self.reweight_idf()
+        self._invalidate_derived()
+
+    def _after_update(self, added_from: Optional[int] = None, removed_rows: Optional[np.ndarray] = None):
+        """
+        Bookkeeping shared by add_documents() and remove_documents()
+
+        Args:
+            added_from: first row of the documents just added
+            removed_rows: rows of the documents just removed
+        """
+        # the index no longer corresponds to any fitted corpus or saved file
+        self.fingerprint = None
+        self._index_path = None
+        if self.idf_drift() > self.idf_drift_threshold:
+            # drops the neighbor graph, it's rebuilt on the next lookup
+            self.reweight_idf()
+        elif self._graph is not None:
+            # the existing vectors are unchanged, so the graph can be patched
+            block_size = self._graph_params["block_size"]
+            if added_from is not None:
+                self._graph.add_rows(self.corpus_vectors, added_from, block_size, self._deleted)
+            if removed_rows is not None:
+                self._graph.remove_rows(self.corpus_vectors, removed_rows, self._deleted, block_size)
+        self._invalidate_derived(keep_graph=True)
 
     def find_similar_documents(
         self,
@@ -108,61 +1083,681 @@ class DocumentMatcher:
         Returns:
             list of (doc_id, similarity_score) tuples, sorted by score
 
+        Convenience wrapper around find_matches(), which does the actual work
+        and returns the compact array-backed MatchResults instead.
+        """
+        return self.find_matches(query_document, percentile).to_list()
+
+    def find_matches(
+        self,
+        query_document: str,
+        percentile: float,
+        top_k: Optional[int] = None
+    ) -> MatchResults:
+        """
+        Same search as find_similar_documents(), returned as MatchResults
+
+        Fast path: the threshold comes from np.partition (selection, no full
+        sort), only the documents above it are argsorted, and results stay
+        as an index array + float32 score array with doc IDs resolved lazily.
+
+        Args:
+            query_document: the user's input text
+            percentile: threshold value (0-100)
+            top_k: optional cap on the number of matches returned
+
+        Returns:
+            MatchResults ordered best first
         """
         # fitted corpus check
         if self.vectorizer is None or self.corpus_vectors is None:
             raise ValueError("Must call fit_corpus() before finding similar documents")
+        check_query_options(percentile, top_k)
+
+        recorder = self.recorder
+        recorder.count("queries")
 
         # transform query using the same vocabulary
         # if query has new words, they just get ignored
-        query_vector = self.vectorizer.transform([query_document])
+        with recorder.timer("vectorize"):
+            query_vector = self._vectorize([query_document])
+        recorder.observe("query_nnz", query_vector.nnz)
 
         # guard: if query shares no vocabulary with the corpus,
         # the vector is all zeros and every similarity will be 0.0
         if query_vector.nnz == 0:
-            print("\nWarning: query has no terms in common with the corpus vocabulary.")
-            print("Cannot compute meaningful similarity scores.")
-            return []
+            logger.warning("Query has no terms in common with the corpus vocabulary, "
+                           "cannot compute meaningful similarity scores.")
+            recorder.count("empty_queries")
+            return MatchResults.empty(self.doc_ids)
+
+        return self._match_vector(query_vector, percentile, top_k)
+
+    def _match_vector(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """find_matches() for an already vectorized (nonempty) query"""
+        # score with the configured engine, then threshold and sort
+        # (or reuse a cached score distribution of the same query vector)
+        if self.threshold_error is not None:
+            results = self._match_sketched(query_vector, percentile, top_k)
+        elif self._cache is not None:
+            results = self._match_cached(query_vector, percentile, top_k)
+        elif self.engine == "postings":
+            results = self._match_postings(query_vector, percentile, top_k)
+        elif self.engine == "maxscore":
+            results = self._match_maxscore(query_vector, percentile, top_k)
+        else:
+            results = self._match_dense(query_vector, percentile, top_k)
+
+        # show distribution info so the user understands the result set
+        total = self.n_documents()
+        if "fully_scored" in results.stats:
+            logger.info(f"Pruned search: {results.stats['fully_scored']}/{total} documents fully scored")
+        else:
+            logger.info(f"Similarity distribution: {results.stats['candidates']}/{total} "
+                        f"documents share terms with query")
+        logger.info(f"Percentile threshold ({percentile}th): {results.threshold:.4f}")
+
+        self._record_query(query_vector.nnz, percentile, results)
+        return results
+
+    def _document_row(self, doc_id: str) -> int:
+        """Row of a live document in corpus_vectors"""
+        row = self._row_lookup().get(doc_id)
+        if row is None:
+            raise ValueError(f"Document ID not in the index: {doc_id!r}")
+        return row
+
+    def _stored_vector(self, row: int) -> sparse.csr_matrix:
+        """Stored TF-IDF vector of one row (1 x n_terms, float64), used as a query"""
+        matrix = self.corpus_vectors
+        lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+        data = matrix.data[lo:hi].astype(np.float64)
+        if isinstance(matrix, QuantizedCSR):
+            data *= matrix.scales[row]
+        vector = sparse.csr_matrix(
+            (data, np.array(matrix.indices[lo:hi]), np.array([0, hi - lo])), shape=(1, matrix.shape[1])
+        )
+        vector.has_sorted_indices = True
+        return vector
+
+    def find_matches_by_id(self, doc_id: str, percentile: float, top_k: Optional[int] = None) -> MatchResults:
+        """
+        find_matches() with a corpus document as the query ("more like this")
+
+        The document's stored row is the query vector, so there is no text to
+        fetch or vectorize. The document itself is left out of the results,
+        but it still counts in the percentile distribution.
+
+        Args:
+            doc_id: ID of a document in the index
+            percentile: threshold value (0-100)
+            top_k: optional cap on the number of matches returned
+
+        Returns:
+            MatchResults ordered best first
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before finding similar documents")
+        check_query_options(percentile, top_k)
+
+        row = self._document_row(doc_id)
+        query_vector = self._stored_vector(row)
+        self.recorder.count("queries")
+        self.recorder.observe("query_nnz", query_vector.nnz)
+        if query_vector.nnz == 0:
+            self.recorder.count("empty_queries")
+            return MatchResults.empty(self.doc_ids)
+
+        results = self._match_vector(query_vector, percentile, None if top_k is None else top_k + 1)
+        keep = results.indices != row
+        if top_k is not None:
+            keep &= np.cumsum(keep) <= top_k
+        return MatchResults(
+            results.indices[keep], results.scores[keep], self.doc_ids, results.threshold, results.stats
+        )
+
+    def find_neighbors(self, doc_id: str, top_k: Optional[int] = None) -> MatchResults:
+        """
+        The most similar documents of a corpus document, read from the neighbor graph
+
+        O(k): no scoring at all, the graph was built by build_neighbor_graph()
+        (or loaded with the index). Same documents and order as
+        find_matches_by_id(doc_id, 0, top_k) minus those with similarity 0.
+
+        Args:
+            doc_id: ID of a document in the index
+            top_k: at most this many (default and maximum: the graph's k)
+
+        Returns:
+            MatchResults ordered best first (threshold is None)
+        """
+        graph = self._neighbor_graph()
+        if graph is None:
+            raise ValueError("No neighbor graph, call build_neighbor_graph() first")
+        if top_k is not None and top_k > graph.k:
+            raise ValueError(f"The neighbor graph only has {graph.k} neighbors per document")
+
+        self.recorder.count("graph_lookups")
+        indices, scores = graph.lookup(self._document_row(doc_id), top_k)
+        return MatchResults(indices, scores, self.doc_ids, stats={"source": "neighbor_graph"})
+
+    def similarity_distribution(self, query_document: str) -> Optional[CachedScores]:
+        """
+        Every nonzero similarity of a query, best first, before any threshold
+
+        This is what the query cache keeps. Shards in distributed mode send
+        the top of it to the coordinator, which needs the distribution of the
+        whole corpus for the percentile threshold (see distributed.py).
 
+        Returns:
+            CachedScores (rows, scores, number of zero scores), or None if the
+            query shares no term with the vocabulary
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before finding similar documents")
+        recorder = self.recorder
+        recorder.count("queries")
+        with recorder.timer("vectorize"):
+            query_vector = self._vectorize([query_document])
+        recorder.observe("query_nnz", query_vector.nnz)
+        if query_vector.nnz == 0:
+            recorder.count("empty_queries")
+            return None
+        with recorder.timer("score"):
+            return self._score_distribution(query_vector)
+
+    def select_from_distribution(
+        self,
+        distribution: CachedScores,
+        threshold: float,
+        top_k: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matches of a similarity_distribution() at a given threshold
+
+        Returns:
+            (rows, scores) best first, ties in row order; documents scoring 0
+            are included when the threshold is 0, like in find_matches()
+        """
+        with self.recorder.timer("select"):
+            indices, scores = distribution.select(threshold, top_k)
+            return self._append_zero_matches(
+                indices, scores, distribution.indices, distribution.n_zeros, threshold, top_k
+            )
+
+    def _record_query(self, nnz: int, percentile: Optional[float], results: MatchResults):
+        """Result size and one structured event per answered query"""
+        recorder = self.recorder
+        if not recorder.enabled:
+            return
+        recorder.observe("result_size", len(results))
+        recorder.event(
+            "query", engine=self.engine, query_nnz=nnz, percentile=percentile,
+            threshold=results.threshold, matches=len(results), **results.stats
+        )
+
+    def find_matches_approx(self, query_document: str, top_k: int = 10, n_probe: int = 8) -> MatchResults:
+        """
+        Approximate top-k search through the ANN index
+
+        Only the documents in the n_probe clusters nearest to the query are
+        scored (exactly), so the cost doesn't grow with the whole corpus.
+        Raise n_probe for better recall, lower it for speed; see
+        ann_index.recall_at_k() for measuring the trade-off.
+
+        Args:
+            query_document: the user's input text
+            top_k: number of matches to return
+            n_probe: number of clusters to search
+
+        Returns:
+            MatchResults ordered best first (threshold is None, only documents
+            with a nonzero similarity); stats has the candidate count
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before finding similar documents")
+
+        recorder = self.recorder
+        recorder.count("queries")
+        with recorder.timer("vectorize"):
+            query_vector = self._vectorize([query_document])
+        recorder.observe("query_nnz", query_vector.nnz)
+        if query_vector.nnz == 0:
+            recorder.count("empty_queries")
+            return MatchResults.empty(self.doc_ids)
+
+        ann_index = self._ann_index()
+        with recorder.timer("score"):
+            indices, scores, n_candidates = ann_index.search(
+                self.corpus_vectors, query_vector, top_k + self._n_deleted, n_probe
+            )
+        if self._deleted is not None:
+            # over-fetched by the number of removed rows, so dropping them still leaves top_k
+            keep = ~self._deleted[indices]
+            indices, scores = indices[keep][:top_k], scores[keep][:top_k]
+
+        stats = {"candidates": n_candidates, "n_probe": n_probe}
+        results = MatchResults(indices, scores, self.doc_ids, stats=stats)
+        self._record_query(query_vector.nnz, None, results)
+        return results
+
+    def find_duplicates(
+        self,
+        threshold: float = 0.9,
+        block_size: int = 1000,
+        n_workers: int = 1
+    ) -> Iterator[Tuple[str, str, float]]:
+        """
+        Stream every pair of corpus documents with similarity >= threshold
+
+        The corpus is compared with itself in row blocks, so memory stays
+        around block_size^2 scores per worker however big the corpus is.
+
+        Args:
+            threshold: minimum cosine similarity (0.9 catches near-identical stories)
+            block_size: rows compared at a time
+            n_workers: processes working on row blocks in parallel
+
+        Yields:
+            (doc_id, doc_id, similarity), each pair once, ordered by the
+            first document's position in the corpus
+        """
+        if self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before looking for duplicates")
+        pairs = iter_duplicate_pairs(self.corpus_vectors, threshold, block_size, n_workers, self._deleted)
+        for i, j, similarity in pairs:
+            yield self.doc_ids[i], self.doc_ids[j], similarity
+
+    def find_duplicate_clusters(
+        self,
+        threshold: float = 0.9,
+        block_size: int = 1000,
+        n_workers: int = 1
+    ) -> Iterator[List[str]]:
+        """
+        Groups of near-duplicate documents (connected through pairs >= threshold)
+
+        Same arguments as find_duplicates(). Each cluster is yielded as soon
+        as the scan has passed all of its documents.
+
+        Yields:
+            lists of 2+ doc IDs, in corpus order within each list
+        """
+        if self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before looking for duplicates")
+        pairs = iter_duplicate_pairs(self.corpus_vectors, threshold, block_size, n_workers, self._deleted)
+        for rows in iter_duplicate_clusters(pairs):
+            yield [self.doc_ids[row] for row in rows]
+
+    def find_similar_documents_batch(
+        self,
+        queries: Iterable[str],
+        percentile: float,
+        batch_size: int = 256
+    ) -> Iterator[List[Tuple[str, float]]]:
+        """
+        Batched version of find_similar_documents() for many queries
+
+        Yields one list of (doc_id, similarity_score) tuples per query, in input
+        order (empty list for queries with no terms in the corpus vocabulary).
+        See find_matches_batch() for how the batching works.
+        """
+        for results in self.find_matches_batch(queries, percentile, batch_size=batch_size):
+            yield results.to_list()
+
+    def find_matches_batch(
+        self,
+        queries: Iterable[str],
+        percentile: Union[float, Iterable[float]],
+        top_k: Union[None, int, Iterable[Optional[int]]] = None,
+        batch_size: int = 256
+    ) -> Iterator[MatchResults]:
+        """
+        Batched version of find_matches() for many queries
+
+        Each batch of queries is vectorized with one transform() call and
+        scored with one sparse (batch x N) matrix product. Percentile thresholds
+        for the whole batch come from one vectorized partition along axis 1.
+        Results are yielded per query, in input order, as soon as their batch
+        is done, so memory stays bounded by batch_size x N scores
+        (with threshold_error set, queries are matched one by one instead).
+
+        Args:
+            queries: iterable of query texts
+            percentile: threshold value (0-100), either one for every query
+                or an iterable with one per query
+            top_k: optional cap on the number of matches, one for every query
+                or an iterable with one (or None) per query
+            batch_size: number of queries scored together
+
+        Yields:
+            one MatchResults per query
+        """
+        if self.vectorizer is None or self.corpus_vectors is None:
+            raise ValueError("Must call fit_corpus() before finding similar documents")
+
+        # per-query parameters travel alongside their query
+        percentiles = itertools.repeat(percentile) if np.isscalar(percentile) else iter(percentile)
+        top_ks = itertools.repeat(top_k) if top_k is None or np.isscalar(top_k) else iter(top_k)
+
+        batch = []
+        for query, query_percentile, query_top_k in zip(queries, percentiles, top_ks):
+            check_query_options(query_percentile, query_top_k)
+            batch.append((query, query_percentile, query_top_k))
+            if len(batch) == batch_size:
+                yield from self._match_batch(*zip(*batch))
+                batch = []
+        if batch:
+            yield from self._match_batch(*zip(*batch))
+
+    def _query_encoder(self) -> Optional[QueryEncoder]:
+        """
+        QueryEncoder for the current vocabulary and IDF (None if the settings need transform())
+
+        Rebuilt whenever the vectorizer's vocabulary_ or idf_ is replaced
+        (refit, load, add_documents, reweight_idf all assign new objects).
+        """
+        source = (self.vectorizer.vocabulary_, self.vectorizer.idf_)
+        if self._encoder_source is None or any(a is not b for a, b in zip(source, self._encoder_source)):
+            self._encoder = QueryEncoder(self.vectorizer) if QueryEncoder.supports(self.vectorizer) else None
+            self._encoder_source = source
+        return self._encoder
+
+    def _vectorize(self, queries: List[str]):
+        """TF-IDF vectors of the queries, one row each, in canonical (sorted index) form"""
+        # same vectors as vectorizer.transform(), without its per-call overhead
+        encoder = self._query_encoder()
+        if encoder is not None:
+            return encoder.transform(queries)
+        query_vectors = self.vectorizer.transform(queries)
+        query_vectors.sort_indices()
+        return query_vectors
+
+    def _score(self, query_vectors) -> np.ndarray:
+        """
+        Cosine similarity of each query row against every corpus document
+
+        TfidfVectorizer L2-normalizes every row (norm='l2'), so the cosine
+        similarity is just the dot product - no need for cosine_similarity()
+        to renormalize both sides. Computing corpus x query^T keeps the big
+        matrix in its stored CSR layout; only the small query side is transposed.
+
+        Returns:
+            dense array of shape (n_queries, n_docs)
+        """
+        if self.engine == "sharded":
+            return self._sharded_scorer().score(query_vectors)
+        # plain sparse product for float storage, the blockwise int8 kernel for int8
+        return score_matrix(self.corpus_vectors, query_vectors)
+
+    def _match_dense(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """Match one query vector by scoring every document (matmul engine)"""
         # calculate cosine similarity with all corpus documents
         # returns 2D array (only 1 query, so [0])
-        similarities = cosine_similarity(query_vector, self.corpus_vectors)[0]
+        recorder = self.recorder
+        with recorder.timer("score"):
+            similarities = self._score(query_vector)[0]
 
-        # show distribution info so the user understands the result set
-        non_zero = int(np.sum(similarities > 0))
-        total = len(similarities)
-        print(f"\nSimilarity distribution: {non_zero}/{total} documents share terms with query")
+            # removed documents don't take part, not even in the percentile
+            live = self._live_rows()
+            if live is not None:
+                similarities = similarities[live]
 
         # find the threshold value based on percentile
-        # numpy's percentile finds the value where X% of data falls below it
-        threshold = np.percentile(similarities, percentile)
+        # (same value as np.percentile, found by selection instead of sorting)
+        with recorder.timer("threshold"):
+            threshold = percentile_threshold(similarities, percentile)
 
-        print(f"Percentile threshold ({percentile}th): {threshold:.4f}")
+        # keep documents above threshold, sorted by score (highest first)
+        with recorder.timer("select"):
+            indices, scores = select_top(similarities, threshold, top_k, indices=live)
+        stats = {"candidates": int(np.count_nonzero(similarities))}
+        return MatchResults(indices, scores, self.doc_ids, threshold, stats)
 
-        # get indices of documents above threshold
-        matching_indices = np.where(similarities >= threshold)[0]
+    def _match_postings(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """
+        Match one query vector via the inverted index (postings engine)
 
-        # build results with doc IDs and scores
-        results = [
-            (self.doc_ids[idx], similarities[idx])
-            for idx in matching_indices
-        ]
+        Only documents sharing a term with the query get a score. All the
+        others are implicit zeros: they are counted into the percentile
+        (analytically, see percentile_threshold) but never materialized,
+        unless the threshold drops to 0 and they actually match.
+        """
+        recorder = self.recorder
+        postings = self._postings_index()
+        with recorder.timer("score"):
+            touched, similarities, postings_touched = postings.score(query_vector.indices, query_vector.data)
+            if self._deleted is not None:
+                keep = ~self._deleted[touched]
+                touched, similarities = touched[keep], similarities[keep]
+        recorder.observe("postings_touched", postings_touched)
+        n_zeros = self.n_documents() - len(touched)
 
-        # sort by score (highest first)
-        results.sort(key=lambda x: x[1], reverse=True)
+        with recorder.timer("threshold"):
+            threshold = percentile_threshold(similarities, percentile, n_implicit_zeros=n_zeros)
+        with recorder.timer("select"):
+            indices, scores = select_top(similarities, threshold, top_k, indices=touched)
+            indices, scores = self._append_zero_matches(indices, scores, touched, n_zeros, threshold, top_k)
 
-        return results
+        stats = {"candidates": len(touched), "postings_touched": postings_touched}
+        return MatchResults(indices, scores, self.doc_ids, threshold, stats)
+
+    def _match_maxscore(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """
+        Match one query vector with pruned top-k scoring (maxscore engine)
+
+        The percentile only depends on the percentile_support(n, p) best
+        scores, so those are all that's fetched, via PostingsIndex.top_k();
+        every other document counts as an implicit zero. When even the
+        documents sharing a term can't reach the percentile's position, the
+        threshold is 0 whatever the scores are and only top_k are needed.
+        Same thresholds and matches as the other engines, bit for bit.
+        """
+        recorder = self.recorder
+        postings = self._postings_index()
+        n_docs = self.n_documents()
+        k = percentile_support(n_docs, percentile)
+        if top_k is not None and k > postings.n_postings(query_vector.indices) + 1:
+            # both order statistics the percentile needs are zeros
+            k = min(k, top_k)
+
+        with recorder.timer("score"):
+            touched, similarities, counts = postings.top_k(query_vector.indices, query_vector.data, k, self._deleted)
+        recorder.observe("postings_touched", counts["postings_touched"])
+        recorder.observe("fully_scored", counts["fully_scored"])
+        n_zeros = n_docs - len(touched)
+
+        with recorder.timer("threshold"):
+            threshold = sorted_percentile(similarities, percentile, n_implicit_zeros=n_zeros)
+        with recorder.timer("select"):
+            # already best first, so the matches are a prefix
+            n_matches = int(np.count_nonzero(similarities >= threshold))
+            if top_k is not None:
+                n_matches = min(n_matches, top_k)
+            indices, scores = self._append_zero_matches(
+                touched[:n_matches], similarities[:n_matches], touched, n_zeros, threshold, top_k
+            )
+        return MatchResults(indices, scores, self.doc_ids, threshold, counts)
+
+    def _match_sketched(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """
+        Match one query vector with a sketched percentile threshold (threshold_error set)
+
+        Rows are scored in blocks with the matmul kernel whatever the engine,
+        and the threshold is within threshold_error * N ranks of the exact
+        one (see quantile_sketch.py). Only one block of scores, the sketch
+        and a bounded candidate buffer are held at a time.
+        """
+        recorder = self.recorder
+        with recorder.timer("score"):
+            indices, scores, threshold, stats = sketched_matches(
+                self.corpus_vectors, query_vector, percentile, top_k, self.threshold_error, self._deleted
+            )
+        recorder.observe("threshold_passes", stats["passes"])
+        return MatchResults(indices, scores, self.doc_ids, threshold, stats)
+
+    def _append_zero_matches(
+        self,
+        indices: np.ndarray,
+        scores: np.ndarray,
+        touched: np.ndarray,
+        n_zeros: int,
+        threshold: float,
+        top_k: Optional[int]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Add the zero-similarity documents when the threshold lets them match
+
+        Engines that only score documents sharing a term (touched) leave the
+        rest implicit. A threshold of 0 means all of those match too; they tie
+        at 0, below every touched doc, and come in document order.
+        """
+        remaining = n_zeros if top_k is None else top_k - len(indices)
+        if threshold > 0 or not n_zeros or remaining <= 0:
+            return indices, scores
+
+        untouched = np.ones(self.corpus_vectors.shape[0], dtype=bool)
+        untouched[touched] = False
+        if self._deleted is not None:
+            untouched &= ~self._deleted
+        zero_indices = np.flatnonzero(untouched)[:remaining]
+        return np.concatenate((indices, zero_indices)), np.concatenate((scores, np.zeros(len(zero_indices))))
+
+    def _score_distribution(self, query_vector) -> CachedScores:
+        """All nonzero similarities of one query, sorted best first, for the query cache"""
+        if self.engine in ("postings", "maxscore"):
+            touched, similarities, _ = self._postings_index().score(query_vector.indices, query_vector.data)
+            if self._deleted is not None:
+                keep = ~self._deleted[touched]
+                touched, similarities = touched[keep], similarities[keep]
+        else:
+            similarities = self._score(query_vector)[0]
+            live = self._live_rows()
+            if live is not None:
+                similarities = similarities[live]
+            non_zero = np.flatnonzero(similarities)
+            touched = non_zero if live is None else live[non_zero]
+            similarities = similarities[non_zero]
+
+        # stable, so equal scores stay in document order like everywhere else
+        order = np.argsort(-similarities, kind="stable")
+        return CachedScores(touched[order], similarities[order], self.n_documents() - len(touched))
+
+    def _match_cached(self, query_vector, percentile: float, top_k: Optional[int]) -> MatchResults:
+        """
+        Match one query vector through the query cache
+
+        A miss scores the query once with the configured engine and stores
+        the sorted distribution; after that, every percentile of the same
+        query is a threshold lookup plus a binary search.
+        """
+        recorder = self.recorder
+        key = QueryCache.key(query_vector)
+        entry = self._cache.get(key)
+        cache_hit = entry is not None
+        if cache_hit:
+            recorder.count("cache_hits")
+        else:
+            recorder.count("cache_misses")
+            with recorder.timer("score"):
+                entry = self._score_distribution(query_vector)
+            self._cache.put(key, entry)
+
+        with recorder.timer("threshold"):
+            threshold = entry.threshold(percentile)
+        with recorder.timer("select"):
+            indices, scores = entry.select(threshold, top_k)
+            indices, scores = self._append_zero_matches(
+                indices, scores, entry.indices, entry.n_zeros, threshold, top_k
+            )
+
+        stats = {"candidates": len(entry.indices), "cache_hit": cache_hit}
+        return MatchResults(indices, scores, self.doc_ids, threshold, stats)
+
+    def _match_batch(
+        self,
+        queries: Sequence[str],
+        percentiles: Sequence[float],
+        top_ks: Sequence[Optional[int]]
+    ) -> Iterator[MatchResults]:
+        """Score one batch of queries together and yield each query's results"""
+        recorder = self.recorder
+        recorder.count("queries", len(queries))
+        recorder.count("batches")
+        with recorder.timer("vectorize"):
+            query_vectors = self._vectorize(list(queries))
+        nnz = np.diff(query_vectors.indptr)
+        if recorder.enabled:
+            for row_nnz in nnz.tolist():
+                recorder.observe("query_nnz", row_nnz)
+        empty = nnz == 0
+        recorder.count("empty_queries", int(empty.sum()))
+
+        if self.threshold_error is not None or self.engine in ("postings", "maxscore"):
+            # postings work is per query anyway, no shared matrix product to batch
+            # (and a sketched threshold is there to avoid the batch x N scores)
+            if self.threshold_error is not None:
+                match = self._match_sketched
+            else:
+                match = self._match_postings if self.engine == "postings" else self._match_maxscore
+            for row in range(len(queries)):
+                if empty[row]:
+                    yield MatchResults.empty(self.doc_ids)
+                    continue
+                results = match(query_vectors[row], percentiles[row], top_ks[row])
+                self._record_query(int(nnz[row]), percentiles[row], results)
+                yield results
+            return
+
+        with recorder.timer("score"):
+            similarities = self._score(query_vectors)
+            live = self._live_rows()
+            if live is not None:
+                similarities = similarities[:, live]
+
+        # one threshold per query row, computed in a single vectorized call
+        with recorder.timer("threshold"):
+            thresholds = percentile_thresholds(similarities, percentiles)
+
+        for row in range(len(queries)):
+            if empty[row]:
+                # same rule as find_matches(): no shared vocabulary, no results
+                yield MatchResults.empty(self.doc_ids)
+                continue
+
+            threshold = float(thresholds[row])
+            with recorder.timer("select"):
+                indices, scores = select_top(similarities[row], threshold, top_ks[row], indices=live)
+            stats = {"candidates": int(np.count_nonzero(similarities[row]))}
+            results = MatchResults(indices, scores, self.doc_ids, threshold, stats)
+            self._record_query(int(nnz[row]), percentiles[row], results)
+            yield results
 
-    def print_results(self, results: List[Tuple[str, float]], percentile: float):
+    def print_results(
+        self,
+        results: Union[List[Tuple[str, float]], MatchResults],
+        percentile: float,
+        page_size: Optional[int] = None
+    ) -> int:
         """
         Print results
 
+        Only the first page_size matches are formatted and printed, see
+        result_output.print_page() for showing the next pages.
+
+        Args:
+            results: matches, best first
+            percentile: the percentile they were selected with
+            page_size: matches to show (None = all of them)
+
+        Returns:
+            number of matches shown
         """
-        print(f"\n{'='*70}")
-        print(f"Documents matching above {percentile}th percentile")
-        print(f"Found {len(results)} matching documents")
-        print(f"{'='*70}\n")
+        with self.recorder.timer("output"):
+            print(f"\n{'='*70}")
+            print(f"Documents matching above {percentile}th percentile")
+            print(f"Found {len(results)} matching documents")
+            print(f"{'='*70}\n")
 
-        # print each result
-        for i, (doc_id, score) in enumerate(results, 1):
-            print(f"{i:3d}. {doc_id:20s} | Similarity: {score:.4f}")
+            # print the first page of results
+            return print_page(results, 0, page_size)
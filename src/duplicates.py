@@ -0,0 +1,225 @@
+"""
+Near-Duplicate Detection - blocked all-pairs similarity over the whole corpus
+
+Finding every pair of documents above a similarity threshold is
+corpus_vectors @ corpus_vectors.T, but that N x N result doesn't fit in
+memory for a large corpus (and with no stopword removal almost every pair
+shares some term, so it isn't sparse either). Instead the corpus is walked
+in tiles:
+
+    for each row block R = rows [a, b):
+        for each column block C = rows [c, d) with c >= a:
+            tile = R @ C.T          (block_size x block_size, dense)
+            keep (i, j) with i < j and tile[i, j] >= threshold
+
+Only the upper triangle is computed (similarity is symmetric), and a tile
+is pruned to its pairs above the threshold before the next one is built,
+so memory is bounded by block_size^2 scores no matter how big the corpus.
+Row blocks are independent, so they can be spread over a process pool
+(matrix in shared memory, like parallel_scoring.py); results still come
+back in row-block order.
+
+iter_duplicate_pairs() streams (i, j, similarity) with i < j, ordered by i.
+iter_duplicate_clusters() groups such a stream into connected components
+(union-find) and yields each cluster as soon as no later pair can reach it.
+"""
+
+import heapq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+try:
+    from .parallel_scoring import SharedCSR, attach_csr
+    from .quantized import QuantizedCSR, to_float
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from parallel_scoring import SharedCSR, attach_csr
+    from quantized import QuantizedCSR, to_float
+
+
+def _row_block(matrix, start: int, end: int) -> sparse.csr_matrix:
+    """Rows [start, end) of a CSR matrix as a view (no copy of the arrays)"""
+    lo, hi = matrix.indptr[start], matrix.indptr[end]
+    block = sparse.csr_matrix(
+        (matrix.data[lo:hi], matrix.indices[lo:hi], matrix.indptr[start:end + 1] - lo),
+        shape=(end - start, matrix.shape[1]),
+        copy=False
+    )
+    block.has_sorted_indices = True
+    return block
+
+
+def block_pairs(
+    matrix,
+    start: int,
+    end: int,
+    threshold: float,
+    block_size: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All pairs (i, j) with start <= i < end, i < j and similarity >= threshold
+
+    Args:
+        matrix: L2-normalized float CSR matrix
+        start, end: the row block
+        threshold: minimum cosine similarity
+        block_size: rows per column tile
+
+    Returns:
+        (i, j, similarity) arrays, sorted by i then j
+    """
+    rows = _row_block(matrix, start, end)
+    n_rows = matrix.shape[0]
+    pieces = []
+    for col_start in range(start, n_rows, block_size):
+        col_end = min(col_start + block_size, n_rows)
+        tile = (rows @ _row_block(matrix, col_start, col_end).T).toarray()
+        hits = tile >= threshold
+        if col_start == start:
+            # the diagonal tile: only j > i (no self-pairs, no mirrored pairs)
+            hits = np.triu(hits, k=1)
+        i, j = np.nonzero(hits)
+        pieces.append((i + start, j + col_start, tile[i, j]))
+
+    if not pieces:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=matrix.dtype)
+    i, j, scores = (np.concatenate(column) for column in zip(*pieces))
+    order = np.lexsort((j, i))
+    return i[order], j[order], scores[order]
+
+
+# per-worker state, set up once by _init_worker()
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(spec: dict):
+    """Pool initializer: attach to the shared matrix"""
+    _worker["matrix"], _worker["handles"] = attach_csr(spec)
+
+
+def _worker_block(start: int, end: int, threshold: float, block_size: int):
+    """Worker task: block_pairs() on the shared matrix"""
+    return block_pairs(_worker["matrix"], start, end, threshold, block_size)
+
+
+def iter_duplicate_pairs(
+    corpus_vectors,
+    threshold: float = 0.9,
+    block_size: int = 1000,
+    n_workers: int = 1,
+    deleted: Optional[np.ndarray] = None
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Stream every pair of rows with cosine similarity >= threshold
+
+    Args:
+        corpus_vectors: TF-IDF matrix in any storage mode (int8 is scored
+            after widening to float32)
+        threshold: minimum similarity, e.g. 0.9 for near-duplicates
+        block_size: rows per block; memory is about block_size^2 scores per worker
+        n_workers: processes scoring row blocks in parallel (1 = in this process)
+        deleted: optional bool mask of rows to leave out
+
+    Yields:
+        (i, j, similarity) with i < j, ordered by i then j
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    if isinstance(corpus_vectors, QuantizedCSR):
+        matrix = to_float(corpus_vectors, np.float32)
+    else:
+        matrix = corpus_vectors
+    n_rows = matrix.shape[0]
+    blocks = [(start, min(start + block_size, n_rows)) for start in range(0, n_rows, block_size)]
+
+    def keep_live(i, j, scores):
+        if deleted is not None:
+            keep = ~(deleted[i] | deleted[j])
+            i, j, scores = i[keep], j[keep], scores[keep]
+        return zip(i.tolist(), j.tolist(), scores.tolist())
+
+    if n_workers <= 1:
+        for start, end in blocks:
+            yield from keep_live(*block_pairs(matrix, start, end, threshold, block_size))
+        return
+
+    shared = SharedCSR(matrix)
+    executor = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(shared.spec,))
+    pending = deque()
+    try:
+        # a bounded window of blocks in flight: workers stay busy, finished
+        # blocks don't pile up, and results still come out in block order
+        remaining = deque(blocks)
+        while remaining or pending:
+            while remaining and len(pending) < 2 * n_workers:
+                start, end = remaining.popleft()
+                pending.append(executor.submit(_worker_block, start, end, threshold, block_size))
+            yield from keep_live(*pending.popleft().result())
+    finally:
+        # stopped early (or failed): drop the queued blocks, shutdown(cancel_futures=) is 3.9+
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        shared.close()
+
+
+def iter_duplicate_clusters(pairs: Iterable[Tuple[int, int, float]]) -> Iterator[List[int]]:
+    """
+    Group a pair stream into clusters of near-duplicates (connected components)
+
+    pairs must be ordered by their first row, as iter_duplicate_pairs()
+    yields them. Once the stream has moved past row r, no later pair can
+    touch a row below r, so every cluster whose highest row is below r is
+    complete and is yielded right away; only open clusters stay in memory.
+
+    Yields:
+        sorted row lists, one per cluster (2+ rows), in order of completion
+    """
+    parent = {}
+    members = {}     # root -> rows of its cluster (unsorted, sorted once when yielded)
+    highest = {}     # root -> highest row of its cluster
+    ready = []       # heap of (highest row, root), may hold stale entries
+
+    def find(row):
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    def finished(below: int):
+        while ready and ready[0][0] < below:
+            top, root = heapq.heappop(ready)
+            # skip entries of roots that were merged away or grew since
+            if parent.get(root) == root and highest[root] == top:
+                rows = members.pop(root)
+                del highest[root]
+                for row in rows:
+                    del parent[row]
+                rows.sort()
+                yield rows
+
+    for i, j, _ in pairs:
+        yield from finished(i)
+        for row in (i, j):
+            if row not in parent:
+                parent[row] = row
+                members[row] = [row]
+                highest[row] = row
+        root_i, root_j = find(i), find(j)
+        if root_i == root_j:
+            continue
+        # merge the smaller cluster into the larger one (O(smaller), so
+        # building one big cluster stays O(n log n) overall)
+        if len(members[root_i]) < len(members[root_j]):
+            root_i, root_j = root_j, root_i
+        parent[root_j] = root_i
+        members[root_i].extend(members.pop(root_j))
+        highest[root_i] = max(highest[root_i], highest.pop(root_j))
+        heapq.heappush(ready, (highest[root_i], root_i))
+
+    yield from finished(float("inf"))
+
@@ -0,0 +1,173 @@
+"""
+Index Store Module
+
+Saves and loads a fitted TF-IDF index to/from disk so the program
+doesn't have to refit TfidfVectorizer over the whole corpus on every run.
+
+Layout of an index directory:
+    meta.json      - format version, fingerprint, matrix shape, vectorizer settings
+    <name>.npy     - one flat binary array per piece of state
+                     (CSR data/indices/indptr, IDF weights, packed strings)
+
+Every array is a plain .npy file so np.load(mmap_mode='r') can map it
+straight from disk. Loading is basically free and the OS page cache
+shares the pages between worker processes that open the same index.
+
+Strings (vocabulary terms, doc IDs) are stored as one UTF-8 blob plus
+an offsets array, so they are flat binary too.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# bump this when the on-disk layout changes, old indexes then count as stale
+FORMAT_VERSION = 1
+
+META_FILE = "meta.json"
+
+
+def fingerprint_hasher(vectorizer_params: dict):
+    """
+    Start a corpus fingerprint, to be fed one document at a time
+
+    Use update_fingerprint() per document and .hexdigest() at the end. This
+    is what corpus_fingerprint() does in one go; the streaming fit uses it
+    directly so the corpus never has to be in memory all at once.
+    """
+    h = hashlib.sha256()
+    h.update(f"format={FORMAT_VERSION}\n".encode("utf-8"))
+    # default=str covers things like dtype=np.float64 in the params
+    h.update(json.dumps(vectorizer_params, sort_keys=True, default=str).encode("utf-8"))
+    return h
+
+
+def update_fingerprint(h, doc_id: str, text: str):
+    """Add one document to a fingerprint started with fingerprint_hasher()"""
+    # NUL separators so ("ab", "c") and ("a", "bc") hash differently
+    h.update(doc_id.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    h.update(b"\0")
+
+
+def corpus_fingerprint(
+    corpus: Iterable[str],
+    doc_ids: Iterable[str],
+    vectorizer_params: dict
+) -> str:
+    """
+    Hash of the corpus contents and the vectorizer settings
+
+    If any document, any ID or any vectorizer setting changes, the
+    fingerprint changes too, so a saved index built from different
+    inputs is detected as stale.
+
+    Args:
+        corpus: document texts
+        doc_ids: corresponding document IDs
+        vectorizer_params: full parameter dict of the vectorizer (get_params())
+
+    Returns:
+        hex digest string
+    """
+    h = fingerprint_hasher(vectorizer_params)
+    for doc_id, text in zip(doc_ids, corpus):
+        update_fingerprint(h, doc_id, text)
+    return h.hexdigest()
+
+
+def pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack a list of strings into a UTF-8 blob and an offsets array
+
+    String i is blob[offsets[i]:offsets[i+1]].
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Inverse of pack_strings()"""
+    raw = blob.tobytes()
+    bounds = offsets.tolist()
+    return [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+def save_index(path: str, arrays: Dict[str, np.ndarray], meta: dict):
+    """
+    Write an index directory
+
+    Everything is written to a temporary sibling directory first and then
+    swapped in, so a crash halfway through never leaves a half-written
+    index that looks valid.
+
+    Args:
+        path: index directory
+        arrays: name -> array, each saved as <name>.npy
+        meta: JSON-serializable metadata (fingerprint, shape, ...)
+    """
+    path = os.path.abspath(path)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+
+    meta = dict(meta, format_version=FORMAT_VERSION, arrays=sorted(arrays))
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+
+
+def read_meta(path: str) -> Optional[dict]:
+    """
+    Read an index's metadata, or None if there's no usable index at path
+
+    Indexes written by a different FORMAT_VERSION count as missing.
+    """
+    meta_path = os.path.join(path, META_FILE)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if meta.get("format_version") != FORMAT_VERSION:
+        return None
+    return meta
+
+
+def load_index(path: str, mmap: bool = True) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Load an index directory written by save_index()
+
+    Args:
+        path: index directory
+        mmap: memory-map the arrays read-only instead of reading them into RAM
+
+    Returns:
+        (arrays, meta)
+    """
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"No valid index found at '{path}'")
+
+    mmap_mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in meta["arrays"]
+    }
+    return arrays, meta
@@ -0,0 +1,272 @@
+"""
+Instrumentation - stage timers, counters and value summaries
+
+The matcher and the CLI report what they do through a recorder instead of
+print(). Two recorders:
+
+    NullRecorder     - the default; every call is a no-op (the timer is one
+                       shared do-nothing context manager), so an
+                       uninstrumented matcher pays close to nothing
+    MetricsRecorder  - keeps the numbers in memory and can also emit every
+                       event as a structured (JSON) log record
+
+What gets recorded:
+    timers    - seconds per stage: load, fit, vectorize, score, threshold,
+                select, output (count, sum, max)
+    counters  - monotonic totals: queries, cache_hits, cache_misses, ...
+    values    - per-event sizes: query_nnz, postings_touched, result_size
+                (count, sum, max)
+    events    - one structured record per fit / query, only logged
+
+snapshot() returns everything as a dict (JSON-ready), to_prometheus()
+renders the same numbers in the Prometheus text exposition format.
+
+StartupTimeline is separate: the wall-clock phases from process start until
+the program can answer its first query (imports, corpus, index).
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# prefix of every Prometheus metric name
+PROMETHEUS_PREFIX = "nlp"
+
+
+class _NullTimer:
+    """Context manager that does nothing (shared by every NullRecorder.timer() call)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullRecorder:
+    """
+    Recorder that records nothing
+
+    enabled is False so callers can skip building event fields entirely:
+        if recorder.enabled:
+            recorder.event("query", ...)
+    """
+
+    enabled = False
+
+    def timer(self, stage: str):
+        return _NULL_TIMER
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+    def observe(self, name: str, value: float):
+        pass
+
+    def event(self, name: str, **fields):
+        pass
+
+    def snapshot(self) -> dict:
+        return {"timers": {}, "values": {}, "counters": {}}
+
+
+NULL_RECORDER = NullRecorder()
+
+
+class _Summary:
+    """count / sum / max of the values seen"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "sum": self.total, "max": self.max}
+
+
+class _Timer:
+    """Times one stage into a MetricsRecorder"""
+
+    __slots__ = ("recorder", "stage", "start")
+
+    def __init__(self, recorder: "MetricsRecorder", stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder._add(self.recorder._timers, self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class MetricsRecorder:
+    """
+    In-memory metrics, optionally mirrored to a logger as structured events
+
+    Thread-safe: the query server scores from a worker thread while the
+    event loop reads snapshots.
+
+    Usage:
+        recorder = MetricsRecorder(logger=logging.getLogger("nlp.metrics"))
+        matcher = DocumentMatcher(recorder=recorder)
+        ...
+        print(recorder.to_prometheus())
+    """
+
+    enabled = True
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        """
+        Args:
+            logger: if given, every event() is logged to it (INFO) as one JSON
+                line, with the fields also attached to the record as record.event
+        """
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._values = {}
+        self._counters = {}
+
+    def timer(self, stage: str) -> _Timer:
+        """Context manager adding the seconds spent inside it to stage"""
+        return _Timer(self, stage)
+
+    def count(self, name: str, value: int = 1):
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """Add one value (e.g. a size) to the summary of name"""
+        self._add(self._values, name, value)
+
+    def event(self, name: str, **fields):
+        """Log one structured event (no-op without a logger)"""
+        if self.logger is not None and self.logger.isEnabledFor(logging.INFO):
+            record = dict(event=name, **fields)
+            self.logger.info(json.dumps(record, default=str), extra={"event": record})
+
+    def _add(self, table: dict, name: str, value: float):
+        with self._lock:
+            summary = table.get(name)
+            if summary is None:
+                summary = table[name] = _Summary()
+            summary.add(value)
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._timers.clear()
+            self._values.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Everything recorded so far
+
+        Returns:
+            {"timers": {stage: {count, sum, max}}, (seconds)
+             "values": {name: {count, sum, max}},
+             "counters": {name: total}}
+        """
+        with self._lock:
+            return {
+                "timers": {stage: summary.as_dict() for stage, summary in sorted(self._timers.items())},
+                "values": {name: summary.as_dict() for name, summary in sorted(self._values.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def to_json(self) -> str:
+        """snapshot() as a JSON string"""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        snapshot() in the Prometheus text exposition format
+
+        Stage timers become one labelled summary (nlp_stage_seconds{stage="score"}),
+        values become one summary each, counters become nlp_<name>_total.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def summary(metric: str, rows: dict, label: Optional[str] = None):
+            lines.append(f"# TYPE {metric} summary")
+            for key, numbers in rows.items():
+                labels = f'{{{label}="{key}"}}' if label else ""
+                lines.append(f"{metric}_count{labels} {numbers['count']}")
+                lines.append(f"{metric}_sum{labels} {numbers['sum']!r}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            for key, numbers in rows.items():
+                labels = f'{{{label}="{key}"}}' if label else ""
+                lines.append(f"{metric}_max{labels} {numbers['max']!r}")
+
+        if snapshot["timers"]:
+            summary(f"{PROMETHEUS_PREFIX}_stage_seconds", snapshot["timers"], label="stage")
+        for name, numbers in snapshot["values"].items():
+            summary(f"{PROMETHEUS_PREFIX}_{name}", {name: numbers})
+        for name, total in snapshot["counters"].items():
+            metric = f"{PROMETHEUS_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {total}")
+        return "\n".join(lines) + "\n"
+
+
+class StartupTimeline:
+    """
+    Consecutive wall-clock phases, e.g. of a process starting up
+
+    Usage:
+        timeline = StartupTimeline(start=time.perf_counter())
+        ...
+        timeline.mark("load corpus")    # time since the previous mark
+        ...
+        print(timeline.report())
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        """
+        Args:
+            start: time.perf_counter() value the first phase starts at (default: now)
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.phases: List[Tuple[str, float]] = []
+        self._last = self.start
+
+    def mark(self, phase: str, now: Optional[float] = None):
+        """End the current phase, naming it phase (now: perf_counter() value it ended at)"""
+        now = time.perf_counter() if now is None else now
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self) -> float:
+        """Seconds from start to the last mark"""
+        return self._last - self.start
+
+    def report(self) -> str:
+        """One line per phase with its seconds and share of the total"""
+        total = self.total()
+        width = max((len(phase) for phase, _ in self.phases), default=5)
+        lines = [f"{'phase':{width}s}  {'seconds':>8s}  share"]
+        for phase, seconds in self.phases:
+            share = seconds / total if total > 0 else 0.0
+            lines.append(f"{phase:{width}s}  {seconds:8.3f}  {share:5.1%}")
+        lines.append(f"{'total':{width}s}  {total:8.3f}")
+        return "\n".join(lines)
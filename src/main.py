@@ -8,18 +8,66 @@ This is the main program that the user runs. It handles:
 - Finding similar documents
 - Displaying results
 
-Usage: python main.py
+Usage:
+    python main.py                       (interactive, one query)
+    python main.py --serve [--port 8000] (long-running query server, see server.py)
+    python main.py --queries DIR_OR_JSONL --percentile 70 --output results.jsonl
+                                         (bulk, non-interactive, see bulk.py)
+    python main.py --recall-report       (ANN recall@k vs the exact engine, see ann_index.py)
+    python main.py --vocabulary-report   (size/speed/overlap@k of the vocabulary profiles,
+                                          see vocabulary.py)
+    python main.py --duplicates --output dups.jsonl
+                                         (near-duplicate pairs/clusters, see duplicates.py)
+    python main.py --like training/144 [--neighbors 10]
+                                         (more like this corpus document, see neighbor_graph.py)
+    NLP_CLUSTER_KEY=secret python main.py --shard-node 0.0.0.0:9001
+                                         (shard node of a distributed index, see distributed.py)
+
+Progress messages go to the log (stderr), so stdout only carries results.
+--metrics PATH writes stage timings and counters when the program ends
+(JSON, or Prometheus text for a .prom file), see instrumentation.py.
+
+Heavy libraries (sklearn, NLTK) are imported only when they're needed, and
+--startup-report logs how long each step took before the first query.
+In the interactive flow the corpus and index are loaded in a background
+thread while the prompts are up, so typing the query hides that time.
 """
 
+import argparse
+import json
+import logging
 import os
 import sys
+import threading
+import time
+from typing import Optional
+
+STARTED = time.perf_counter()
 
 # ensure sibling modules are importable regardless of how the script is invoked
 # (e.g. python src/main.py, python -m src.main, or from a different working directory)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from corpus_loader import CorpusLoader
-from document_matcher import DocumentMatcher
+from document_matcher import DocumentMatcher, import_sklearn
+from instrumentation import NULL_RECORDER, MetricsRecorder, StartupTimeline
+from result_output import FORMATS as RESULT_FORMATS, print_page, write_results
+from vocabulary import PROFILES as VOCABULARY_PROFILES
+
+IMPORTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+# where the fitted TF-IDF index is cached between runs
+# (override with the NLP_INDEX_DIR environment variable)
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index")
+
+# where the Reuters texts are packed into one memory-mapped file
+# (override with the NLP_TEXT_STORE environment variable)
+DEFAULT_TEXT_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "corpus_store")
+
+# --percentile when it isn't given (bulk queries, --like without a neighbor graph)
+DEFAULT_PERCENTILE = 70.0
 
 
 def read_document_from_file(file_path: str) -> str:
@@ -111,9 +159,272 @@ def get_user_input() -> tuple:
     return document_text, percentile
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    """Command line options (no options = the interactive program)"""
+    parser = argparse.ArgumentParser(description="Document Similarity Matcher")
+    parser.add_argument("--storage", choices=("float64", "float32", "int8"), default="float64",
+                        help="precision the TF-IDF matrix is kept in (default: float64)")
+    parser.add_argument("--vocabulary", choices=tuple(VOCABULARY_PROFILES), default="full",
+                        help="vocabulary profile: which terms become columns (default: full, every term)")
+    parser.add_argument("--threshold-error", type=float, metavar="FRACTION",
+                        help="approximate percentile thresholds with a quantile sketch, off by at most this "
+                             "fraction of the corpus in rank (e.g. 0.005); scores are then never all in memory "
+                             "at once (default: exact)")
+    parser.add_argument("--serve", action="store_true",
+                        help="run a long-running query server instead of the interactive prompt")
+    parser.add_argument("--host", default="127.0.0.1", help="server address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="server port (default: 8000)")
+    parser.add_argument("--unix-socket", metavar="PATH",
+                        help="listen on a Unix domain socket instead of host:port")
+    parser.add_argument("--batch-window", type=float, default=0.005, metavar="SECONDS",
+                        help="how long the server waits to group queries into one batch (default: 0.005)")
+    parser.add_argument("--page-size", type=int, default=25, metavar="N",
+                        help="matches printed per page in the terminal (default: 25, 0 = all at once)")
+
+    bulk = parser.add_argument_group("bulk mode")
+    bulk.add_argument("--queries", metavar="PATH",
+                      help="directory of .txt files or JSONL file of queries; runs without prompts")
+    bulk.add_argument("--percentile", type=float,
+                      help=f"match percentile 0-100 (default: {DEFAULT_PERCENTILE:g}; with --like and a neighbor "
+                           "graph, the graph's neighbors unless a percentile above 0 is given)")
+    bulk.add_argument("--top-k", type=int, help="keep at most this many matches per query")
+    bulk.add_argument("--output", metavar="PATH",
+                      help="results file (required with --queries and --duplicates; with --like, "
+                           f"the format comes from the extension: {', '.join(RESULT_FORMATS)})")
+    bulk.add_argument("--format", choices=("jsonl", "csv"),
+                      help="results format (default: from the --output extension, else jsonl)")
+    bulk.add_argument("--batch-size", type=int, default=256, help="queries scored together (default: 256)")
+
+    ann = parser.add_argument_group("approximate search")
+    ann.add_argument("--recall-report", action="store_true",
+                     help="measure ANN recall@k and latency against the exact engine, then exit")
+    ann.add_argument("--report-queries", type=int, default=200,
+                     help="corpus documents sampled as queries for the reports (default: 200)")
+    ann.add_argument("--report-k", type=int, default=10, help="k for recall@k / overlap@k (default: 10)")
+
+    vocabulary = parser.add_argument_group("vocabulary profiles")
+    vocabulary.add_argument("--vocabulary-report", action="store_true",
+                            help="fit every vocabulary profile and compare nnz, memory, fit time, latency and "
+                                 "overlap@k with the full vocabulary (uses --report-queries, --report-k), then exit")
+
+    duplicates = parser.add_argument_group("near-duplicates")
+    duplicates.add_argument("--duplicates", action="store_true",
+                            help="write every pair of corpus documents above --min-similarity to --output")
+    duplicates.add_argument("--min-similarity", type=float, default=0.9,
+                            help="similarity a pair needs to count as near-duplicate (default: 0.9)")
+    duplicates.add_argument("--clusters", action="store_true",
+                            help="write groups of near-duplicates instead of pairs")
+    duplicates.add_argument("--block-size", type=int, default=1000,
+                            help="documents compared at a time, bounds memory (default: 1000)")
+    duplicates.add_argument("--workers", type=int, default=1,
+                            help="processes comparing blocks in parallel (default: 1)")
+
+    like = parser.add_argument_group("more like this")
+    like.add_argument("--like", metavar="DOC_ID",
+                      help="print the documents most similar to this corpus document (uses --percentile, --top-k)")
+    like.add_argument("--neighbors", type=int, metavar="K",
+                      help="precompute the K nearest neighbors of every document and store them with the "
+                           "index, so --like is answered from that graph")
+
+    distributed = parser.add_argument_group("distributed mode")
+    distributed.add_argument("--shard-node", metavar="HOST:PORT",
+                             help="run as a shard node of a distributed index until the coordinator "
+                                  "shuts it down (auth key from the NLP_CLUSTER_KEY environment variable)")
+
+    instrumentation = parser.add_argument_group("instrumentation")
+    instrumentation.add_argument("--log-level", default="INFO",
+                                 choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+                                 help="log level of the progress messages on stderr (default: INFO)")
+    instrumentation.add_argument("--log-events", action="store_true",
+                                 help="also log one JSON event per fit and per query")
+    instrumentation.add_argument("--metrics", metavar="PATH",
+                                 help="write stage timings and counters here on exit "
+                                      "(Prometheus text if PATH ends in .prom, JSON otherwise)")
+    instrumentation.add_argument("--startup-report", action="store_true",
+                                 help="log the time spent on imports, corpus and index before the first query")
+
+    args = parser.parse_args(argv)
+    if args.queries is not None:
+        if args.output is None:
+            parser.error("--queries needs --output")
+        if not os.path.exists(args.queries):
+            parser.error(f"'{args.queries}' not found")
+    if args.duplicates:
+        if args.output is None:
+            parser.error("--duplicates needs --output")
+        if not 0 < args.min_similarity <= 1:
+            parser.error("--min-similarity must be in (0, 1]")
+    if args.percentile is not None and not 0 <= args.percentile <= 100:
+        parser.error("--percentile must be between 0 and 100")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.neighbors is not None and args.neighbors < 1:
+        parser.error("--neighbors must be at least 1")
+    if args.page_size < 0:
+        parser.error("--page-size can't be negative")
+    if args.shard_node is not None:
+        host, _, port = args.shard_node.rpartition(":")
+        if not host or not port.isdigit():
+            parser.error("--shard-node must be HOST:PORT")
+        if not os.environ.get("NLP_CLUSTER_KEY"):
+            parser.error("--shard-node needs the NLP_CLUSTER_KEY environment variable")
+    return args
+
+
+def make_recorder(args: argparse.Namespace):
+    """MetricsRecorder if anything will read the metrics, otherwise the no-op recorder"""
+    if args.metrics is None and not args.log_events and not args.serve:
+        return NULL_RECORDER
+    return MetricsRecorder(logger=logging.getLogger("nlp.events") if args.log_events else None)
+
+
+def write_metrics(recorder: MetricsRecorder, path: str):
+    """Write the recorder's snapshot, as Prometheus text for .prom files and JSON otherwise"""
+    text = recorder.to_prometheus() if path.endswith(".prom") else recorder.to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    logger.info(f"✓ Metrics written to {path}")
+
+
+def load_corpus(recorder=NULL_RECORDER) -> tuple:
+    """Load the Reuters corpus (from the packed text store once it exists)"""
+    logger.info("[1/4] Loading Reuters corpus...")
+    loader = CorpusLoader(store_path=os.environ.get("NLP_TEXT_STORE", DEFAULT_TEXT_STORE))
+    with recorder.timer("load"):
+        corpus, doc_ids = loader.load_corpus()
+    logger.info(f"✓ Loaded {len(corpus)} documents")
+    return corpus, doc_ids
+
+
+def build_matcher(
+    storage: str = "float64",
+    recorder=NULL_RECORDER,
+    timeline: Optional[StartupTimeline] = None,
+    neighbors: Optional[int] = None,
+    vocabulary: str = "full",
+    threshold_error: Optional[float] = None
+) -> DocumentMatcher:
     """
-    Main function that runs everything
+    Load the corpus and fit the matcher (or reuse the saved index)
+
+    Args:
+        storage: storage mode of the TF-IDF matrix (see quantized.py)
+        recorder: instrumentation recorder, also handed to the matcher
+        timeline: if given, each step is marked on it
+        neighbors: make sure the index has a neighbor graph with this many
+            neighbors per document (built and saved if it doesn't)
+        vocabulary: vocabulary profile (see vocabulary.py)
+        threshold_error: sketched percentile thresholds with this rank error
+            (see quantile_sketch.py), None = exact
+
+    Returns:
+        fitted DocumentMatcher
+    """
+    mark = timeline.mark if timeline is not None else (lambda phase: None)
+
+    # Step 1: Load corpus
+    corpus, doc_ids = load_corpus(recorder)
+    mark("load corpus")
+
+    # needed from here on anyway, imported explicitly so the report shows its cost
+    import_sklearn()
+    mark("import sklearn")
+
+    # Step 2: Compute TF-IDF vectors (or reuse the saved index if the corpus hasn't changed)
+    logger.info("[2/4] Computing TF-IDF vectors...")
+    matcher = DocumentMatcher(
+        storage=storage, vocabulary=vocabulary, threshold_error=threshold_error, recorder=recorder
+    )
+    index_dir = os.environ.get("NLP_INDEX_DIR", DEFAULT_INDEX_DIR)
+    if matcher.fit_or_load(corpus, doc_ids, index_dir):
+        logger.info(f"✓ Loaded saved TF-IDF index from {index_dir}")
+        mark("load index")
+    else:
+        logger.info(f"✓ TF-IDF computation complete (index saved to {index_dir})")
+        mark("fit and save index")
+
+    if neighbors is not None and matcher.neighbor_graph_k() != neighbors:
+        logger.info(f"Building the {neighbors}-nearest-neighbor graph...")
+        matcher.build_neighbor_graph(neighbors)
+        matcher.save_index(index_dir)
+        logger.info(f"✓ Neighbor graph saved with the index in {index_dir}")
+        mark("build neighbor graph")
+    return matcher
+
+
+def main(argv=None):
+    """Parse the options, set up logging and metrics, and run the selected mode"""
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+    recorder = make_recorder(args)
+    timeline = None
+    if args.startup_report:
+        timeline = StartupTimeline(start=STARTED)
+        timeline.mark("import matcher modules", now=IMPORTED)
+        timeline.mark("parse options")
+    try:
+        run(args, recorder, timeline)
+    finally:
+        if args.metrics is not None:
+            write_metrics(recorder, args.metrics)
+
+
+class Warmup:
+    """
+    Runs a slow setup function (build_matcher) in a background thread
+
+    The interactive prompts wait on the user for seconds, and input()
+    releases the GIL, so loading the corpus and fitting or memory-mapping
+    the index can run meanwhile. result() then waits only for whatever is
+    left when the query is submitted.
+
+    The thread is a daemon: quitting at the prompt doesn't wait for the fit.
+    Indexes and text stores are written to a temp dir and renamed into
+    place, so an abandoned fit never leaves a half-written one behind.
+    """
+
+    def __init__(self, target, *args, **kwargs):
+        self._target = target
+        self._value = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=args, kwargs=kwargs, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self, *args, **kwargs):
+        try:
+            self._value = self._target(*args, **kwargs)
+        except BaseException as e:
+            # handed to the waiting thread, raised there
+            self._error = e
+
+    def ready(self) -> bool:
+        """True once the setup has finished (or failed)"""
+        return not self._thread.is_alive()
+
+    def result(self):
+        """
+        The setup function's return value, waiting for it if needed
+
+        Returns:
+            whatever target returned (re-raises what it raised)
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def log_startup(timeline: Optional[StartupTimeline]):
+    """Log the startup report, if one is being collected"""
+    if timeline is not None:
+        # wall clock from main.py starting to being able to answer the first query
+        # (interpreter start-up before main.py isn't included)
+        logger.info("Startup time until ready for queries:\n" + timeline.report())
+
+
+def run(args: argparse.Namespace, recorder=NULL_RECORDER, timeline: Optional[StartupTimeline] = None):
+    """
+    Runs everything
 
     Steps:
     1. Load corpus and compute TF-IDF
@@ -121,60 +432,161 @@ def main():
     3. Find similar documents
     4. Display results
     5. Optionally save to file
-    """
-
-    print("\n" + "="*70)
-    print("INITIALIZING DOCUMENT SIMILARITY MATCHER")
-    print("="*70)
 
-    # Step 1: Load corpus
-    print("\n[1/4] Loading Reuters corpus...")
-    loader = CorpusLoader()
-    corpus, doc_ids = loader.load_corpus()
-    print(f"✓ Loaded {len(corpus)} documents")
+    With --serve, steps 1-2 run once and the matcher then answers
+    queries over HTTP until Ctrl+C. Without any mode option it's the
+    interactive program (see run_interactive()).
+    """
+    if args.shard_node is not None:
+        # documents, IDF and queries all come from the coordinator
+        from distributed import serve_node
+        host, _, port = args.shard_node.rpartition(":")
+        serve_node((host, int(port)), os.environ["NLP_CLUSTER_KEY"].encode("utf-8"))
+        return
+
+    logger.info("="*70)
+    logger.info("INITIALIZING DOCUMENT SIMILARITY MATCHER")
+    logger.info("="*70)
+
+    if args.vocabulary_report:
+        from vocabulary import format_vocabulary_report, vocabulary_report
+        corpus, doc_ids = load_corpus(recorder)
+        step = max(1, len(corpus) // args.report_queries)
+        queries = corpus[::step][:args.report_queries]
+        logger.info(f"[2/4] Fitting {len(VOCABULARY_PROFILES)} vocabulary profiles, "
+                    f"{len(queries)} sampled documents as queries...")
+        report = vocabulary_report(corpus, doc_ids, queries, k=args.report_k, storage=args.storage)
+        print(format_vocabulary_report(report, args.report_k))
+        return
+
+    interactive = not (
+        args.serve or args.recall_report or args.duplicates or args.like is not None or args.queries is not None
+    )
+    if interactive:
+        run_interactive(args, recorder, timeline)
+        return
+
+    matcher = build_matcher(args.storage, recorder, timeline, args.neighbors, args.vocabulary, args.threshold_error)
+    log_startup(timeline)
+
+    if args.serve:
+        from server import run_server
+        run_server(matcher, args.host, args.port, args.unix_socket, args.batch_window)
+        return
+
+    if args.recall_report:
+        from ann_index import format_recall_report, recall_at_k
+        logger.info("[3/4] Building ANN index...")
+        matcher.build_ann_index()
+        logger.info(f"[4/4] Measuring recall@{args.report_k} on {args.report_queries} sampled documents...")
+        step = max(1, len(matcher.corpus) // args.report_queries)
+        queries = matcher.corpus[::step][:args.report_queries]
+        print(format_recall_report(recall_at_k(matcher, queries, args.report_k), args.report_k))
+        return
+
+    if args.duplicates:
+        logger.info(f"[3/4] Comparing all documents (similarity >= {args.min_similarity})...")
+        found = 0
+        with open(args.output, "w", encoding="utf-8") as f:
+            if args.clusters:
+                for cluster in matcher.find_duplicate_clusters(args.min_similarity, args.block_size, args.workers):
+                    f.write(json.dumps({"documents": cluster}) + "\n")
+                    found += 1
+            else:
+                for a, b, similarity in matcher.find_duplicates(args.min_similarity, args.block_size, args.workers):
+                    f.write(json.dumps({"a": a, "b": b, "similarity": similarity}) + "\n")
+                    found += 1
+        logger.info(f"[4/4] ✓ {found} {'clusters' if args.clusters else 'pairs'} written to {args.output}")
+        return
+
+    if args.like is not None:
+        graph_k = matcher.neighbor_graph_k()
+        # the graph holds every neighbor with similarity > 0, i.e. percentile 0,
+        # so it can only answer when no higher percentile was asked for
+        use_graph = graph_k is not None and not args.percentile and (args.top_k or graph_k) <= graph_k
+        try:
+            if use_graph:
+                logger.info(f"[3/4] Reading the neighbors of {args.like} from the neighbor graph...")
+                results = matcher.find_neighbors(args.like, args.top_k)
+                percentile = 0.0
+            else:
+                percentile = DEFAULT_PERCENTILE if args.percentile is None else args.percentile
+                logger.info(f"[3/4] Scoring the corpus against {args.like}...")
+                results = matcher.find_matches_by_id(args.like, percentile, args.top_k)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        logger.info("[4/4] ✓ Search complete")
+        if args.output is not None:
+            written = write_results(results, args.output, percentile=percentile)
+            logger.info(f"✓ {written} matches written to {args.output}")
+        else:
+            matcher.print_results(results, percentile, args.page_size or None)
+        return
+
+    if args.queries is not None:
+        from bulk import run_bulk
+        logger.info(f"[3/4] Running queries from {args.queries}...")
+        summary = run_bulk(
+            matcher, args.queries, args.output,
+            DEFAULT_PERCENTILE if args.percentile is None else args.percentile,
+            top_k=args.top_k, batch_size=args.batch_size, fmt=args.format
+        )
+        logger.info(f"✓ {summary['queries']} queries, {summary['matches']} matches written to {args.output}")
+        logger.info(f"[4/4] Throughput: {summary['queries_per_sec']:.1f} queries/sec "
+                    f"({summary['seconds']:.2f}s total)")
+        return
+
+
+def run_interactive(args: argparse.Namespace, recorder=NULL_RECORDER, timeline: Optional[StartupTimeline] = None):
+    """
+    The interactive program: prompt, search, page through and save results
 
-    # Step 2: Compute TF-IDF vectors
-    print("\n[2/4] Computing TF-IDF vectors...")
-    matcher = DocumentMatcher()
-    matcher.fit_corpus(corpus, doc_ids)
-    print("✓ TF-IDF computation complete")
+    Steps 1-2 (corpus and index) start in the background right away and
+    the prompts show immediately; the search only waits if the index
+    isn't ready by the time the query is submitted.
+    """
+    warmup = Warmup(
+        build_matcher, args.storage, recorder, timeline, args.neighbors, args.vocabulary, args.threshold_error
+    )
 
     # Step 3: Get user input
-    print("\n[3/4] Getting user input...")
+    logger.info("[3/4] Getting user input...")
     document_text, percentile = get_user_input()
-    print(f"✓ Document received ({len(document_text)} characters)")
-    print(f"✓ Percentile threshold: {percentile}")
+    logger.info(f"✓ Document received ({len(document_text)} characters)")
+    logger.info(f"✓ Percentile threshold: {percentile}")
 
-    # Step 4: Find similar documents
-    print("\n[4/4] Finding similar documents...")
-    results = matcher.find_similar_documents(document_text, percentile)
-    print(f"✓ Search complete")
+    if not warmup.ready():
+        logger.info("Waiting for the index to be ready...")
+    wait_started = time.perf_counter()
+    with recorder.timer("warmup_wait"):
+        matcher = warmup.result()
+    logger.info(f"✓ Index ready (waited {time.perf_counter() - wait_started:.2f}s after the query was entered)")
+    log_startup(timeline)
 
-    # Display results
-    matcher.print_results(results, percentile)
+    # Step 4: Find similar documents
+    logger.info("[4/4] Finding similar documents...")
+    results = matcher.find_matches(document_text, percentile)
+    logger.info(f"✓ Search complete")
+
+    # Display results, one page at a time
+    page_size = args.page_size or None
+    shown = matcher.print_results(results, percentile, page_size)
+    while shown < len(results):
+        remaining = len(results) - shown
+        more = input(f"\nShow the next {min(page_size, remaining)} of {remaining} remaining? (y/n): ")
+        if more.strip().lower() != 'y':
+            break
+        shown = print_page(results, shown, page_size)
 
     # Optional: save to file
     save = input("\nWould you like to save results to a file? (y/n): ").strip().lower()
     if save == 'y':
-        output_file = input("Enter output filename (e.g., results.txt): ").strip()
+        output_file = input("Enter output filename (.txt, .jsonl, .csv or .npz, e.g. results.txt): ").strip()
 
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write("="*70 + "\n")
-                f.write("Document Similarity Matching Results\n")
-                f.write("NLP Assignment - Option C\n")
-                f.write("="*70 + "\n\n")
-
-                f.write(f"Percentile threshold: {percentile}\n")
-                f.write(f"Total matching documents: {len(results)}\n\n")
-
-                f.write("Matching Documents:\n")
-                f.write("-"*70 + "\n")
-                for i, (doc_id, score) in enumerate(results, 1):
-                    f.write(f"{i:3d}. {doc_id:20s} | Similarity: {score:.4f}\n")
-
-                f.write("\n" + "="*70 + "\n")
-
+            # written page by page, .npz skips formatting entirely
+            write_results(results, output_file, percentile=percentile)
             print(f"✓ Results saved to {output_file}")
 
         except Exception as e:
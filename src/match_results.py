@@ -0,0 +1,75 @@
+"""
+Match Results - compact, array-backed result of a similarity query
+
+Instead of a Python list of (doc_id, score) tuples, a query returns two
+NumPy arrays: document row indices and float32 scores, already ordered
+best first. Doc IDs are only looked up when somebody actually asks for them,
+so a result with 10k matches costs two small arrays, not 10k tuples.
+
+The old list-of-tuples format is still available through to_list().
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class MatchResults:
+    """
+    Ordered matches of one query
+
+    Attributes:
+        indices: row indices into the corpus (int32 or int64), best match first
+        scores: float32 similarity scores, same order
+        threshold: percentile threshold that was applied (None if not percentile-based)
+        stats: optional dict of per-query counters (filled in by the scoring engine)
+    """
+
+    def __init__(
+        self,
+        indices: np.ndarray,
+        scores: np.ndarray,
+        doc_ids: Sequence[str],
+        threshold: Optional[float] = None,
+        stats: Optional[dict] = None
+    ):
+        # int32 is plenty for row indices unless the corpus is gigantic
+        index_dtype = np.int32 if len(doc_ids) < np.iinfo(np.int32).max else np.int64
+        self.indices = np.asarray(indices, dtype=index_dtype)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.threshold = threshold
+        self.stats = stats if stats is not None else {}
+        self._doc_ids = doc_ids
+
+    @classmethod
+    def empty(cls, doc_ids: Sequence[str], threshold: Optional[float] = None) -> "MatchResults":
+        """Result with no matches"""
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), doc_ids, threshold)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> Tuple[str, float]:
+        return self._doc_ids[self.indices[i]], float(self.scores[i])
+
+    def __iter__(self) -> Iterator[Tuple[str, float]]:
+        for index, score in zip(self.indices.tolist(), self.scores.tolist()):
+            yield self._doc_ids[index], score
+
+    def page(self, start: int, stop: int) -> "MatchResults":
+        """Matches [start, stop) as a MatchResults sharing this one's arrays (no copy)"""
+        return MatchResults(
+            self.indices[start:stop], self.scores[start:stop], self._doc_ids, self.threshold, self.stats
+        )
+
+    def doc_id(self, i: int) -> str:
+        """Doc ID of the i-th match (resolved on demand)"""
+        return self._doc_ids[self.indices[i]]
+
+    def doc_id_list(self) -> List[str]:
+        """Doc IDs of all matches, best first"""
+        return [self._doc_ids[index] for index in self.indices.tolist()]
+
+    def to_list(self) -> List[Tuple[str, float]]:
+        """Old-style list of (doc_id, score) tuples, sorted by score"""
+        return list(self)
@@ -0,0 +1,300 @@
+"""
+Neighbor Graph - the k most similar documents of every document, precomputed
+
+"More like this document" doesn't need the document's text at all: its
+TF-IDF row is already in corpus_vectors, so it can be scored against the
+corpus directly. Doing that for every document once, offline, gives a
+k-nearest-neighbor graph:
+
+    neighbors[row]  - int32 rows of the k most similar documents, best first
+    scores[row]     - their float32 similarities
+
+after which a lookup is two array reads of length k. Both arrays are plain
+n x k arrays, so they are saved with the index and memory-mapped like the
+rest of it. Rows with fewer than k similar documents (similarity > 0) are
+padded with EMPTY.
+
+Building walks the corpus in tiles like duplicates.py (block_size rows
+against block_size columns at a time), keeping a running top-k per row, so
+memory stays bounded however big the corpus is. Ordering is the same as
+everywhere else: descending score, ties in document order.
+
+Updates are incremental and give exactly what a rebuild would:
+    add_rows()    - the new rows get a full top-k; an old row's list can
+                    only change by a new document beating its k-th score,
+                    so old rows are only scored against the new ones
+    remove_rows() - only rows that listed a removed document lose a
+                    neighbor and need a new k-th one; just those are redone
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+try:
+    from .duplicates import _row_block
+    from .quantized import QuantizedCSR, to_float
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from duplicates import _row_block
+    from quantized import QuantizedCSR, to_float
+
+# padding in neighbors for rows with fewer than k similar documents
+EMPTY = -1
+
+
+def _scoring_matrix(matrix) -> sparse.csr_matrix:
+    """corpus_vectors as a float CSR matrix (int8 is widened to float32, like duplicates.py)"""
+    if isinstance(matrix, QuantizedCSR):
+        return to_float(matrix, np.float32)
+    return matrix
+
+
+def _tile_top_k(tile: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The k best columns of every tile row, in column order
+
+    Same rule as selection.select_top(), for all rows at once: everything
+    above the k-th best value, then ties at the k-th value in column order.
+    """
+    n_rows, n_columns = tile.shape
+    if n_columns <= k:
+        return np.broadcast_to(np.arange(n_columns), tile.shape), tile
+    kth_value = -np.partition(-tile, k - 1, axis=1)[:, k - 1:k]
+    above = tile > kth_value
+    ties = tile == kth_value
+    n_ties = k - np.count_nonzero(above, axis=1)
+    chosen = above | (ties & (np.cumsum(ties, axis=1) <= n_ties[:, None]))
+    columns = np.nonzero(chosen)[1].reshape(n_rows, k)
+    return columns, np.take_along_axis(tile, columns, axis=1)
+
+
+def _merge(
+    neighbors: np.ndarray,
+    scores: np.ndarray,
+    more_neighbors: np.ndarray,
+    more_scores: np.ndarray,
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k of two candidate lists per row (descending score, then ascending row)"""
+    neighbors = np.concatenate((neighbors, more_neighbors), axis=1)
+    scores = np.concatenate((scores, more_scores), axis=1)
+    order = np.lexsort((neighbors, -scores), axis=1)[:, :k]
+    return np.take_along_axis(neighbors, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def _as_candidates(neighbors: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Stored lists back into merge form (padding scores -inf so they always lose)"""
+    neighbors = neighbors.astype(np.int64)
+    scores = np.where(neighbors == EMPTY, -np.inf, scores).astype(np.float32)
+    return neighbors, scores
+
+
+def _finish(neighbors: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge form into stored form: n x k int32 / float32, EMPTY where nothing is similar"""
+    n_rows = neighbors.shape[0]
+    if neighbors.shape[1] < k:
+        pad = k - neighbors.shape[1]
+        neighbors = np.concatenate((neighbors, np.full((n_rows, pad), EMPTY)), axis=1)
+        scores = np.concatenate((scores, np.full((n_rows, pad), -np.inf, dtype=np.float32)), axis=1)
+    missing = np.isneginf(scores)
+    return (
+        np.where(missing, EMPTY, neighbors).astype(np.int32),
+        np.where(missing, 0, scores).astype(np.float32)
+    )
+
+
+def top_k_neighbors(
+    rows: sparse.csr_matrix,
+    row_ids: np.ndarray,
+    matrix: sparse.csr_matrix,
+    k: int,
+    block_size: int,
+    first_column: int = 0,
+    deleted: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k most similar rows of matrix for each of the given rows
+
+    Args:
+        rows: the query rows (taken from matrix)
+        row_ids: their row numbers in matrix (a row is never its own neighbor)
+        matrix: L2-normalized float CSR matrix
+        k: neighbors per row
+        block_size: matrix rows scored at a time
+        first_column: only rows first_column.. of matrix are candidates
+        deleted: optional bool mask of rows that can't be neighbors
+
+    Returns:
+        (neighbors, scores) in merge form: int64 / float32 arrays of
+        len(rows) x up to k, -inf scores where there was no candidate
+    """
+    neighbors = np.empty((rows.shape[0], 0), dtype=np.int64)
+    scores = np.empty((rows.shape[0], 0), dtype=np.float32)
+    for start in range(first_column, matrix.shape[0], block_size):
+        end = min(start + block_size, matrix.shape[0])
+        tile = (rows @ _row_block(matrix, start, end).T).toarray().astype(np.float32)
+        # nothing in common (or removed, or the row itself) is no neighbor
+        tile[tile <= 0] = -np.inf
+        if deleted is not None:
+            tile[:, deleted[start:end]] = -np.inf
+        own = np.flatnonzero((row_ids >= start) & (row_ids < end))
+        tile[own, row_ids[own] - start] = -np.inf
+
+        columns, tile_scores = _tile_top_k(tile, k)
+        neighbors, scores = _merge(neighbors, scores, columns + start, tile_scores, k)
+    return neighbors, scores
+
+
+class NeighborGraph:
+    """
+    Precomputed k nearest neighbors of every row of a TF-IDF matrix
+
+    Attributes:
+        neighbors: int32 array (n_rows x k), best neighbor first, EMPTY padded
+        scores: float32 array (n_rows x k), their similarities (0 for EMPTY)
+    """
+
+    def __init__(self, neighbors: np.ndarray, scores: np.ndarray):
+        self.neighbors = neighbors
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(
+        cls,
+        matrix,
+        k: int = 10,
+        block_size: int = 1000,
+        deleted: Optional[np.ndarray] = None
+    ) -> "NeighborGraph":
+        """
+        Score every row against every other row and keep the best k
+
+        Args:
+            matrix: corpus_vectors in any storage mode
+            k: neighbors per row
+            block_size: rows per tile; memory is about block_size^2 scores
+            deleted: optional bool mask of removed rows (no neighbors, not listed)
+
+        Returns:
+            NeighborGraph with one row per matrix row
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        matrix = _scoring_matrix(matrix)
+        pieces = [
+            _finish(*cls._top_k_range(matrix, start, min(start + block_size, matrix.shape[0]),
+                                      k, block_size, 0, deleted), k)
+            for start in range(0, matrix.shape[0], block_size)
+        ]
+        graph = cls(*cls._stack(pieces, k))
+        graph._clear(deleted)
+        return graph
+
+    @staticmethod
+    def _top_k_range(matrix, start: int, end: int, k: int, block_size: int, first_column: int, deleted):
+        """top_k_neighbors() for the contiguous rows [start, end)"""
+        return top_k_neighbors(
+            _row_block(matrix, start, end), np.arange(start, end), matrix, k, block_size, first_column, deleted
+        )
+
+    @staticmethod
+    def _stack(pieces, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatenate per-block (neighbors, scores) in stored form"""
+        if not pieces:
+            return np.empty((0, k), dtype=np.int32), np.empty((0, k), dtype=np.float32)
+        return np.concatenate([n for n, _ in pieces]), np.concatenate([s for _, s in pieces])
+
+    def _writable(self):
+        """Copy the arrays into RAM if they're memory-mapped from a saved index"""
+        if not self.neighbors.flags.writeable:
+            self.neighbors = np.array(self.neighbors)
+            self.scores = np.array(self.scores)
+
+    def _clear(self, rows):
+        """Empty the lists of the given rows (bool mask or row numbers)"""
+        if rows is None:
+            return
+        self._writable()
+        self.neighbors[rows] = EMPTY
+        self.scores[rows] = 0
+
+    def lookup(self, row: int, k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbors of one row
+
+        Args:
+            row: matrix row
+            k: at most this many (default: all k stored)
+
+        Returns:
+            (rows, scores), best first, without the EMPTY padding
+        """
+        neighbors = self.neighbors[row, :k]
+        n_valid = int(np.count_nonzero(neighbors != EMPTY))
+        return neighbors[:n_valid], self.scores[row, :n_valid]
+
+    def add_rows(self, matrix, first_new: int, block_size: int = 1000, deleted: Optional[np.ndarray] = None):
+        """
+        Extend the graph after rows first_new.. were appended to the matrix
+
+        The existing rows must be unchanged (same vectors as the graph was
+        built from), which holds as long as the IDF wasn't reweighted.
+
+        Args:
+            matrix: corpus_vectors including the new rows
+            first_new: number of rows the graph covered so far
+            block_size: rows per tile
+            deleted: optional bool mask of removed rows
+        """
+        if first_new != self.neighbors.shape[0]:
+            raise ValueError(f"Graph has {self.neighbors.shape[0]} rows, expected {first_new}")
+        matrix = _scoring_matrix(matrix)
+        k = self.k
+
+        # old rows: only a new document can displace one of their neighbors
+        old = []
+        for start in range(0, first_new, block_size):
+            end = min(start + block_size, first_new)
+            new_neighbors, new_scores = self._top_k_range(matrix, start, end, k, block_size, first_new, deleted)
+            merged = _merge(*_as_candidates(self.neighbors[start:end], self.scores[start:end]),
+                            new_neighbors, new_scores, k)
+            old.append(_finish(*merged, k))
+
+        # new rows: full top-k over the whole matrix
+        new = [
+            _finish(*self._top_k_range(matrix, start, min(start + block_size, matrix.shape[0]),
+                                       k, block_size, 0, deleted), k)
+            for start in range(first_new, matrix.shape[0], block_size)
+        ]
+        self.neighbors, self.scores = self._stack(old + new, k)
+        self._clear(deleted)
+
+    def remove_rows(self, matrix, rows: np.ndarray, deleted: np.ndarray, block_size: int = 1000):
+        """
+        Update the graph after rows were removed (tombstoned) from the matrix
+
+        Args:
+            matrix: corpus_vectors (removed rows still in place)
+            rows: the rows just removed
+            deleted: bool mask of all removed rows, including these
+            block_size: rows per tile
+        """
+        matrix = _scoring_matrix(matrix)
+        k = self.k
+        self._clear(rows)
+
+        # rows that listed a removed document are missing a neighbor: redo just those
+        stale = np.flatnonzero(np.isin(self.neighbors, rows).any(axis=1) & ~deleted)
+        for start in range(0, len(stale), block_size):
+            chunk = stale[start:start + block_size]
+            neighbors, scores = _finish(
+                *top_k_neighbors(matrix[chunk], chunk, matrix, k, block_size, 0, deleted), k
+            )
+            self.neighbors[chunk] = neighbors
+            self.scores[chunk] = scores
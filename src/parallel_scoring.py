@@ -0,0 +1,215 @@
+"""
+Parallel Scoring - sharded similarity scoring across a process pool
+
+The corpus TF-IDF matrix is split into row shards, and each worker process
+scores whole shards against the query. The matrix itself is never sent to
+the workers: its CSR arrays either live in shared memory
+(multiprocessing.shared_memory) or are memory-mapped from a saved index
+directory, and every worker attaches to them once when it starts.
+Per query, only the (tiny) query vector goes out and one block of
+scores per shard comes back.
+
+Each shard computes exactly what the serial matmul engine computes for its
+rows, so concatenating the shard scores gives the serial similarity vector
+bit for bit. Thresholding and sorting then happen once, in the parent.
+"""
+
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+# names of the CSR arrays, also the .npy file names inside a saved index
+CSR_ARRAYS = ("data", "indices", "indptr")
+
+
+def _attach_shared(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing shared memory block without taking ownership of it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag. Pool workers share the parent's resource
+        # tracker, where the block is already registered, so registering again is a no-op
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedCSR:
+    """
+    Copy of a CSR matrix's arrays in shared memory
+
+    The creating process owns the blocks and unlinks them in close().
+    spec is a small picklable description other processes pass to attach_csr().
+    """
+
+    def __init__(self, matrix):
+        self._blocks = []
+        arrays = {}
+        for name in CSR_ARRAYS:
+            source = getattr(matrix, name)
+            # size=0 isn't allowed for shared memory, so always ask for at least 1 byte
+            block = shared_memory.SharedMemory(create=True, size=max(source.nbytes, 1))
+            np.ndarray(source.shape, dtype=source.dtype, buffer=block.buf)[:] = source
+            self._blocks.append(block)
+            arrays[name] = ("shm", block.name, source.dtype.str, source.shape[0])
+
+        self.spec = {"shape": matrix.shape, "arrays": arrays}
+
+    def close(self):
+        """Release and unlink the shared memory blocks"""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def index_spec(index_path: str, shape: Tuple[int, int]) -> dict:
+    """Spec that makes workers memory-map the CSR arrays of a saved index instead"""
+    arrays = {name: ("file", os.path.join(index_path, f"{name}.npy")) for name in CSR_ARRAYS}
+    return {"shape": tuple(shape), "arrays": arrays}
+
+
+def attach_csr(spec: dict) -> Tuple[sparse.csr_matrix, list]:
+    """
+    Rebuild the CSR matrix described by spec without copying its arrays
+
+    Returns:
+        (matrix, handles) - keep handles alive as long as the matrix is used
+    """
+    arrays = {}
+    handles = []
+    for name, source in spec["arrays"].items():
+        if source[0] == "shm":
+            _, block_name, dtype, length = source
+            block = _attach_shared(block_name)
+            handles.append(block)
+            arrays[name] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+        else:
+            arrays[name] = np.load(source[1], mmap_mode="r")
+
+    matrix = sparse.csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]),
+        shape=tuple(spec["shape"]),
+        copy=False
+    )
+    matrix.has_sorted_indices = True
+    return matrix, handles
+
+
+def shard_bounds(indptr: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """
+    Split rows into n_shards contiguous ranges with about the same nnz each
+
+    Balancing on nonzeros rather than row count keeps the work per shard even
+    when document lengths vary a lot.
+    """
+    n_rows = len(indptr) - 1
+    targets = np.linspace(0, indptr[-1], n_shards + 1)
+    cuts = np.searchsorted(indptr, targets[1:-1], side="left")
+    edges = np.unique(np.concatenate(([0], cuts, [n_rows])))
+    return [(int(start), int(end)) for start, end in zip(edges[:-1], edges[1:])]
+
+
+# per-worker state, set up once by _init_worker()
+_worker: Dict[str, object] = {}
+
+
+def _init_worker(spec: dict, bounds: List[Tuple[int, int]]):
+    """Pool initializer: attach to the shared matrix and cut it into shard views"""
+    matrix, handles = attach_csr(spec)
+    shards = []
+    for start, end in bounds:
+        lo, hi = matrix.indptr[start], matrix.indptr[end]
+        shard = sparse.csr_matrix(
+            (matrix.data[lo:hi], matrix.indices[lo:hi], matrix.indptr[start:end + 1] - lo),
+            shape=(end - start, matrix.shape[1]),
+            copy=False
+        )
+        shard.has_sorted_indices = True
+        shards.append(shard)
+
+    _worker["handles"] = handles
+    _worker["shards"] = shards
+
+
+def _score_shard(shard_id: int, query_data, query_indices, query_indptr, query_shape) -> np.ndarray:
+    """Worker task: similarities of every query against one shard, shape (n_queries, shard_rows)"""
+    queries = sparse.csr_matrix((query_data, query_indices, query_indptr), shape=query_shape)
+    shard = _worker["shards"][shard_id]
+    # same expression as DocumentMatcher._score(), so the numbers are identical
+    return (shard @ queries.T).T.toarray()
+
+
+def _shutdown(executor: ProcessPoolExecutor, shared: Optional[SharedCSR]):
+    executor.shutdown(wait=True)
+    if shared is not None:
+        shared.close()
+
+
+class ShardedScorer:
+    """
+    Scores queries against row shards of the corpus in a process pool
+
+    Usage:
+        scorer = ShardedScorer(corpus_vectors, n_workers=8)
+        similarities = scorer.score(query_vectors)   # (n_queries, n_docs)
+        scorer.close()
+    """
+
+    def __init__(self, corpus_vectors, n_workers: Optional[int] = None, index_path: Optional[str] = None):
+        """
+        Args:
+            corpus_vectors: fitted CSR TF-IDF matrix
+            n_workers: worker processes (default: all CPUs); one shard per worker
+            index_path: saved index directory holding exactly this matrix; workers
+                then memory-map it from disk instead of going through shared memory
+        """
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.n_docs = corpus_vectors.shape[0]
+        self.dtype = corpus_vectors.dtype
+        self.bounds = shard_bounds(corpus_vectors.indptr, self.n_workers)
+
+        if index_path is not None:
+            self._shared = None
+            spec = index_spec(index_path, corpus_vectors.shape)
+        else:
+            self._shared = SharedCSR(corpus_vectors)
+            spec = self._shared.spec
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_workers,
+            initializer=_init_worker,
+            initargs=(spec, self.bounds)
+        )
+        # make sure the pool and the shared memory go away even without close()
+        self._finalizer = weakref.finalize(self, _shutdown, self._executor, self._shared)
+
+    def score(self, query_vectors) -> np.ndarray:
+        """
+        Similarity of each query row against every document
+
+        Returns:
+            dense array of shape (n_queries, n_docs), identical to the serial result
+        """
+        # queries in the corpus precision, so float32 shards aren't upcast per query
+        query_vectors = sparse.csr_matrix(query_vectors, dtype=self.dtype)
+        args = (query_vectors.data, query_vectors.indices, query_vectors.indptr, query_vectors.shape)
+        futures = [
+            self._executor.submit(_score_shard, shard_id, *args)
+            for shard_id in range(len(self.bounds))
+        ]
+        try:
+            # shards are contiguous row ranges in order, so concatenating restores row order
+            return np.concatenate([future.result() for future in futures], axis=1)
+        except BaseException:
+            # don't leave the other shards running (shutdown(cancel_futures=) is 3.9+)
+            for future in futures:
+                future.cancel()
+            raise
+
+    def close(self):
+        """Stop the worker pool and free the shared memory"""
+        self._finalizer()
@@ -0,0 +1,269 @@
+"""
+Postings Index - term-at-a-time scoring over an inverted index
+
+The TF-IDF matrix is stored row-major (one row per document). Transposing it
+to column-major (CSC) gives a classic inverted index: for every term, the
+list of documents that contain it (its "postings") and their TF-IDF weights.
+
+A query only has a handful of terms, so instead of multiplying against every
+document we walk just those terms' postings lists and add up
+    query_weight(term) * doc_weight(term)
+per document. The work is proportional to the number of postings touched,
+not to the corpus size, and documents that share no term with the query
+are never looked at (their similarity is exactly 0).
+
+The postings can also hold int8 quantized weights (see quantized.py); each
+document's sum is then multiplied by its row scale once, at the end.
+
+top_k() answers "the k best documents" without scoring every document that
+shares a term (MaxScore-style dynamic pruning). Each term's largest weight
+bounds what it can add to any score. Terms are walked from the largest bound
+down, keeping partial sums; once the bounds of the terms left add up to less
+than the k-th best partial sum, no unseen document can make the top k, and a
+seen one whose partial sum plus that rest is below it can't either. Only the
+survivors are fully scored, in the same order as score(), so their scores are
+bit-identical to the exhaustive ones.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# relative slack on the pruning bounds: partial sums are added up in a
+# different order than the final scores, so they can differ in the last bits
+# and a bound must never end up below the score it bounds
+BOUND_SLACK = 1e-6
+
+
+class PostingsIndex:
+    """
+    Column-major view of the corpus TF-IDF matrix
+
+    Attributes:
+        indptr: postings of term t are positions indptr[t]:indptr[t+1]
+        doc_indices: document (row) index of each posting, ascending per term
+        weights: TF-IDF weight of each posting
+        row_scales: per-document scale for quantized weights (None for float weights)
+        n_docs: number of documents in the corpus
+    """
+
+    def __init__(self, corpus_vectors, row_scales: Optional[np.ndarray] = None):
+        """
+        Args:
+            corpus_vectors: fitted (n_docs x n_terms) sparse TF-IDF matrix
+            row_scales: if given, corpus_vectors holds quantized integer weights
+                and a document's real weights are its row times row_scales[doc]
+        """
+        postings = corpus_vectors.tocsc()
+        postings.sort_indices()
+
+        self.indptr = postings.indptr
+        self.doc_indices = postings.indices
+        self.weights = postings.data
+        self.row_scales = row_scales
+        self.n_docs = postings.shape[0]
+        # integer weights are summed in float32, float weights in their own precision
+        self.score_dtype = np.result_type(self.weights.dtype, np.float32)
+
+        # largest real (scaled) weight of every term, the per-term bound top_k() prunes with
+        real_weights = self.weights.astype(np.float64)
+        if row_scales is not None:
+            real_weights *= row_scales[self.doc_indices]
+        self.max_weights = np.zeros(len(self.indptr) - 1)
+        non_empty = np.flatnonzero(np.diff(self.indptr))
+        if len(non_empty):
+            self.max_weights[non_empty] = np.maximum.reduceat(real_weights, self.indptr[non_empty])
+
+        # per-thread scratch accumulator, see _accumulator()
+        self._local = threading.local()
+
+    def _accumulator(self) -> np.ndarray:
+        """
+        Zeroed score buffer for the calling thread
+
+        Allocated once and reused: score() only ever reads and resets the
+        entries it touched, so it never scans or sorts all n_docs slots.
+        One buffer per thread keeps concurrent queries from clobbering each other.
+        """
+        accumulator = getattr(self._local, "accumulator", None)
+        if accumulator is None:
+            accumulator = np.zeros(self.n_docs, dtype=self.score_dtype)
+            self._local.accumulator = accumulator
+        return accumulator
+
+    def _seen_mask(self) -> np.ndarray:
+        """All-False document mask for the calling thread, reused like _accumulator()"""
+        mask = getattr(self._local, "seen_mask", None)
+        if mask is None:
+            mask = np.zeros(self.n_docs, dtype=bool)
+            self._local.seen_mask = mask
+        return mask
+
+    def score(self, term_ids: np.ndarray, term_weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Accumulate similarity scores term-at-a-time
+
+        Args:
+            term_ids: column indices of the query's terms (ascending)
+            term_weights: query TF-IDF weight for each of those terms
+
+        Returns:
+            (doc_indices, scores, postings_touched) - the documents sharing at
+            least one term with the query (ascending) and their similarity;
+            every other document scores exactly 0
+        """
+        accumulator = self._accumulator()
+        as_score = accumulator.dtype.type
+        touched_lists = []
+        postings_touched = 0
+
+        # terms in ascending order, so every document's score is summed in the
+        # same order as the sparse matrix product - results are bit-identical
+        for term, weight in zip(term_ids.tolist(), term_weights.tolist()):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            if start == end:
+                continue
+            docs = self.doc_indices[start:end]
+            # a document appears at most once per postings list, so fancy-index += is safe
+            accumulator[docs] += as_score(weight) * self.weights[start:end]
+            touched_lists.append(docs)
+            postings_touched += end - start
+
+        if not touched_lists:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=accumulator.dtype), 0
+
+        touched = np.unique(np.concatenate(touched_lists))
+        scores = accumulator[touched]
+        # reset only what we used, ready for the next query
+        accumulator[touched] = 0
+        if self.row_scales is not None:
+            scores *= self.row_scales[touched]
+        return touched, scores, int(postings_touched)
+
+    def n_postings(self, term_ids: np.ndarray) -> int:
+        """Total postings of some terms - an upper bound on the documents sharing one of them"""
+        return int(np.sum(self.indptr[term_ids + 1] - self.indptr[term_ids]))
+
+    def top_k(
+        self,
+        term_ids: np.ndarray,
+        term_weights: np.ndarray,
+        k: int,
+        deleted: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Exact k best documents, skipping the ones that provably can't make it
+
+        Args:
+            term_ids: column indices of the query's terms (ascending)
+            term_weights: query TF-IDF weight for each of those terms
+            k: number of documents wanted
+            deleted: optional boolean mask of removed documents (never returned)
+
+        Returns:
+            (doc_indices, scores, counts) - the documents scoring at least the
+            k-th best score (more than k on ties at the boundary, fewer if
+            fewer than k documents share a term), best first with ties in
+            document order; counts has "candidates" (documents that got a
+            partial score), "fully_scored" and "postings_touched"
+        """
+        if k <= 0 or not len(term_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=self.score_dtype), {
+                "candidates": 0, "fully_scored": 0, "postings_touched": 0
+            }
+
+        accumulator = self._accumulator()
+        seen_mask = self._seen_mask()
+        as_score = accumulator.dtype.type
+        bounds = np.asarray(term_weights, dtype=np.float64) * self.max_weights[term_ids] * (1 + BOUND_SLACK)
+        order = np.argsort(-bounds, kind="stable")
+        # rest[i] = most the terms after the i-th (in bound order) can still add
+        rest = np.append(np.cumsum(bounds[order][::-1])[::-1][1:], 0.0)
+
+        seen_lists = []
+        n_seen = 0
+        postings_touched = 0
+        kth_partial = 0.0
+        added = 0.0     # bound mass walked since kth_partial was last measured
+        remaining = 0.0
+        for position, i in enumerate(order.tolist()):
+            term = term_ids[i]
+            start, end = self.indptr[term], self.indptr[term + 1]
+            if start == end:
+                continue
+            docs = self.doc_indices[start:end]
+            accumulator[docs] += as_score(term_weights[i]) * self.weights[start:end]
+            new = docs[~seen_mask[docs]]
+            seen_mask[new] = True
+            seen_lists.append(new)
+            n_seen += len(new)
+            postings_touched += end - start
+            remaining = rest[position]
+            added += bounds[i]
+
+            # the k-th best partial sum grows by at most the bounds walked since it was
+            # measured, so it's only worth measuring again once that could stop the walk
+            if n_seen < k or remaining >= kth_partial + added:
+                continue
+            seen = np.concatenate(seen_lists)
+            seen_lists = [seen]
+            live = seen if deleted is None else seen[~deleted[seen]]
+            if len(live) < k:
+                continue
+            partial = self._real(accumulator[live], live)
+            kth_partial = float(np.partition(partial, len(live) - k)[len(live) - k]) * (1 - BOUND_SLACK)
+            added = 0.0
+            if remaining < kth_partial:
+                # the terms left can't lift an unseen document up to the k-th best
+                break
+
+        seen = np.concatenate(seen_lists) if seen_lists else np.empty(0, dtype=self.doc_indices.dtype)
+        seen.sort()
+        candidates = seen if deleted is None else seen[~deleted[seen]]
+        if kth_partial > 0:
+            upper = self._real(accumulator[candidates], candidates) * (1 + BOUND_SLACK) + remaining
+            candidates = candidates[upper >= kth_partial]
+        accumulator[seen] = 0
+        seen_mask[seen] = False
+
+        # full scores of the survivors, terms in ascending order like score() (so the
+        # same float additions in the same order); short candidate lists are looked up
+        # in each postings list by binary search, long ones marked and picked out of it
+        pick = len(candidates) * 8 >= n_seen
+        if pick:
+            seen_mask[candidates] = True
+        for term, weight in zip(term_ids.tolist(), term_weights.tolist()):
+            start, end = self.indptr[term], self.indptr[term + 1]
+            if start == end or not len(candidates):
+                continue
+            docs = self.doc_indices[start:end]
+            if pick:
+                hit = seen_mask[docs]
+                accumulator[docs[hit]] += as_score(weight) * self.weights[start:end][hit]
+                postings_touched += end - start
+            else:
+                positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                hit = docs[positions] == candidates
+                accumulator[candidates[hit]] += as_score(weight) * self.weights[start + positions[hit]]
+                postings_touched += len(candidates)
+        seen_mask[candidates] = False
+        scores = accumulator[candidates]
+        accumulator[candidates] = 0
+        if self.row_scales is not None:
+            scores *= self.row_scales[candidates]
+
+        n_scored = len(candidates)
+        if n_scored > k:
+            kth_value = np.partition(scores, len(scores) - k)[len(scores) - k]
+            keep = scores >= kth_value
+            candidates, scores = candidates[keep], scores[keep]
+        best_first = np.argsort(-scores, kind="stable")
+        counts = {"candidates": len(seen), "fully_scored": n_scored, "postings_touched": int(postings_touched)}
+        return candidates[best_first].astype(np.int64), scores[best_first], counts
+
+    def _real(self, sums: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        """Scaled (real) values of some documents' accumulated sums"""
+        if self.row_scales is None:
+            return sums.astype(np.float64)
+        return sums * self.row_scales[docs].astype(np.float64)
@@ -0,0 +1,294 @@
+"""
+Quantile Sketch - percentile thresholds without the whole score vector
+
+np.percentile (and percentile_threshold) needs all N similarities of a
+query in memory at once. A QuantileSketch is a KLL sketch (Karnin, Lang,
+Liberty 2016): scores are fed in block by block and it keeps only a few
+hundred of them, each standing for 2^h of the originals:
+
+    level 0: scores as they come in            (weight 1)
+    level 1: every other one of a full level 0 (weight 2)
+    level h: ...                               (weight 2^h)
+
+When a level is over its capacity it's sorted and every other value (odd
+or even positions, picked at random) moves up a level with twice the
+weight. Each of those compactions moves any rank by at most its weight,
+and the random offsets make the errors cancel out, so a rank (and so a
+percentile) is off by at most about error * N values with high
+probability. Capacities shrink by 2/3 per level down from the top one, so
+memory is O(k + log N) whatever N is. Sketches with the same error merge
+into one sketch of both inputs (shard nodes each send theirs).
+
+sketched_matches() is the find_matches() pipeline on top of it, for a
+corpus scored in row blocks:
+
+    pass 1: score a block -> update the sketch, keep the best buffer_size
+            scores seen so far (and the best score that didn't fit)
+    threshold = sketch percentile
+    pass 2: only when the buffer can't hold every match - rescore the
+            blocks and collect the rows >= threshold (at most top_k of them)
+
+So scoring needs one block of scores plus the sketch and the buffer,
+independent of the corpus size. The threshold is approximate: the
+documents returned are those above a value whose rank is within
+error * N of the exact percentile's.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from .quantized import row_block, score_matrix
+    from .selection import interpolate_percentile, select_top
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from quantized import row_block, score_matrix
+    from selection import interpolate_percentile, select_top
+
+# k = ERROR_CONSTANT / error keeps the rank error under error * N with room to spare
+# (measured on uniform, skewed and mostly-zero score distributions)
+ERROR_CONSTANT = 4.0
+DEFAULT_ERROR = 0.005
+BLOCK_ROWS = 4096      # rows scored at a time by sketched_matches()
+BUFFER_SIZE = 4096     # best scores kept during the first pass
+MIN_CAPACITY = 2
+SHRINK = 2 / 3
+
+
+class QuantileSketch:
+    """
+    Mergeable KLL sketch of a stream of scores
+
+    Usage:
+        sketch = QuantileSketch(error=0.005)
+        for block in blocks:
+            sketch.update(block)
+        threshold = sketch.percentile(90)
+    """
+
+    def __init__(self, error: float = DEFAULT_ERROR, seed: int = 0):
+        """
+        Args:
+            error: rank error as a fraction of the number of values
+                (0.005 = the percentile is within 0.5% of N positions)
+            seed: for the compaction offsets, so results are reproducible
+        """
+        if not 0 < error < 1:
+            raise ValueError("error must be between 0 and 1")
+        self.error = error
+        self.k = max(MIN_CAPACITY, math.ceil(ERROR_CONSTANT / error))
+        self.n = 0              # values seen (total weight)
+        self._levels = [np.zeros(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None     # (values, cumulative weights), rebuilt after updates
+
+    @property
+    def n_retained(self) -> int:
+        """Number of values the sketch actually holds"""
+        return sum(len(level) for level in self._levels)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self._levels)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - 1 - level
+        return max(MIN_CAPACITY, math.ceil(self.k * SHRINK ** depth))
+
+    def update(self, values: np.ndarray):
+        """Add a block of values"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if not len(values):
+            return
+        self._levels[0] = np.concatenate((self._levels[0], values))
+        self.n += len(values)
+        self._compress()
+
+    def update_repeated(self, value: float, count: int):
+        """
+        Add the same value count times without materializing them
+
+        count is split into powers of two and each goes straight to its
+        level (one item of weight 2^h), so e.g. a million zeros cost a few
+        items. Nothing goes above the levels a stream of that many values
+        would reach: extra levels would shrink every capacity below them.
+        """
+        if count <= 0:
+            return
+        self.n += count
+        top = max(len(self._levels), (self.n // self.k).bit_length()) - 1
+        while len(self._levels) <= top:
+            self._levels.append(np.zeros(0))
+        for level in range(top):
+            if count >> level & 1:
+                self._levels[level] = np.append(self._levels[level], float(value))
+        # whatever is left of count in units of the top level's weight
+        self._levels[top] = np.concatenate((self._levels[top], np.full(count >> top, float(value))))
+        self._compress()
+
+    def merge(self, other: "QuantileSketch"):
+        """Add everything another sketch (with the same error) has seen"""
+        if other.k != self.k:
+            raise ValueError("Can only merge sketches with the same error")
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.zeros(0))
+        for level, values in enumerate(other._levels):
+            self._levels[level] = np.concatenate((self._levels[level], values))
+        self.n += other.n
+        self._compress()
+
+    def _compress(self):
+        """Compact every level over its capacity, from the bottom up"""
+        self._sorted = None
+        level = 0
+        while level < len(self._levels):
+            values = self._levels[level]
+            if len(values) > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.zeros(0))
+                values = np.sort(values)
+                # an odd one out stays behind, the rest halves into the next level
+                keep = len(values) % 2
+                offset = int(self._rng.integers(2))
+                promoted = values[keep + offset::2]
+                self._levels[level] = values[:keep]
+                self._levels[level + 1] = np.concatenate((self._levels[level + 1], promoted))
+            level += 1
+
+    def _sorted_values(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._sorted is None:
+            values = np.concatenate(self._levels)
+            weights = np.concatenate([
+                np.full(len(level), 2 ** h, dtype=np.int64) for h, level in enumerate(self._levels)
+            ])
+            order = np.argsort(values, kind="stable")
+            self._sorted = (values[order], np.cumsum(weights[order]))
+        return self._sorted
+
+    def order_statistic(self, rank: int) -> float:
+        """
+        Approximate rank-th smallest value (rank counts from 0)
+
+        Exact while nothing has been compacted (n <= k).
+        """
+        if self.n == 0:
+            raise ValueError("Cannot compute a percentile of an empty distribution")
+        values, cumulative = self._sorted_values()
+        position = int(np.searchsorted(cumulative, rank, side="right"))
+        return float(values[min(position, len(values) - 1)])
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Approximate np.percentile of everything seen
+
+        Same positions and interpolation as percentile_threshold(), with the
+        order statistics read from the sketch.
+        """
+        if self.n == 0:
+            raise ValueError("Cannot compute a percentile of an empty distribution")
+        return interpolate_percentile(self.order_statistic, self.n, percentile)
+
+
+def _keep_best(indices: np.ndarray, scores: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    The best size entries, still in document order, and the best score left out
+
+    Same rule as select_top(): everything above the size-th best value,
+    then ties at that value in document order (indices must be ascending).
+
+    Returns:
+        (indices, scores, best dropped score or -inf if nothing was dropped)
+    """
+    if len(scores) <= size:
+        return indices, scores, -np.inf
+    cut = len(scores) - size
+    partitioned = np.partition(scores, cut)
+    kth_value = partitioned[cut]
+    chosen = scores > kth_value
+    n_ties = size - int(np.count_nonzero(chosen))
+    chosen[np.flatnonzero(scores == kth_value)[:n_ties]] = True
+    return indices[chosen], scores[chosen], float(partitioned[:cut].max())
+
+
+def sketched_matches(
+    matrix,
+    query_vector,
+    percentile: float,
+    top_k: Optional[int] = None,
+    error: float = DEFAULT_ERROR,
+    deleted: Optional[np.ndarray] = None,
+    block_rows: int = BLOCK_ROWS,
+    buffer_size: int = BUFFER_SIZE
+) -> Tuple[np.ndarray, np.ndarray, float, dict]:
+    """
+    Matches of one query with a sketched percentile threshold, scored in row blocks
+
+    Args:
+        matrix: corpus_vectors in any storage mode
+        query_vector: the query's TF-IDF row
+        percentile: 0-100, over every live document
+        top_k: optional cap on the number of matches
+        error: the sketch's rank error (fraction of the number of documents)
+        deleted: optional bool mask of removed rows (left out of everything)
+        block_rows: rows scored at a time
+        buffer_size: best scores kept during the first pass; if all the
+            matches are among them, the second pass is skipped
+
+    Returns:
+        (indices, scores, threshold, stats) - matches best first with ties in
+        document order, like select_top(); stats has candidates (nonzero
+        scores), passes and sketch_items
+    """
+    n_rows = matrix.shape[0]
+    # float32 and int8 storage score in float32
+    dtype = np.float64 if matrix.dtype == np.float64 else np.float32
+
+    def blocks():
+        for start in range(0, n_rows, block_rows):
+            end = min(start + block_rows, n_rows)
+            scores = score_matrix(row_block(matrix, start, end), query_vector)[0]
+            rows = np.arange(start, end)
+            if deleted is not None:
+                live = ~deleted[start:end]
+                rows, scores = rows[live], scores[live]
+            yield rows, scores
+
+    # pass 1: sketch every score, keep the best ones on the side
+    sketch = QuantileSketch(error)
+    buffer_rows, buffer_scores = np.zeros(0, dtype=np.intp), np.zeros(0, dtype=dtype)
+    left_out = -np.inf
+    candidates = 0
+    for rows, scores in blocks():
+        non_zero = scores[scores != 0]
+        candidates += len(non_zero)
+        sketch.update(non_zero)
+        sketch.update_repeated(0.0, len(scores) - len(non_zero))
+        buffer_rows, buffer_scores, dropped = _keep_best(
+            np.concatenate((buffer_rows, rows)), np.concatenate((buffer_scores, scores)), buffer_size
+        )
+        left_out = max(left_out, dropped)
+
+    threshold = sketch.percentile(percentile)
+    stats = {"candidates": candidates, "passes": 1, "sketch_items": sketch.n_retained}
+
+    # every match is in the buffer when nothing left out reaches the threshold,
+    # or (with top_k) when nothing left out reaches the buffer's top_k-th score
+    complete = left_out < threshold
+    if not complete and top_k is not None:
+        above = buffer_scores[buffer_scores >= threshold]
+        complete = len(above) >= top_k and np.partition(above, len(above) - top_k)[len(above) - top_k] > left_out
+    if not complete:
+        # pass 2: collect the rows >= threshold, bounded by top_k
+        stats["passes"] = 2
+        buffer_rows, buffer_scores = np.zeros(0, dtype=np.intp), np.zeros(0, dtype=dtype)
+        for rows, scores in blocks():
+            keep = scores >= threshold
+            buffer_rows = np.concatenate((buffer_rows, rows[keep]))
+            buffer_scores = np.concatenate((buffer_scores, scores[keep]))
+            if top_k is not None:
+                buffer_rows, buffer_scores, _ = _keep_best(buffer_rows, buffer_scores, top_k)
+
+    indices, scores = select_top(buffer_scores, threshold, top_k, indices=buffer_rows)
+    return indices, scores, threshold, stats
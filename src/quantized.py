@@ -0,0 +1,299 @@
+"""
+Compact Storage - reduced-precision and 8-bit quantized TF-IDF matrices
+
+TfidfVectorizer gives a float64 CSR matrix: 8 bytes per value plus 4-8 per
+column index. The values only need to rank documents, so less precision
+is fine:
+
+    float64 - as fitted (reference)
+    float32 - values cast to 4 bytes, scoring done in float32
+    int8    - each row scaled so its largest weight maps to 127, values
+              rounded to 1 byte, plus one float32 scale per row
+
+For an int8 row, weight ~= q * scale. A similarity is then
+    sum_t query_t * q_t * scale  =  scale * (query . q)
+so the kernels score the integer row as-is and apply the row scale once
+at the end. They never build a full-precision copy of the matrix.
+
+measure_drift() compares the rankings a compact matrix gives with the
+float64 ones, so the precision loss is a measured number rather than a guess.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+from scipy import sparse
+
+try:
+    from .parallel_scoring import shard_bounds
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from parallel_scoring import shard_bounds
+
+STORAGE_MODES = ("float64", "float32", "int8")
+
+# the int8 kernel converts this many stored values to float32 at a time,
+# which bounds its scratch memory independently of corpus size
+BLOCK_NNZ = 1 << 20
+# rows measure_drift() scores at a time
+DRIFT_BLOCK_ROWS = 4096
+
+
+class QuantizedCSR:
+    """
+    CSR matrix with int8 values and a float32 scale per row
+
+    Has the same shape/indices/indptr/nnz attributes as a scipy CSR matrix,
+    so code that only looks at the sparsity structure works unchanged.
+
+    Attributes:
+        data: int8 quantized values
+        indices, indptr: CSR structure (as in the source matrix)
+        scales: float32 per-row scale, value = data * scales[row]
+    """
+
+    def __init__(self, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, scales: np.ndarray, shape):
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.scales = scales
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_csr(cls, matrix) -> "QuantizedCSR":
+        """Quantize a CSR matrix row by row (largest absolute value of a row -> 127, zeros not stored)"""
+        matrix = sparse.csr_matrix(matrix)
+        lengths = np.diff(matrix.indptr)
+        nonempty = lengths > 0
+
+        row_max = np.zeros(matrix.shape[0], dtype=np.float64)
+        if matrix.nnz:
+            # reduceat misbehaves on empty segments, so only pass the starts of nonempty rows
+            row_max[nonempty] = np.maximum.reduceat(np.abs(matrix.data), matrix.indptr[:-1][nonempty])
+        scales = (row_max / 127).astype(np.float32)
+
+        # divide by the float32 scale that will be stored, so q * scale reproduces the max
+        divisor = np.where(scales > 0, scales, 1).astype(np.float64)
+        row_of = np.repeat(np.arange(matrix.shape[0]), lengths)
+        data = np.clip(np.rint(matrix.data / divisor[row_of]), -127, 127).astype(np.int8)
+
+        # weights under half a step round to 0: drop them, or the postings engines would
+        # see those rows as touched and rank their 0 scores ahead of the untouched ones
+        indices, indptr = matrix.indices, matrix.indptr
+        kept = data != 0
+        if not kept.all():
+            data, indices = data[kept], indices[kept]
+            counts = np.bincount(row_of[kept], minlength=matrix.shape[0])
+            indptr = np.concatenate(([0], np.cumsum(counts))).astype(matrix.indptr.dtype)
+
+        return cls(data, indices, indptr, scales, matrix.shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
+    def int_csr(self) -> sparse.csr_matrix:
+        """The integer values as a scipy CSR matrix (shares the arrays, no scales applied)"""
+        matrix = sparse.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape, copy=False)
+        matrix.has_sorted_indices = True
+        return matrix
+
+    def to_csr(self, dtype=np.float64) -> sparse.csr_matrix:
+        """Dequantized copy as a regular CSR matrix"""
+        row_of = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        data = self.data.astype(dtype) * self.scales[row_of].astype(dtype)
+        matrix = sparse.csr_matrix((data, self.indices.copy(), self.indptr.copy()), shape=self.shape)
+        matrix.has_sorted_indices = True
+        return matrix
+
+    def score(self, query_vectors, block_nnz: int = BLOCK_NNZ) -> np.ndarray:
+        """
+        Similarity of each query row against every stored row
+
+        Rows are processed in blocks of about block_nnz stored values: each
+        block's int8 values are widened to float32, multiplied with the queries
+        and scaled per row.
+
+        Returns:
+            float32 array of shape (n_queries, n_rows)
+        """
+        queries = sparse.csr_matrix(query_vectors, dtype=np.float32).T
+        out = np.empty((queries.shape[1], self.shape[0]), dtype=np.float32)
+        n_blocks = max(1, -(-self.nnz // block_nnz))
+
+        for start, end in shard_bounds(self.indptr, n_blocks):
+            lo, hi = self.indptr[start], self.indptr[end]
+            block = sparse.csr_matrix(
+                (self.data[lo:hi].astype(np.float32), self.indices[lo:hi], self.indptr[start:end + 1] - lo),
+                shape=(end - start, self.shape[1]),
+                copy=False
+            )
+            out[:, start:end] = (block @ queries).T.toarray() * self.scales[start:end]
+        return out
+
+    def score_rows(self, rows: np.ndarray, query_vector) -> np.ndarray:
+        """Similarity of one query against the given rows only"""
+        block = self.int_csr()[rows].astype(np.float32)
+        query = sparse.csr_matrix(query_vector, dtype=np.float32)
+        return (block @ query.T).T.toarray()[0] * self.scales[rows]
+
+
+def to_storage(matrix, storage: str):
+    """
+    Convert a CSR TF-IDF matrix (float64 or float32) to a storage mode
+
+    Returns:
+        float64/float32 CSR matrix, or a QuantizedCSR for "int8"
+    """
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_MODES}")
+    if storage == "int8":
+        return QuantizedCSR.from_csr(matrix)
+    if matrix.dtype != np.dtype(storage):
+        matrix = matrix.astype(storage)
+        matrix.has_sorted_indices = True
+    return matrix
+
+
+def to_float(matrix, dtype=np.float64) -> sparse.csr_matrix:
+    """Full-precision CSR matrix from any storage mode (no copy if it already is one)"""
+    if isinstance(matrix, QuantizedCSR):
+        return matrix.to_csr(dtype)
+    return matrix
+
+
+def score_matrix(matrix, query_vectors) -> np.ndarray:
+    """Dense (n_queries x n_rows) similarities for any storage mode"""
+    if isinstance(matrix, QuantizedCSR):
+        return matrix.score(query_vectors)
+    query_vectors = sparse.csr_matrix(query_vectors, dtype=matrix.dtype)
+    return np.ascontiguousarray((matrix @ query_vectors.T).T.toarray())
+
+
+def row_block(matrix, start: int, end: int):
+    """Rows [start, end) of a stored matrix in the same storage mode, as views (no copy of the arrays)"""
+    lo, hi = matrix.indptr[start], matrix.indptr[end]
+    indptr = matrix.indptr[start:end + 1] - lo
+    shape = (end - start, matrix.shape[1])
+    if isinstance(matrix, QuantizedCSR):
+        return QuantizedCSR(matrix.data[lo:hi], matrix.indices[lo:hi], indptr, matrix.scales[start:end], shape)
+    block = sparse.csr_matrix((matrix.data[lo:hi], matrix.indices[lo:hi], indptr), shape=shape, copy=False)
+    block.has_sorted_indices = True
+    return block
+
+
+def memory_footprint(matrix) -> Dict[str, int]:
+    """
+    Bytes used by a stored TF-IDF matrix
+
+    Returns:
+        dict with data/indices/indptr/scales bytes, their total, and what the
+        same matrix takes in float64 for comparison
+    """
+    scales = matrix.scales.nbytes if isinstance(matrix, QuantizedCSR) else 0
+    footprint = {
+        "data_bytes": int(matrix.data.nbytes),
+        "indices_bytes": int(matrix.indices.nbytes),
+        "indptr_bytes": int(matrix.indptr.nbytes),
+        "scales_bytes": int(scales),
+    }
+    footprint["total_bytes"] = sum(footprint.values())
+    footprint["float64_bytes"] = int(8 * matrix.nnz + matrix.indices.nbytes + matrix.indptr.nbytes)
+    return footprint
+
+
+def _merge_top(best_rows: np.ndarray, best_scores: np.ndarray, rows: np.ndarray, scores: np.ndarray, k: int):
+    """
+    Per query, the best k of a running top-k and a new block of scores
+
+    Same order as select_top(): descending score, ties to the lower row.
+    Columns are kept in ascending row order (the block's rows all come
+    after the running ones), so a stable sort settles the ties.
+
+    Returns:
+        (rows, scores), each (n_queries, <= k), columns in ascending row order
+    """
+    all_rows = np.concatenate((best_rows, np.broadcast_to(rows, scores.shape)), axis=1)
+    all_scores = np.concatenate((best_scores, scores), axis=1)
+    top = np.argsort(-all_scores, axis=1, kind="stable")[:, :k]
+    top.sort(axis=1)
+    return np.take_along_axis(all_rows, top, axis=1), np.take_along_axis(all_scores, top, axis=1)
+
+
+def measure_drift(
+    reference,
+    compact,
+    k: int = 10,
+    n_queries: int = 64,
+    block_rows: int = DRIFT_BLOCK_ROWS
+) -> Optional[dict]:
+    """
+    How much rankings change between a float64 matrix and its compact version
+
+    Uses evenly spaced rows of the reference matrix as queries (each is a
+    unit-length TF-IDF vector, just like a real query) and compares the
+    top-k lists and scores each matrix gives for them. The query's own row
+    is left out of both: it'd be the top hit either way and make the
+    rankings look closer than they are.
+
+    Both matrices are scored block_rows rows at a time, keeping only the
+    running top-k and error totals, so memory doesn't grow with the corpus.
+
+    Args:
+        reference: float64 CSR matrix
+        compact: the same matrix in a compact storage mode
+        k: size of the compared top-k lists
+        n_queries: number of sampled query rows
+        block_rows: rows scored at a time
+
+    Returns:
+        dict with overlap_at_k (mean fraction of the reference top-k kept),
+        max_score_error / mean_score_error (absolute, over all scores but
+        the self-matches), k and n_queries; None with fewer than 2 rows
+    """
+    n_rows = reference.shape[0]
+    if n_rows < 2:
+        return None
+    sample = np.unique(np.linspace(0, n_rows - 1, min(n_queries, n_rows)).astype(np.int64))
+    queries = reference[sample]
+
+    empty_rows, empty_scores = np.zeros((len(sample), 0), dtype=np.int64), np.zeros((len(sample), 0))
+    exact_rows, exact_scores = empty_rows, empty_scores
+    approx_rows, approx_scores = empty_rows, empty_scores
+    max_error, total_error = 0.0, 0.0
+
+    for start in range(0, n_rows, block_rows):
+        end = min(start + block_rows, n_rows)
+        exact = score_matrix(row_block(reference, start, end), queries).astype(np.float64)
+        approx = score_matrix(row_block(compact, start, end), queries).astype(np.float64)
+        errors = np.abs(exact - approx)
+
+        # each query's own row: no error counted, and ranked below anything real
+        own = np.flatnonzero((sample >= start) & (sample < end))
+        errors[own, sample[own] - start] = 0.0
+        exact[own, sample[own] - start] = -np.inf
+        approx[own, sample[own] - start] = -np.inf
+
+        max_error = max(max_error, float(errors.max()))
+        total_error += float(errors.sum())
+        rows = np.arange(start, end)
+        exact_rows, exact_scores = _merge_top(exact_rows, exact_scores, rows, exact, k)
+        approx_rows, approx_scores = _merge_top(approx_rows, approx_scores, rows, approx, k)
+
+    overlaps = []
+    for expected, expected_scores, found, found_scores in zip(exact_rows, exact_scores, approx_rows, approx_scores):
+        # the own row only makes the cut when there are fewer than k others
+        expected, found = expected[expected_scores > -np.inf], found[found_scores > -np.inf]
+        overlaps.append(len(np.intersect1d(expected, found)) / len(expected))
+
+    return {
+        "k": k,
+        "n_queries": len(sample),
+        "overlap_at_k": float(np.mean(overlaps)),
+        "max_score_error": max_error,
+        "mean_score_error": total_error / (len(sample) * (n_rows - 1)),
+    }
@@ -0,0 +1,130 @@
+"""
+Query Cache - answer any percentile of a query from one scoring pass
+
+Users often rerun the same query document with a different percentile.
+The similarity distribution doesn't depend on the percentile at all, so
+the cache keeps it: for each query vector, the documents with a nonzero
+score sorted best first. Any percentile is then answered with an index
+lookup for the threshold plus a binary search for the cut-off, no rescoring.
+
+Entries are keyed on a hash of the sparse query vector (so different texts
+that vectorize identically share an entry), evicted least-recently-used
+once the cache goes over its memory budget, and dropped wholesale when
+the fitted corpus changes.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from .selection import sorted_percentile
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from selection import sorted_percentile
+
+# rough per-entry bookkeeping cost on top of the arrays (dict slot, object, key)
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class CachedScores:
+    """
+    Similarity distribution of one query
+
+    Attributes:
+        indices: rows with a nonzero score, best first (ties in row order)
+        scores: their scores, descending
+        n_zeros: number of (live) documents scoring exactly 0, not stored
+    """
+
+    def __init__(self, indices: np.ndarray, scores: np.ndarray, n_zeros: int):
+        self.indices = indices
+        self.scores = scores
+        self.n_zeros = n_zeros
+        self.nbytes = indices.nbytes + scores.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def threshold(self, percentile: float) -> float:
+        """Percentile threshold, same value np.percentile gives on the full score vector"""
+        return sorted_percentile(self.scores, percentile, n_implicit_zeros=self.n_zeros)
+
+    def select(self, threshold: float, top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stored matches with score >= threshold, best first
+
+        Scores are descending, so the cut-off is a binary search
+        (searchsorted needs ascending order, hence the negation).
+        """
+        count = int(np.searchsorted(-self.scores, -threshold, side="right"))
+        if top_k is not None:
+            count = min(count, top_k)
+        return self.indices[:count], self.scores[:count]
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of CachedScores, keyed by query vector
+
+    Attributes:
+        max_bytes: memory budget for all entries together
+        hits / misses / evictions: counters since creation
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def key(query_vector) -> bytes:
+        """Hash of a 1 x V sparse query vector (sorted indices + weights)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.int64(query_vector.shape[1]).tobytes())
+        h.update(np.ascontiguousarray(query_vector.indices, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(query_vector.data, dtype=np.float64).tobytes())
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[CachedScores]:
+        """Cached entry for key (marked most recently used), or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: bytes, entry: CachedScores):
+        """Store an entry, evicting least recently used ones to stay within max_bytes"""
+        if entry.nbytes > self.max_bytes:
+            # would evict everything and still not fit
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """Counters and current size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
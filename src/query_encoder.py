@@ -0,0 +1,128 @@
+"""
+Query Encoder - TF-IDF vectors of queries without TfidfVectorizer.transform()
+
+transform() is built for whole corpora: it goes through the generic
+analyzer chain, builds a count matrix with scipy, validates and copies it,
+multiplies in the IDF and calls normalize(). For a query of a few words
+that machinery is most of the time spent before scoring even starts.
+
+QueryEncoder does the same steps directly with the fitted state:
+
+    1. lowercase + the vectorizer's token_pattern (one compiled regex)
+    2. tokens -> column ids through the fitted vocabulary dict
+    3. counts per column, in ascending column order (CSR canonical order)
+    4. tf * idf, then divide by the L2 norm
+
+The result is bit-for-bit what transform() returns: the same float64
+operations in the same order. In particular the squared weights are
+summed left to right (np.cumsum, like sklearn's normalize loop), not with
+np.sum's pairwise summation, which can differ in the last bit.
+
+Only the vectorizer settings this project uses are supported (word
+analyzer, unigrams, no stop words / custom callables, l2 or no norm);
+supports() tells the matcher when it has to fall back to transform().
+"""
+
+import re
+from typing import List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class QueryEncoder:
+    """
+    Encodes query texts into L2-normalized TF-IDF (ids, weights) pairs
+
+    Built from a fitted TfidfVectorizer and only valid for that exact
+    vocabulary and IDF; DocumentMatcher rebuilds it when either changes.
+
+    Attributes:
+        vocabulary: term -> column (the vectorizer's own dict, not copied)
+        idf: IDF weight per column
+        n_terms: number of columns
+    """
+
+    def __init__(self, vectorizer):
+        """
+        Args:
+            vectorizer: fitted TfidfVectorizer for which supports() is True
+        """
+        if not self.supports(vectorizer):
+            raise ValueError("QueryEncoder doesn't support this vectorizer's settings, use transform()")
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = vectorizer.idf_
+        self.n_terms = len(self.vocabulary)
+        self._findall = re.compile(vectorizer.token_pattern).findall
+        self._lowercase = vectorizer.lowercase
+        self._use_idf = vectorizer.use_idf
+        self._sublinear_tf = vectorizer.sublinear_tf
+        self._normalize = vectorizer.norm == "l2"
+        self._binary = vectorizer.binary
+
+    @staticmethod
+    def supports(vectorizer) -> bool:
+        """True if encode() reproduces vectorizer.transform() exactly for these settings"""
+        return (
+            hasattr(vectorizer, "vocabulary_")
+            and hasattr(vectorizer, "idf_")
+            and vectorizer.input == "content"
+            and vectorizer.analyzer == "word"
+            and vectorizer.preprocessor is None
+            and vectorizer.tokenizer is None
+            and vectorizer.strip_accents is None
+            and vectorizer.stop_words is None
+            and tuple(vectorizer.ngram_range) == (1, 1)
+            and vectorizer.token_pattern is not None
+            and re.compile(vectorizer.token_pattern).groups <= 1
+            and vectorizer.norm in ("l2", None)
+            and vectorizer.dtype == np.float64
+        )
+
+    def encode(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        TF-IDF vector of one query
+
+        Returns:
+            (ids, weights): int32 column ids in ascending order and their
+            float64 weights, the same as the query's row of transform()
+        """
+        if self._lowercase:
+            text = text.lower()
+        vocabulary = self.vocabulary
+        columns = [vocabulary[token] for token in self._findall(text) if token in vocabulary]
+        if not columns:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+
+        ids, counts = np.unique(np.array(columns, dtype=np.int32), return_counts=True)
+        weights = np.ones(len(ids)) if self._binary else counts.astype(np.float64)
+        if self._sublinear_tf:
+            np.log(weights, weights)
+            weights += 1.0
+        if self._use_idf:
+            weights *= self.idf[ids]
+        if self._normalize:
+            # sequential sum of squares, the order sklearn's normalize() adds them in
+            norm = np.cumsum(weights * weights)[-1]
+            if norm != 0.0:
+                weights /= np.sqrt(norm)
+        return ids, weights
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """
+        Drop-in replacement for vectorizer.transform(texts)
+
+        Returns:
+            CSR matrix (len(texts) x n_terms) with sorted indices
+        """
+        encoded = [self.encode(text) for text in texts]
+        indptr = np.zeros(len(texts) + 1, dtype=np.int32)
+        np.cumsum([len(ids) for ids, _ in encoded], out=indptr[1:])
+        if encoded:
+            indices = np.concatenate([ids for ids, _ in encoded])
+            data = np.concatenate([weights for _, weights in encoded])
+        else:
+            indices, data = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(texts), self.n_terms))
+        matrix.has_sorted_indices = True
+        return matrix
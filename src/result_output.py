@@ -0,0 +1,182 @@
+"""
+Result Output - paginated, streaming rendering of MatchResults
+
+A low percentile matches thousands of documents (all 10788 at percentile 0),
+and formatting every match as a line of text can take longer than the
+search itself. MatchResults already holds the matches as two arrays, so
+output works on slices of those arrays instead:
+
+    - the terminal shows one page at a time (doc IDs are only resolved and
+      lines only formatted for that page)
+    - files are written page by page with a limit (top-k) if wanted, so the
+      cost is O(page) in memory and O(written) in formatting
+
+File formats (picked from the extension unless given):
+    text  - the human-readable listing print_results() shows (.txt or anything else)
+    jsonl - one {"rank", "doc_id", "similarity"} object per match
+    csv   - rank, doc_id, similarity
+    npz   - NumPy arrays: indices (corpus rows), scores, doc_ids, threshold;
+            no per-match formatting at all
+"""
+
+import csv
+import json
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    from .match_results import MatchResults
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from match_results import MatchResults
+
+FORMATS = ("text", "jsonl", "csv", "npz")
+
+# matches formatted and written at a time
+DEFAULT_PAGE_SIZE = 1000
+
+Results = Union[List[Tuple[str, float]], MatchResults]
+
+
+def output_format(
+    path: str,
+    fmt: Optional[str] = None,
+    formats: Tuple[str, ...] = FORMATS,
+    default: str = "text"
+) -> str:
+    """
+    Explicit format, or guessed from the file extension
+
+    Args:
+        path: output file path
+        fmt: format asked for (None = from the extension)
+        formats: the formats the caller can write (bulk.py only writes jsonl/csv)
+        default: format for an extension not in formats
+    """
+    if fmt is None:
+        extension = path.lower().rsplit(".", 1)[-1]
+        fmt = extension if extension in formats else default
+    if fmt not in formats:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {formats}")
+    return fmt
+
+
+def page(results: Results, start: int, stop: int) -> Results:
+    """Matches [start, stop) of a result (a view for MatchResults, no copy)"""
+    if isinstance(results, MatchResults):
+        return results.page(start, stop)
+    return results[start:stop]
+
+
+def iter_pages(results: Results, page_size: int = DEFAULT_PAGE_SIZE, limit: Optional[int] = None) -> Iterator[Results]:
+    """
+    Consecutive pages of a result
+
+    Args:
+        results: MatchResults or list of (doc_id, score) tuples
+        page_size: matches per page
+        limit: stop after this many matches (None = all)
+    """
+    end = len(results) if limit is None else min(limit, len(results))
+    for start in range(0, end, page_size):
+        yield page(results, start, min(start + page_size, end))
+
+
+def format_lines(results: Results, first_rank: int = 1) -> str:
+    """The listing lines of some matches, ranks counting from first_rank"""
+    return "".join(
+        f"{rank:3d}. {doc_id:20s} | Similarity: {score:.4f}\n"
+        for rank, (doc_id, score) in enumerate(results, first_rank)
+    )
+
+
+def print_page(results: Results, start: int, page_size: Optional[int] = None) -> int:
+    """
+    Print one page of the listing
+
+    Args:
+        results: MatchResults or list of (doc_id, score) tuples
+        start: index of the first match to show
+        page_size: matches to show (None = all the rest)
+
+    Returns:
+        index after the last match shown
+    """
+    stop = len(results) if page_size is None else min(start + page_size, len(results))
+    print(format_lines(page(results, start, stop), start + 1), end="")
+    return stop
+
+
+def write_results(
+    results: Results,
+    path: str,
+    fmt: Optional[str] = None,
+    percentile: Optional[float] = None,
+    limit: Optional[int] = None,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> int:
+    """
+    Write matches to a file, one page at a time
+
+    Args:
+        results: MatchResults or list of (doc_id, score) tuples, best first
+        path: output file (replaced)
+        fmt: one of FORMATS (default: from the extension, see output_format())
+        percentile: shown in the text header
+        limit: write only the best limit matches (None = all)
+        page_size: matches formatted at a time
+
+    Returns:
+        number of matches written
+    """
+    fmt = output_format(path, fmt)
+    n_written = len(results) if limit is None else min(limit, len(results))
+
+    if fmt == "npz":
+        if not isinstance(results, MatchResults):
+            raise ValueError("npz output needs MatchResults (the array-backed result)")
+        written = results.page(0, n_written)
+        threshold = np.nan if results.threshold is None else results.threshold
+        with open(path, "wb") as f:
+            np.savez(
+                f, indices=written.indices, scores=written.scores,
+                doc_ids=np.array(written.doc_id_list(), dtype=str), threshold=np.float64(threshold)
+            )
+        return n_written
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "text":
+            f.write("=" * 70 + "\n")
+            f.write("Document Similarity Matching Results\n")
+            f.write("NLP Assignment - Option C\n")
+            f.write("=" * 70 + "\n\n")
+            if percentile is not None:
+                f.write(f"Percentile threshold: {percentile}\n")
+            f.write(f"Total matching documents: {len(results)}\n\n")
+            f.write("Matching Documents:\n")
+            f.write("-" * 70 + "\n")
+        elif fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["rank", "doc_id", "similarity"])
+
+        rank = 1
+        for matches in iter_pages(results, page_size, n_written):
+            if fmt == "text":
+                f.write(format_lines(matches, rank))
+            elif fmt == "csv":
+                writer.writerows(
+                    [r, doc_id, f"{score:.6f}"] for r, (doc_id, score) in enumerate(matches, rank)
+                )
+            else:
+                f.write("".join(
+                    json.dumps({"rank": r, "doc_id": doc_id, "similarity": score}) + "\n"
+                    for r, (doc_id, score) in enumerate(matches, rank)
+                ))
+            rank += len(matches)
+
+        if fmt == "text":
+            if n_written < len(results):
+                f.write(f"... {len(results) - n_written} more not written\n")
+            f.write("\n" + "=" * 70 + "\n")
+    return n_written
@@ -0,0 +1,226 @@
+"""
+Selection Helpers - percentile thresholds and ranking without full sorts
+
+np.percentile + a Python list sort is fine for one query, but at low
+percentiles it means building and sorting ~10k (doc_id, score) tuples in
+Python for every query. These helpers stay in NumPy the whole way:
+
+- percentile_threshold(): the two order statistics the percentile needs
+  are found with np.partition (introselect, O(n)), then interpolated
+- select_top(): keeps the scores >= threshold and argsorts only those
+
+The interpolation reproduces np.percentile's default 'linear' method
+exactly, so thresholds are bit-identical to the old np.percentile call.
+"""
+
+from numbers import Integral
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+def _virtual_index(n: int, percentile) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Positions in the sorted data that a percentile falls between
+
+    Same formula as numpy's 'linear' method: (n - 1) * q, then the floor and
+    the next index (both clipped to the last element) plus the fraction between.
+
+    Returns:
+        (previous_index, next_index, gamma) as arrays
+    """
+    q = np.true_divide(np.asarray(percentile, dtype=np.float64), 100)
+    virtual = np.asarray((n - 1) * q)
+    previous = np.floor(virtual).astype(np.intp)
+    # past the end (percentile=100) both sides are the last element
+    above = virtual >= n - 1
+    next_ = np.where(above, n - 1, previous + 1)
+    previous = np.where(above, n - 1, previous)
+    gamma = np.asarray(virtual - previous, dtype=np.float64)
+    return previous, next_, gamma
+
+
+def _lerp(a, b, t):
+    """Linear interpolation written exactly like numpy's internal _lerp"""
+    diff_b_a = b - a
+    result = np.asarray(a + diff_b_a * t, dtype=np.float64)
+    # numpy interpolates from the upper end for t >= 0.5 (better rounding)
+    np.subtract(b, diff_b_a * (1 - t), out=result, where=np.asarray(t) >= 0.5)
+    return result
+
+
+def percentile_threshold(
+    values: np.ndarray,
+    percentile: float,
+    n_implicit_zeros: int = 0
+) -> float:
+    """
+    Percentile of a score array using selection instead of sorting
+
+    Args:
+        values: 1D array of scores
+        percentile: 0-100
+        n_implicit_zeros: extra 0.0 scores that are part of the distribution
+            but not stored in values (e.g. documents that share no term with
+            the query). values must then be >= 0, so the zeros are the
+            smallest elements and the order statistics can be worked out
+            without ever materializing them.
+
+    Returns:
+        the threshold as a Python float (same value np.percentile would give)
+    """
+    n = len(values) + n_implicit_zeros
+    if n == 0:
+        raise ValueError("Cannot compute a percentile of an empty distribution")
+
+    previous, next_, gamma = _virtual_index(n, percentile)
+    previous, next_ = int(previous), int(next_)
+
+    # order statistics below n_implicit_zeros are the implicit zeros,
+    # everything else lives in values shifted down by that count
+    stored = sorted({k - n_implicit_zeros for k in (previous, next_) if k >= n_implicit_zeros})
+    partitioned = np.partition(values, stored) if stored else values
+
+    def order_statistic(k):
+        if k < n_implicit_zeros:
+            return 0.0
+        return partitioned[k - n_implicit_zeros]
+
+    return float(_lerp(order_statistic(previous), order_statistic(next_), gamma))
+
+
+def sorted_percentile(
+    descending: np.ndarray,
+    percentile: float,
+    n_implicit_zeros: int = 0
+) -> float:
+    """
+    Percentile of scores that are already sorted (descending) - no selection needed
+
+    Same result and implicit-zero handling as percentile_threshold(), but
+    the order statistics are plain index lookups.
+    """
+    n = len(descending) + n_implicit_zeros
+    if n == 0:
+        raise ValueError("Cannot compute a percentile of an empty distribution")
+
+    previous, next_, gamma = _virtual_index(n, percentile)
+
+    def order_statistic(k):
+        # k counts from the smallest value: first the zeros, then descending reversed
+        k = int(k)
+        if k < n_implicit_zeros:
+            return 0.0
+        return descending[len(descending) - 1 - (k - n_implicit_zeros)]
+
+    return float(_lerp(order_statistic(previous), order_statistic(next_), gamma))
+
+
+def interpolate_percentile(order_statistic: Callable[[int], float], n: int, percentile: float) -> float:
+    """
+    Percentile of n values that aren't held in an array
+
+    Same positions and interpolation as percentile_threshold(), with the two
+    order statistics coming from a function (e.g. a quantile sketch).
+
+    Args:
+        order_statistic: k -> the k-th smallest value (k counts from 0)
+        n: number of values
+        percentile: 0-100
+    """
+    previous, next_, gamma = _virtual_index(n, percentile)
+    return float(_lerp(order_statistic(int(previous)), order_statistic(int(next_)), gamma))
+
+
+def percentile_support(n: int, percentile: float) -> int:
+    """
+    How many of the largest of n values the percentile depends on
+
+    The percentile only looks at two order statistics, so any value below
+    both can be left out. A distributed search uses this: every shard sends
+    only its top percentile_support(n, p) scores, and the global top scores
+    (all the percentile needs) are guaranteed to be among them.
+    """
+    if n == 0:
+        return 0
+    previous, _, _ = _virtual_index(n, percentile)
+    return n - int(previous)
+
+
+def percentile_thresholds(values: np.ndarray, percentiles) -> np.ndarray:
+    """
+    Row-wise percentile of a 2D score array (one threshold per row)
+
+    Args:
+        values: array of shape (n_rows, n)
+        percentiles: a single percentile or one per row
+
+    Returns:
+        float64 array of shape (n_rows,)
+    """
+    n_rows, n = values.shape
+    percentiles = np.broadcast_to(np.asarray(percentiles, dtype=np.float64), (n_rows,))
+    previous, next_, gamma = _virtual_index(n, percentiles)
+
+    # one partition call places every needed order statistic for every row
+    kth = np.unique(np.concatenate((previous, next_)))
+    partitioned = np.partition(values, kth, axis=1)
+
+    rows = np.arange(n_rows)
+    return _lerp(partitioned[rows, previous], partitioned[rows, next_], gamma)
+
+
+def select_top(
+    scores: np.ndarray,
+    threshold: float,
+    top_k: Optional[int] = None,
+    indices: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Entries with score >= threshold, best first
+
+    Ordering matches the original list sort: descending score, ties kept in
+    ascending document order. Only the survivors are sorted, and with top_k
+    only the best top_k of them.
+
+    Args:
+        scores: candidate scores
+        threshold: minimum score to keep
+        top_k: optional cap on the number of results
+        indices: document index of each score (ascending); defaults to the
+            position in scores
+
+    Returns:
+        (indices, scores) of the kept documents, ordered best first
+    """
+    keep = np.flatnonzero(scores >= threshold)
+    kept_scores = scores[keep]
+    kept_indices = keep if indices is None else indices[keep]
+
+    if top_k is not None and top_k < len(kept_scores):
+        # k-th best value by selection; everything strictly above it is in,
+        # and ties at the boundary are filled in document order
+        cut = len(kept_scores) - top_k
+        kth_value = np.partition(kept_scores, cut)[cut]
+        chosen = kept_scores > kth_value
+        n_ties = top_k - int(np.count_nonzero(chosen))
+        chosen[np.flatnonzero(kept_scores == kth_value)[:n_ties]] = True
+        kept_scores = kept_scores[chosen]
+        kept_indices = kept_indices[chosen]
+
+    order = np.argsort(-kept_scores, kind="stable")
+    return kept_indices[order], kept_scores[order]
+
+
+def check_query_options(percentile: float, top_k: Optional[int]):
+    """
+    Raise ValueError unless percentile is in 0-100 and top_k is None or a positive integer
+
+    Called once per query before any engine runs, so every engine rejects
+    the same arguments (np.partition would fail on some, others would just
+    return nothing).
+    """
+    if not 0 <= percentile <= 100:
+        raise ValueError(f"percentile must be between 0 and 100, got {percentile!r}")
+    if top_k is not None and (not isinstance(top_k, Integral) or isinstance(top_k, bool) or top_k < 1):
+        raise ValueError(f"top_k must be a positive integer or None, got {top_k!r}")
@@ -0,0 +1,359 @@
+"""
+Query Server - long-running asyncio HTTP server for similarity queries
+
+main.py in interactive mode pays the full load/fit cost for one question.
+The server loads (or fits) the matcher once and then answers queries over
+a local TCP port or Unix socket until it's stopped.
+
+Endpoints (JSON in, JSON out):
+    POST /query   {"text": "...", "percentile": 70, "top_k": 10}
+                  -> {"threshold": 0.0119, "count": 10, "matches": [["training/144", 0.3247], ...]}
+    GET  /health  -> {"status": "ok", "documents": 10788}
+    GET  /metrics -> {"server": {"batches": 12, "queries": 40},
+                      "timers": {...}, "values": {...}, "counters": {...}}
+                  (the matcher's recorder snapshot, see instrumentation.py)
+
+Scoring is CPU-bound, so it runs in a worker thread instead of blocking the
+event loop. Requests that arrive within batch_window seconds of each other
+are micro-batched: they go through DocumentMatcher.find_matches_batch()
+together, i.e. one sparse matrix product for the whole group.
+
+Only the standard library is used for the HTTP side (a minimal HTTP/1.1
+parser on asyncio streams), so there is nothing extra to install.
+"""
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+try:
+    from .selection import check_query_options
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from selection import check_query_options
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Error that is sent back to the client as a JSON response with this status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class QueryServer:
+    """
+    Serves a fitted DocumentMatcher over HTTP with micro-batching
+
+    Usage:
+        server = QueryServer(matcher)
+        await server.start(port=8000)        # or start(unix_path="/tmp/matcher.sock")
+        await server.serve_forever()
+    """
+
+    def __init__(self, matcher, batch_window: float = 0.005, max_batch_size: int = 64):
+        """
+        Args:
+            matcher: fitted DocumentMatcher
+            batch_window: seconds to wait for more requests to join a batch
+            max_batch_size: upper limit on queries scored together
+        """
+        self.matcher = matcher
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.batches_run = 0
+        self.queries_served = 0
+
+        # one worker thread: batches run one after another, which is also what
+        # lets new requests pile up into the next batch while one is scoring
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
+        self._queue: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000, unix_path: Optional[str] = None):
+        """
+        Start listening (on unix_path if given, otherwise host:port)
+
+        Returns:
+            the asyncio server; with port=0 the OS picks a free port, see
+            server.sockets[0].getsockname()
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self):
+        """Serve until cancelled"""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and shut the batcher and worker thread down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+
+    async def submit(self, text: str, percentile: float, top_k: Optional[int] = None):
+        """Queue one query for the next batch and wait for its MatchResults"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, percentile, top_k, future))
+        return await future
+
+    async def _run_batches(self):
+        """Collect queued queries into micro-batches and score each batch in the worker thread"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts, percentiles, top_ks, futures = zip(*batch)
+            try:
+                results = await loop.run_in_executor(self._executor, self._score_batch, texts, percentiles, top_ks)
+            except Exception:
+                # one bad query shouldn't fail the others: score them one at a time
+                results = await loop.run_in_executor(self._executor, self._score_each, texts, percentiles, top_ks)
+
+            self.batches_run += 1
+            self.queries_served += len(batch)
+            for future, result in zip(futures, results):
+                # the client may have gone away and cancelled its future
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _score_batch(self, texts, percentiles, top_ks) -> list:
+        """Runs in the worker thread: one find_matches_batch() call for the whole batch"""
+        return list(self.matcher.find_matches_batch(
+            texts, percentiles, top_ks, batch_size=self.max_batch_size
+        ))
+
+    def _score_each(self, texts, percentiles, top_ks) -> list:
+        """Runs in the worker thread: find_matches() per query, with the exception in place of a failed one"""
+        results = []
+        for text, percentile, top_k in zip(texts, percentiles, top_ks):
+            try:
+                results.append(self.matcher.find_matches(text, percentile, top_k))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve HTTP requests on one connection (keep-alive until the client closes)"""
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await _write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = 200, await self._route(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                await _write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> dict:
+        """Dispatch one request to its endpoint"""
+        if path == "/health":
+            return {"status": "ok", "documents": self.matcher.n_documents()}
+        if path == "/metrics":
+            return dict(
+                server={"batches": self.batches_run, "queries": self.queries_served},
+                **self.matcher.recorder.snapshot()
+            )
+
+        if path != "/query":
+            raise HTTPError(404, f"Unknown path '{path}'")
+        if method != "POST":
+            raise HTTPError(405, "Use POST for /query")
+
+        text, percentile, top_k = _parse_query(body)
+        results = await self.submit(text, percentile, top_k)
+        return {
+            "threshold": results.threshold,
+            "count": len(results),
+            "matches": [[doc_id, score] for doc_id, score in results],
+        }
+
+
+def _parse_query(body: bytes) -> Tuple[str, float, Optional[int]]:
+    """Validate a /query request body"""
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+    if not isinstance(request, dict) or not isinstance(request.get("text"), str):
+        raise HTTPError(400, "Expected a JSON object with a 'text' string")
+
+    try:
+        percentile = float(request.get("percentile", 0))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "'percentile' must be a number")
+
+    # the same checks find_matches() makes, so a bad request never reaches a batch
+    top_k = request.get("top_k")
+    try:
+        check_query_options(percentile, top_k)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+    return request["text"], percentile, top_k
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """
+    Read one HTTP/1.1 request
+
+    Returns:
+        (method, path, headers, body), or None if the client closed the connection
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path.split("?", 1)[0], headers, body
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+    """Send a JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def request_json(
+    method: str,
+    path: str,
+    payload: Optional[dict] = None,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_path: Optional[str] = None
+) -> Tuple[int, dict]:
+    """
+    Minimal client for the server (used by the tests, handy for scripts)
+
+    Returns:
+        (status, decoded JSON body)
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    response = await reader.readexactly(int(headers.get("content-length", 0)))
+
+    writer.close()
+    return status, json.loads(response)
+
+
+def run_server(
+    matcher,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_path: Optional[str] = None,
+    batch_window: float = 0.005
+):
+    """Blocking entry point used by main.py --serve (Ctrl+C to stop)"""
+
+    async def serve():
+        server = QueryServer(matcher, batch_window=batch_window)
+        await server.start(host, port, unix_path)
+        where = unix_path if unix_path is not None else f"http://{host}:{port}"
+        logger.info(f"Serving similarity queries on {where} (POST /query, GET /health, GET /metrics)")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
@@ -0,0 +1,175 @@
+"""
+Packed Text Store - all document texts in one memory-mapped file
+
+Reading the corpus through NLTK opens and decodes one file per document,
+every time. The text store writes every document once into a single file
+and keeps an offset table next to it:
+
+    texts.bin          - UTF-8 texts back to back
+    offsets.npy        - text i is texts.bin[offsets[i]:offsets[i+1]]
+    doc_ids_blob.npy   - doc IDs, packed like index_store.pack_strings()
+    doc_ids_offsets.npy
+    meta.json          - format version, number of documents, source
+
+Opening the store memory-maps texts.bin, so it costs nothing up front and
+fetching a document is one slice of the map plus a decode. A
+PackedTextStore behaves like a read-only list of texts, so it can be
+handed to DocumentMatcher.fit_corpus() as the corpus without ever holding
+all texts in RAM at once.
+"""
+
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .index_store import pack_strings, unpack_strings
+except ImportError:
+    # running as a plain script (python src/main.py), siblings are top-level modules
+    from index_store import pack_strings, unpack_strings
+
+# bump this when the on-disk layout changes, old stores then count as missing
+FORMAT_VERSION = 1
+
+TEXTS_FILE = "texts.bin"
+META_FILE = "meta.json"
+
+
+def build_text_store(path: str, documents: Iterable[Tuple[str, str]], source: str = "") -> int:
+    """
+    Write a text store from (doc_id, text) pairs
+
+    Texts are streamed straight to disk, only the offsets and doc IDs are
+    kept in memory. Like index_store.save_index(), everything is written to
+    a temporary sibling directory first and swapped in at the end.
+
+    Args:
+        path: store directory (replaced if it exists)
+        documents: iterable of (doc_id, text)
+        source: free-form label of where the texts came from, kept in meta.json
+
+    Returns:
+        number of documents written
+    """
+    path = os.path.abspath(path)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    offsets = [0]
+    doc_ids = []
+    with open(os.path.join(tmp_path, TEXTS_FILE), "wb") as f:
+        for doc_id, text in documents:
+            encoded = text.encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            doc_ids.append(doc_id)
+
+    np.save(os.path.join(tmp_path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    ids_blob, ids_offsets = pack_strings(doc_ids)
+    np.save(os.path.join(tmp_path, "doc_ids_blob.npy"), ids_blob)
+    np.save(os.path.join(tmp_path, "doc_ids_offsets.npy"), ids_offsets)
+
+    meta = {"format_version": FORMAT_VERSION, "n_docs": len(doc_ids), "source": source}
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(tmp_path, path)
+    return len(doc_ids)
+
+
+def read_store_meta(path: str) -> Optional[dict]:
+    """Metadata of the text store at path, or None if there's no usable store there"""
+    try:
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if meta.get("format_version") != FORMAT_VERSION:
+        return None
+    return meta
+
+
+class PackedTextStore(Sequence):
+    """
+    Read-only, memory-mapped list of document texts
+
+    store[i] is the i-th text, store.get(doc_id) looks one up by ID.
+
+    Attributes:
+        doc_ids: document IDs, in store order
+        offsets: int64 offset table (memory-mapped)
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: directory written by build_text_store()
+        """
+        meta = read_store_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"No valid text store found at '{path}'")
+
+        self.path = path
+        self.source = meta.get("source", "")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.doc_ids = unpack_strings(
+            np.load(os.path.join(path, "doc_ids_blob.npy")),
+            np.load(os.path.join(path, "doc_ids_offsets.npy"))
+        )
+        self._positions = None  # doc_id -> position, built on first get()
+
+        self._file = open(os.path.join(path, TEXTS_FILE), "rb")
+        # mmap can't map an empty file
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("text store index out of range")
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        # one pass over the offset table instead of an int() pair per index
+        bounds = np.asarray(self.offsets).tolist()
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield self._map[start:end].decode("utf-8")
+
+    def get(self, doc_id: str) -> str:
+        """
+        Text of a document by ID
+
+        Raises:
+            KeyError: if doc_id isn't in the store
+        """
+        if self._positions is None:
+            self._positions = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        return self[self._positions[doc_id]]
+
+    def iter_chunks(self, chunk_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        """Yield lists of (doc_id, text), at most chunk_size long, in store order"""
+        for start in range(0, len(self), chunk_size):
+            end = min(start + chunk_size, len(self))
+            yield list(zip(self.doc_ids[start:end], self[start:end]))
+
+    def close(self):
+        """Unmap the texts file"""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
@@ -0,0 +1,233 @@
+"""
+Vocabulary Profiles - how many columns the TF-IDF matrix gets
+
+With TfidfVectorizer's defaults every token becomes a column, so each
+one-off number and typo in Reuters is one of ~31k terms. Those columns
+make the matrix, the postings and every query's work bigger while rarely
+changing a ranking. A profile trades some of that size for quality:
+
+    full        - every token (the default, what the assignment specifies)
+    min-df-2    - drop terms found in a single document
+    pruned      - min-df-2, and drop terms in more than half the documents
+    top-10k     - min-df-2, then the 10000 most frequent terms
+    hashed-16k  - feature hashing: every token goes to one of 2^14 buckets,
+                  so the width is fixed however big the vocabulary grows
+
+Stop words are never removed (no preprocessing, as the assignment requires);
+max_df only cuts terms by how many documents contain them.
+
+Hashing is done by a callable analyzer (HashingAnalyzer) that turns each
+token into its bucket's name, so a hashed matcher still has an ordinary
+vocabulary_ (bucket -> column) and IDF, and everything built on those
+(streaming fit, updates, saved indexes, distributed mode) works unchanged.
+QueryEncoder doesn't support callable analyzers, so hashed queries go
+through transform().
+
+vocabulary_report() fits the corpus with each profile and reports matrix
+size, fit time, query latency and overlap@k with the full vocabulary.
+"""
+
+import re
+import time
+import zlib
+from numbers import Integral
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+
+# the default analyzer's token pattern (TfidfVectorizer's token_pattern)
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+PROFILES = {
+    "full": {},
+    "min-df-2": {"min_df": 2},
+    "pruned": {"min_df": 2, "max_df": 0.5},
+    "top-10k": {"min_df": 2, "max_features": 10000},
+    "hashed-16k": {"hash_features": 2 ** 14},
+}
+
+Profile = Union[str, dict]
+
+
+class HashingAnalyzer:
+    """
+    Tokenizes like the default analyzer and maps every token to a hash bucket
+
+    Tokens become bucket names ("#1234"), so CountVectorizer / TfidfVectorizer
+    count buckets instead of words. crc32 rather than Python's hash(), which
+    changes between processes. The repr is what a saved index's vectorizer
+    settings record, so it only depends on n_features.
+    """
+
+    def __init__(self, n_features: int):
+        """
+        Args:
+            n_features: number of buckets (the most columns the matrix can get)
+        """
+        if n_features < 1:
+            raise ValueError("n_features must be at least 1")
+        self.n_features = n_features
+        self._findall = re.compile(TOKEN_PATTERN).findall
+        self._buckets = {}   # token -> bucket name, tokens repeat a lot
+
+    def __call__(self, text: str) -> List[str]:
+        buckets = self._buckets
+        names = []
+        for token in self._findall(text.lower()):
+            name = buckets.get(token)
+            if name is None:
+                name = f"#{zlib.crc32(token.encode('utf-8')) % self.n_features}"
+                buckets[token] = name
+            names.append(name)
+        return names
+
+    def __repr__(self) -> str:
+        return f"HashingAnalyzer(n_features={self.n_features})"
+
+
+def profile_settings(profile: Profile) -> dict:
+    """
+    Settings of a profile, given by name (see PROFILES) or as a dict
+
+    Keys: min_df, max_df, max_features (as in TfidfVectorizer) and
+    hash_features (number of hash buckets); missing ones are off.
+    """
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown vocabulary profile '{profile}', expected one of {tuple(PROFILES)}")
+        return dict(PROFILES[profile])
+    unknown = set(profile) - {"min_df", "max_df", "max_features", "hash_features"}
+    if unknown:
+        raise ValueError(f"Unknown vocabulary settings: {sorted(unknown)}")
+    return dict(profile)
+
+
+def vectorizer_options(profile: Profile) -> dict:
+    """TfidfVectorizer keyword arguments for a profile"""
+    options = profile_settings(profile)
+    hash_features = options.pop("hash_features", None)
+    if hash_features is not None:
+        options["analyzer"] = HashingAnalyzer(hash_features)
+    return options
+
+
+def limit_features(
+    df: np.ndarray,
+    tf: np.ndarray,
+    n_docs: int,
+    min_df=1,
+    max_df=1.0,
+    max_features: Optional[int] = None
+) -> np.ndarray:
+    """
+    Which terms a vectorizer with these settings keeps
+
+    The same rule (and the same operations, so the same ties) as
+    CountVectorizer.fit: df between the min_df and max_df cuts, then the
+    max_features terms with the highest total count. For fits that count
+    terms themselves (streaming, distributed) instead of calling fit().
+
+    Args:
+        df: number of documents containing each term (terms in sorted order)
+        tf: total count of each term (int64)
+        n_docs: number of documents
+        min_df, max_df: int = document count, float = fraction of n_docs
+        max_features: keep at most this many terms (None = no limit)
+
+    Returns:
+        boolean mask over the terms
+    """
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * n_docs
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * n_docs
+    if max_doc_count < min_doc_count:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    mask = (df <= max_doc_count) & (df >= min_doc_count)
+    if max_features is not None and mask.sum() > max_features:
+        most_frequent = (-tf[mask]).argsort()[:max_features]
+        limited = np.zeros(len(df), dtype=bool)
+        limited[np.where(mask)[0][most_frequent]] = True
+        mask = limited
+    if len(df) and not mask.any():
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    return mask
+
+
+def vocabulary_report(
+    corpus: List[str],
+    doc_ids: List[str],
+    queries: Sequence[str],
+    profiles: Sequence[Profile] = tuple(PROFILES),
+    k: int = 10,
+    **matcher_options
+) -> List[dict]:
+    """
+    Size, speed and ranking quality of each vocabulary profile
+
+    Every profile is fitted on the same corpus and asked the same queries.
+    overlap@k is the fraction of the full vocabulary's top-k (documents with
+    a nonzero similarity) that the profile also returns, averaged over queries.
+    The full vocabulary is the baseline, so it always comes first.
+
+    Args:
+        corpus: document texts
+        doc_ids: their IDs
+        queries: query texts
+        profiles: profiles to compare with the full vocabulary (names or settings dicts)
+        k: result size for overlap@k
+        matcher_options: other DocumentMatcher arguments (engine, storage, ...)
+
+    Returns:
+        one dict per profile: profile, n_terms, nnz, memory_bytes, fit_s,
+        query_ms, overlap (1.0 for the full vocabulary itself)
+    """
+    try:
+        from .document_matcher import DocumentMatcher, import_sklearn
+    except ImportError:
+        from document_matcher import DocumentMatcher, import_sklearn
+    # or the first profile's fit time would include importing sklearn
+    import_sklearn()
+
+    report = []
+    baseline = None
+    for profile in ["full"] + [p for p in profiles if p != "full"]:
+        matcher = DocumentMatcher(vocabulary=profile, **matcher_options)
+        start = time.perf_counter()
+        matcher.fit_corpus(corpus, doc_ids)
+        fit_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        top = [
+            set(results.indices[results.scores > 0].tolist())
+            for results in (matcher.find_matches(query, 0, top_k=k) for query in queries)
+        ]
+        query_ms = 1000 * (time.perf_counter() - start) / max(len(queries), 1)
+
+        if baseline is None:
+            baseline = top
+        overlaps = [len(expected & found) / len(expected) for expected, found in zip(baseline, top) if expected]
+        report.append({
+            "profile": profile if isinstance(profile, str) else repr(profile),
+            "n_terms": matcher.corpus_vectors.shape[1],
+            "nnz": int(matcher.corpus_vectors.nnz),
+            "memory_bytes": matcher.memory_footprint()["total_bytes"],
+            "fit_s": fit_s,
+            "query_ms": query_ms,
+            "overlap": float(np.mean(overlaps)) if overlaps else 1.0,
+        })
+    return report
+
+
+def format_vocabulary_report(report: List[dict], k: int) -> str:
+    """Vocabulary profile report as a printable table"""
+    lines = [
+        f"{'profile':>12} | {'terms':>7} | {'nnz':>9} | {'MB':>7} | {'fit s':>6} | "
+        f"{'ms/query':>8} | {'overlap@' + str(k):>10}",
+        "-" * 82,
+    ]
+    for row in report:
+        lines.append(
+            f"{row['profile']:>12} | {row['n_terms']:>7} | {row['nnz']:>9} | {row['memory_bytes'] / 2**20:>7.2f} | "
+            f"{row['fit_s']:>6.2f} | {row['query_ms']:>8.3f} | {row['overlap']:>10.3f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,46 @@
+"""
+Unit tests for the benchmark harness
+"""
+
+import tempfile
+import unittest
+
+from benchmarks.run import compare_reports, run_benchmarks
+from benchmarks.synthetic import corpus_size, synthetic_documents
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Test cases for the synthetic corpora and the regression gate"""
+
+    def test_synthetic_corpus_is_reproducible(self):
+        """Same seed, same documents"""
+        first = list(synthetic_documents(50, seed=3))
+        self.assertEqual(first, list(synthetic_documents(50, seed=3)))
+        self.assertEqual(len({doc_id for doc_id, _ in first}), 50)
+        self.assertEqual(corpus_size("synthetic-10k"), 10_000)
+        self.assertEqual(corpus_size("synthetic-300"), 300)
+
+    def test_run_and_compare(self):
+        """A tiny run produces every stage, and compare flags a slowdown"""
+        options = {
+            "repeat": 1, "n_queries": 5, "batch_size": 2, "percentile": 90.0,
+            "engine": "matmul", "storage": "float64",
+        }
+        with tempfile.TemporaryDirectory() as data_dir:
+            report = run_benchmarks(["synthetic-300"], dict(options, data_dir=data_dir), isolate=False)
+
+        stages = report["corpora"]["synthetic-300"]["stages"]
+        self.assertEqual(set(stages), {"load_corpus", "fit_corpus", "query_single", "query_batch"})
+        self.assertEqual(stages["query_single"]["runs"], 5)
+        self.assertEqual(stages["query_batch"]["runs"], 3)
+
+        self.assertFalse(any(row["regressed"] for row in compare_reports(report, report, 0.2)))
+        slower = {"corpora": {"synthetic-300": {"stages": {
+            "fit_corpus": dict(stages["fit_corpus"], p50_ms=stages["fit_corpus"]["p50_ms"] * 2)
+        }}}}
+        regressed = [row for row in compare_reports(report, slower, 0.2) if row["regressed"]]
+        self.assertEqual([(row["stage"], row["metric"]) for row in regressed], [("fit_corpus", "p50_ms")])
+
+
+if __name__ == '__main__':
+    unittest.main()
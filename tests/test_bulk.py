@@ -0,0 +1,94 @@
+"""
+Unit tests for bulk (non-interactive) queries
+"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from src.bulk import run_bulk
+from src.document_matcher import DocumentMatcher
+
+
+class TestBulk(unittest.TestCase):
+    """Test cases for run_bulk"""
+
+    def setUp(self):
+        """Fit a small matcher and make a scratch directory"""
+        self.matcher = DocumentMatcher()
+        self.matcher.fit_corpus(
+            [
+                "This is a document about machine learning and AI",
+                "Python programming is great for data science",
+                "Machine learning models need training data",
+                "The weather today is sunny and warm"
+            ],
+            ["doc1", "doc2", "doc3", "doc4"]
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_jsonl_queries_to_jsonl(self):
+        """Every query gets one output line matching find_matches(), per-line overrides apply"""
+        queries = os.path.join(self.tmp.name, "queries.jsonl")
+        with open(queries, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"id": "q1", "text": "machine learning"}) + "\n")
+            f.write(json.dumps({"id": "q2", "text": "sunny weather", "top_k": 1}) + "\n")
+            f.write(json.dumps({"text": "python data", "percentile": 0}) + "\n")
+        output = os.path.join(self.tmp.name, "results.jsonl")
+
+        summary = run_bulk(self.matcher, queries, output, percentile=50, batch_size=2)
+
+        self.assertEqual(summary["queries"], 3)
+        with open(output, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["query_id"] for line in lines], ["q1", "q2", "3"])
+
+        expected = [
+            self.matcher.find_matches("machine learning", 50),
+            self.matcher.find_matches("sunny weather", 50, top_k=1),
+            self.matcher.find_matches("python data", 0),
+        ]
+        for line, results in zip(lines, expected):
+            self.assertEqual([tuple(match) for match in line["matches"]], results.to_list())
+        self.assertEqual(summary["matches"], sum(len(results) for results in expected))
+
+    def test_invalid_overrides(self):
+        """A bad per-line percentile/top_k is reported with its line number"""
+        queries = os.path.join(self.tmp.name, "queries.jsonl")
+        output = os.path.join(self.tmp.name, "results.jsonl")
+        for override in ({"top_k": 0}, {"top_k": "3"}, {"percentile": "abc"}, {"percentile": 150}):
+            with open(queries, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"text": "machine learning"}) + "\n")
+                f.write(json.dumps(dict({"text": "sunny weather"}, **override)) + "\n")
+            with self.assertRaisesRegex(ValueError, ":2: '(top_k|percentile)'"):
+                run_bulk(self.matcher, queries, output, percentile=50)
+
+        with self.assertRaises(ValueError):
+            run_bulk(self.matcher, queries, output, percentile=50, top_k=0)
+
+    def test_text_directory_to_csv(self):
+        """A directory of .txt files, one CSV row per match"""
+        for name, text in [("a.txt", "machine learning"), ("b.txt", "sunny weather"), ("skip.md", "x")]:
+            with open(os.path.join(self.tmp.name, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        output = os.path.join(self.tmp.name, "results.csv")
+
+        summary = run_bulk(self.matcher, self.tmp.name, output, percentile=50, top_k=1)
+
+        self.assertEqual(summary["queries"], 2)
+        with open(output, encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["query_id", "rank", "doc_id", "similarity"])
+        expected = [
+            (query_id, doc_id)
+            for query_id, text in [("a.txt", "machine learning"), ("b.txt", "sunny weather")]
+            for doc_id in self.matcher.find_matches(text, 50, top_k=1).doc_id_list()
+        ]
+        self.assertEqual([(row[0], row[2]) for row in rows[1:]], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Unit tests for the distributed (coordinator + shard nodes) mode
+"""
+
+import unittest
+
+import numpy as np
+
+from src.distributed import Coordinator, LocalCluster
+from src.document_matcher import DocumentMatcher
+
+
+class TestDistributed(unittest.TestCase):
+    """Test cases for global IDF and exact thresholds across node processes"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Three local node processes shared by every test"""
+        cls.cluster = LocalCluster(3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cluster.close()
+
+    def setUp(self):
+        """Corpus split over the nodes, and a single matcher over all of it"""
+        self.test_corpus = [
+            "Oil prices rose sharply on Monday after OPEC cut output",
+            "Python programming is great for data science",
+            "Machine learning models need training data",
+            "The weather today is sunny and warm",
+            "Crude oil futures fell as OPEC output rose",
+            "Data science and machine learning with Python",
+            "Wheat and corn prices rose on the weather forecast",
+            "Sunny weather helps the corn harvest",
+        ]
+        self.test_doc_ids = [f"doc{i}" for i in range(len(self.test_corpus))]
+        self.coordinator = Coordinator(self.cluster.addresses, self.cluster.authkey)
+        self.coordinator.load(self.test_corpus, self.test_doc_ids)
+        self.coordinator.fit()
+
+    def tearDown(self):
+        self.coordinator.close()
+
+    def test_global_idf(self):
+        """Vocabulary and IDF are those of fitting the whole corpus in one process"""
+        single = DocumentMatcher()
+        single.fit_corpus(self.test_corpus, self.test_doc_ids)
+        self.assertEqual(self.coordinator.terms, single.vectorizer.get_feature_names_out().tolist())
+        np.testing.assert_array_equal(self.coordinator.idf, single.vectorizer.idf_)
+        self.assertEqual(self.coordinator.doc_ids, self.test_doc_ids)
+
+    def test_vocabulary_profile(self):
+        """Vocabulary cuts are made on the global counts, as in a single fit"""
+        self.coordinator.load(self.test_corpus, self.test_doc_ids, vocabulary="min-df-2")
+        self.coordinator.fit()
+        single = DocumentMatcher(vocabulary="min-df-2")
+        single.fit_corpus(self.test_corpus, self.test_doc_ids)
+        self.assertEqual(self.coordinator.terms, single.vectorizer.get_feature_names_out().tolist())
+        np.testing.assert_array_equal(self.coordinator.idf, single.vectorizer.idf_)
+
+    def test_matches_equal_single_matcher(self):
+        """Thresholds and results are exactly those of one matcher holding every row"""
+        reference = DocumentMatcher()
+        reference.fit_corpus_with_idf(
+            self.test_corpus, self.test_doc_ids, self.coordinator.terms, self.coordinator.idf
+        )
+        for query in ("oil prices OPEC", "machine learning data", "sunny weather corn"):
+            for percentile in (0, 50, 80, 100):
+                for top_k in (None, 2):
+                    expected = reference.find_matches(query, percentile, top_k)
+                    results = self.coordinator.find_matches(query, percentile, top_k)
+                    self.assertEqual(results.threshold, expected.threshold)
+                    self.assertEqual(results.to_list(), expected.to_list())
+
+        self.assertEqual(len(self.coordinator.find_matches("zzz qqq", 50)), 0)
+
+    def test_sketched_thresholds(self):
+        """Nodes' merged sketches give the exact threshold while they hold every score"""
+        queries = [(query, p) for query in ("oil prices OPEC", "sunny weather corn") for p in (0, 50, 80)]
+        expected = [self.coordinator.find_matches(query, percentile) for query, percentile in queries]
+        self.coordinator.threshold_error = 0.01
+        for (query, percentile), exact in zip(queries, expected):
+            results = self.coordinator.find_matches(query, percentile)
+            self.assertEqual(results.threshold, exact.threshold)
+            self.assertEqual(results.to_list(), exact.to_list())
+
+    def test_node_errors(self):
+        """A failing request is reported by the coordinator, the node keeps serving"""
+        with self.assertRaises(RuntimeError):
+            self.coordinator._call_all("select", query_id=-1, threshold=0.5, top_k=None)
+        self.assertTrue(len(self.coordinator.find_matches("oil prices", 50)) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
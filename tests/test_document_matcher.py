@@ -4,8 +4,24 @@ Unit tests for DocumentMatcher
 Basic tests
 """
 
+import os
+import tempfile
 import unittest
+
+import numpy as np
+from scipy import sparse
+
 from src.document_matcher import DocumentMatcher
+from src.quantized import measure_drift
+
+
+def memory_mapped(array: np.ndarray) -> bool:
+    """Whether an array is (a view of) a memory-mapped file"""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
 
 
 class TestDocumentMatcher(unittest.TestCase):
@@ -32,6 +48,23 @@ class TestDocumentMatcher(unittest.TestCase):
         self.assertIsNotNone(self.matcher.corpus_vectors)
         self.assertEqual(len(self.matcher.corpus), 4)
 
+    def test_fit_corpus_streaming(self):
+        """Test that the chunked two-pass fit builds the same index as fit_corpus"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        items = list(zip(self.test_doc_ids, self.test_corpus))
+        streamed = DocumentMatcher()
+        # chunks of 3, so the last chunk is a partial one
+        streamed.fit_corpus_streaming(lambda: (items[i:i + 3] for i in range(0, len(items), 3)))
+
+        self.assertIsNone(streamed.corpus)
+        self.assertEqual(streamed.doc_ids, self.test_doc_ids)
+        self.assertEqual(streamed.fingerprint, self.matcher.fingerprint)
+        self.assertEqual(streamed.vectorizer.vocabulary_, self.matcher.vectorizer.vocabulary_)
+        np.testing.assert_allclose(
+            streamed.corpus_vectors.toarray(), self.matcher.corpus_vectors.toarray(), rtol=1e-12
+        )
+
     def test_find_similar_documents(self):
         """Test finding similar documents"""
         self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
@@ -64,6 +97,332 @@ class TestDocumentMatcher(unittest.TestCase):
         # 90th percentile should give us fewer or equal results than 50th
         self.assertGreaterEqual(len(results_50), len(results_90))
 
+    def test_find_matches_top_k(self):
+        """Test the array-backed results and the top_k cap"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        query = "Machine learning and artificial intelligence"
+        full = self.matcher.find_matches(query, percentile=0)
+        capped = self.matcher.find_matches(query, percentile=0, top_k=2)
+
+        self.assertEqual(len(full), 4)
+        self.assertEqual(full.scores.dtype, np.float32)
+        self.assertEqual(capped.doc_id_list(), full.doc_id_list()[:2])
+        # the list-of-tuples view is what find_similar_documents() returns
+        self.assertEqual(full.to_list(), self.matcher.find_similar_documents(query, percentile=0))
+
+    def test_invalid_query_options(self):
+        """Test that every engine rejects out-of-range percentiles and top_k the same way"""
+        query = "Machine learning and artificial intelligence"
+        matchers = [DocumentMatcher(engine=engine) for engine in DocumentMatcher.ENGINES]
+        matchers += [DocumentMatcher(cache_bytes=2 ** 20), DocumentMatcher(threshold_error=0.01)]
+        for matcher in matchers:
+            matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+            try:
+                for percentile, top_k in ((150, None), (-5, None), (50, 0), (50, -1), (50, 2.5)):
+                    with self.assertRaises(ValueError):
+                        matcher.find_matches(query, percentile, top_k)
+                    with self.assertRaises(ValueError):
+                        list(matcher.find_matches_batch([query], percentile, top_k))
+                    with self.assertRaises(ValueError):
+                        matcher.find_matches_by_id("doc1", percentile, top_k)
+            finally:
+                matcher.close()
+
+    def test_postings_engine_matches_matmul(self):
+        """Test that the inverted-index engine gives identical results"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        postings = DocumentMatcher(engine="postings")
+        postings.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        query = "Machine learning and artificial intelligence"
+        # 0 also returns the documents that share no term with the query
+        for percentile in (0, 50, 90, 100):
+            expected = self.matcher.find_matches(query, percentile)
+            actual = postings.find_matches(query, percentile)
+
+            self.assertEqual(actual.threshold, expected.threshold)
+            np.testing.assert_array_equal(actual.indices, expected.indices)
+            np.testing.assert_array_equal(actual.scores, expected.scores)
+
+        # only docs sharing a term ("machine", "learning", "and") were scored
+        self.assertEqual(actual.stats["candidates"], 3)
+
+    def test_maxscore_engine_matches_postings(self):
+        """Test that pruned top-k scoring gives identical results and skips documents"""
+        corpus = [f"oil prices {i} " + " ".join(["oil"] * (i % 4)) + f" filler{i % 7} corn" for i in range(60)]
+        doc_ids = [f"d{i}" for i in range(len(corpus))]
+        for storage in ("float64", "int8"):
+            postings = DocumentMatcher(engine="postings", storage=storage)
+            postings.fit_corpus(corpus, doc_ids)
+            maxscore = DocumentMatcher(engine="maxscore", storage=storage)
+            maxscore.fit_corpus(corpus, doc_ids)
+            for matcher in (postings, maxscore):
+                matcher.remove_documents(["d3", "d7"])
+
+            for query in ("oil filler2", "corn prices filler5", "oil"):
+                for percentile, top_k in ((0, None), (50, None), (95, None), (100, None), (0, 3), (90, 1)):
+                    expected = postings.find_matches(query, percentile, top_k)
+                    actual = maxscore.find_matches(query, percentile, top_k)
+                    self.assertEqual(actual.threshold, expected.threshold)
+                    np.testing.assert_array_equal(actual.indices, expected.indices)
+                    np.testing.assert_array_equal(actual.scores, expected.scores)
+
+            # the rare term decides the top few, the "oil" documents are never even looked at
+            results = maxscore.find_matches("oil filler2", 95)
+            self.assertLess(results.stats["fully_scored"], postings.find_matches("oil filler2", 95).stats["candidates"])
+
+    def test_compact_storage(self):
+        """Test float32/int8 storage: smaller, same ranking, engines agree"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        query = "Machine learning and artificial intelligence"
+        expected = self.matcher.find_matches(query, percentile=0)
+
+        for storage in ("float32", "int8"):
+            compact = DocumentMatcher(storage=storage)
+            compact.fit_corpus(self.test_corpus, self.test_doc_ids)
+            postings = DocumentMatcher(engine="postings", storage=storage)
+            postings.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+            footprint = compact.memory_footprint()
+            self.assertLess(footprint["total_bytes"], footprint["float64_bytes"])
+            drift = compact.ranking_drift()
+            self.assertEqual(drift["n_queries"], len(self.test_corpus))
+            self.assertGreaterEqual(drift["overlap_at_k"], 0.0)
+            self.assertLessEqual(drift["overlap_at_k"], 1.0)
+
+            results = compact.find_matches(query, percentile=0)
+            self.assertEqual(results.doc_id_list(), expected.doc_id_list())
+            np.testing.assert_allclose(results.scores, expected.scores, atol=0.01)
+            np.testing.assert_array_equal(postings.find_matches(query, percentile=0).scores, results.scores)
+
+    def test_int8_rounded_out_weights(self):
+        """Test that weights rounding to int8 zero aren't stored, so every engine still agrees"""
+        # one dominant term: the row's other weights are under half a quantization step
+        # and it comes last, after the rows its zeros would jump ahead of
+        corpus = ["market news today", "price of wheat", "sunny weather", "python programming",
+                  "corn harvest", "oil " * 1000 + "price market"]
+        doc_ids = [f"doc{i}" for i in range(len(corpus))]
+        # (the sharded engine only takes float storage)
+        engines = [engine for engine in DocumentMatcher.ENGINES if engine != "sharded"]
+        matchers = [DocumentMatcher(engine=engine, storage="int8") for engine in engines]
+        for matcher in matchers:
+            matcher.fit_corpus(corpus, doc_ids)
+        try:
+            self.assertNotIn(0, matchers[0].corpus_vectors.data)
+            for query in ("price market", "oil price", "wheat"):
+                for percentile, top_k in ((0, None), (0, 5), (50, None)):
+                    expected = matchers[0].find_matches(query, percentile, top_k)
+                    for matcher in matchers[1:]:
+                        results = matcher.find_matches(query, percentile, top_k)
+                        self.assertEqual(results.doc_id_list(), expected.doc_id_list())
+                        np.testing.assert_array_equal(results.scores, expected.scores)
+        finally:
+            for matcher in matchers:
+                matcher.close()
+
+    def test_measure_drift(self):
+        """Test that drift leaves out each query's own row"""
+        reference = sparse.csr_matrix(np.array([[1.0, 0.0], [0.8, 0.6], [0.6, 0.8]]))
+        same = measure_drift(reference, reference, k=1)
+        self.assertEqual(same["overlap_at_k"], 1.0)
+        self.assertEqual(same["max_score_error"], 0.0)
+
+        # rows 1 and 2 swapped: only row 0's nearest other row moves
+        drift = measure_drift(reference, reference[[0, 2, 1]], k=1)
+        self.assertAlmostEqual(drift["overlap_at_k"], 2 / 3)
+        # scored a row at a time, the running top-k gives the same numbers
+        self.assertEqual(measure_drift(reference, reference[[0, 2, 1]], k=1, block_rows=1), drift)
+        self.assertIsNone(measure_drift(reference[:1], reference[:1]))
+
+    def test_approximate_top_k(self):
+        """Test that the ANN index re-ranks exactly and skips removed documents"""
+        approx = DocumentMatcher(ann=True)
+        approx.fit_corpus(self.test_corpus, self.test_doc_ids)
+        approx.build_ann_index(n_lists=2)
+
+        query = "Machine learning and artificial intelligence"
+        exact = approx.find_matches(query, percentile=0, top_k=2)
+        # probing every list is an exhaustive search
+        results = approx.find_matches_approx(query, top_k=2, n_probe=2)
+        np.testing.assert_array_equal(results.indices, exact.indices)
+        np.testing.assert_array_equal(results.scores, exact.scores)
+        self.assertEqual(results.stats["candidates"], 4)
+
+        approx.remove_documents([exact.doc_id(0)])
+        results = approx.find_matches_approx(query, top_k=4, n_probe=2)
+        self.assertNotIn(exact.doc_id(0), results.doc_id_list())
+
+    def test_sharded_engine_matches_serial(self):
+        """Test that scoring shards in worker processes gives identical results"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        sharded = DocumentMatcher(engine="sharded", n_workers=2)
+        sharded.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        try:
+            queries = ["Machine learning and artificial intelligence", "sunny weather"]
+            for query in queries:
+                expected = self.matcher.find_matches(query, percentile=0)
+                actual = sharded.find_matches(query, percentile=0)
+                np.testing.assert_array_equal(actual.indices, expected.indices)
+                np.testing.assert_array_equal(actual.scores, expected.scores)
+
+            batched = list(sharded.find_similar_documents_batch(queries, percentile=50))
+            self.assertEqual(batched, [self.matcher.find_similar_documents(q, 50) for q in queries])
+        finally:
+            sharded.close()
+
+    def test_batch_matches_single_queries(self):
+        """Test that the batched API gives the same results as one query at a time"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        queries = [
+            "Machine learning and artificial intelligence",
+            "sunny weather",
+            "completely unrelated vocabulary xyz",
+            "Python data science",
+        ]
+        # batch_size=3 so the last query lands in a second batch
+        batched = list(self.matcher.find_similar_documents_batch(queries, percentile=50, batch_size=3))
+
+        self.assertEqual(len(batched), len(queries))
+        for query, results in zip(queries, batched):
+            self.assertEqual(results, self.matcher.find_similar_documents(query, percentile=50))
+
+    def test_query_encoder_matches_transform(self):
+        """Test that the fast query encoder is bit-identical to TfidfVectorizer.transform()"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        queries = self.test_corpus + [
+            "",
+            "completely unrelated vocabulary xyz",
+            "DATA data Data, data; machine-learning (machine) learning!",
+            "Données: Python à Zürich",
+        ]
+
+        def check():
+            expected = self.matcher.vectorizer.transform(queries)
+            expected.sort_indices()
+            encoded = self.matcher._vectorize(queries)
+            self.assertIsNotNone(self.matcher._query_encoder())
+            np.testing.assert_array_equal(encoded.indptr, expected.indptr)
+            np.testing.assert_array_equal(encoded.indices, expected.indices)
+            self.assertEqual(encoded.data.tobytes(), expected.data.tobytes())
+
+        check()
+        # new vocabulary and IDF, the encoder has to follow
+        self.matcher.add_documents(["Données sur Python et les machines"], ["doc5"])
+        self.matcher.reweight_idf()
+        check()
+
+    def test_query_cache(self):
+        """Test that cached queries give the same results at every percentile"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        cached = DocumentMatcher(cache_bytes=1 << 20)
+        cached.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        query = "Machine learning and artificial intelligence"
+        for percentile in (0, 50, 70, 90, 100):
+            self.assertEqual(
+                cached.find_similar_documents(query, percentile),
+                self.matcher.find_similar_documents(query, percentile)
+            )
+
+        # scored once, every other percentile came from the cache
+        stats = cached.cache_stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 4))
+
+        # changing the corpus drops the cached entries
+        cached.remove_documents(["doc3"])
+        self.assertEqual(cached.cache_stats()["entries"], 0)
+        results = cached.find_similar_documents(query, percentile=0)
+        self.assertNotIn("doc3", [doc_id for doc_id, _ in results])
+
+    def test_query_cache_eviction(self):
+        """Test that the cache stays within its memory budget"""
+        cached = DocumentMatcher(cache_bytes=600)
+        cached.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        for query in ("machine learning", "python data", "sunny weather"):
+            cached.find_matches(query, percentile=50)
+
+        stats = cached.cache_stats()
+        self.assertLessEqual(stats["bytes"], 600)
+        self.assertGreater(stats["evictions"], 0)
+
+    def test_add_and_remove_documents(self):
+        """Test incremental updates against a fresh fit on the resulting corpus"""
+        self.matcher.fit_corpus(self.test_corpus[:2], self.test_doc_ids[:2])
+        self.matcher.add_documents(self.test_corpus[2:], self.test_doc_ids[2:])
+        self.matcher.add_documents(["Deep learning needs a lot of data"], ["doc5"])
+        self.matcher.remove_documents(["doc2"])
+
+        query = "Machine learning and artificial intelligence"
+        # the removed document is gone from the results right away
+        results = self.matcher.find_similar_documents(query, percentile=0)
+        self.assertEqual(sorted(doc_id for doc_id, _ in results), ["doc1", "doc3", "doc4", "doc5"])
+
+        with self.assertRaises(ValueError):
+            self.matcher.add_documents(["duplicate"], ["doc1"])
+
+        # after compaction the index is equivalent to a refit
+        self.matcher.compact()
+        refit = DocumentMatcher()
+        refit.fit_corpus(
+            [self.test_corpus[0], *self.test_corpus[2:], "Deep learning needs a lot of data"],
+            ["doc1", "doc3", "doc4", "doc5"]
+        )
+        expected = refit.find_matches(query, percentile=0)
+        actual = self.matcher.find_matches(query, percentile=0)
+        self.assertEqual(actual.doc_id_list(), expected.doc_id_list())
+        np.testing.assert_allclose(actual.scores, expected.scores, rtol=1e-6)
+
+    def test_save_and_load_index(self):
+        """Test that a saved index gives the same results as the fitted matcher"""
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = os.path.join(tmp, "index")
+            self.matcher.save_index(index_dir)
+
+            loaded = DocumentMatcher()
+            loaded.load_index(index_dir)
+
+            self.assertEqual(loaded.doc_ids, self.test_doc_ids)
+            self.assertEqual(loaded.corpus_vectors.shape, self.matcher.corpus_vectors.shape)
+
+            query = "Machine learning and artificial intelligence"
+            self.assertEqual(
+                loaded.find_similar_documents(query, percentile=0),
+                self.matcher.find_similar_documents(query, percentile=0)
+            )
+
+            # saving over the directory it's mapped from (like main.py --neighbors does)
+            self.assertTrue(memory_mapped(loaded.corpus_vectors.data))
+            loaded.build_neighbor_graph(k=2)
+            loaded.save_index(index_dir)
+            self.assertFalse(memory_mapped(loaded.corpus_vectors.data))
+            self.assertFalse(memory_mapped(loaded.vectorizer.idf_))
+            self.assertEqual(
+                loaded.find_similar_documents(query, percentile=0),
+                self.matcher.find_similar_documents(query, percentile=0)
+            )
+            reloaded = DocumentMatcher()
+            reloaded.load_index(index_dir)
+            self.assertEqual(reloaded.neighbor_graph_k(), 2)
+
+    def test_fit_or_load_detects_stale_index(self):
+        """Test that a changed corpus invalidates the saved index"""
+        with tempfile.TemporaryDirectory() as tmp:
+            index_dir = os.path.join(tmp, "index")
+
+            # first run fits, second run with the same corpus loads
+            self.assertFalse(self.matcher.fit_or_load(self.test_corpus, self.test_doc_ids, index_dir))
+            self.assertTrue(DocumentMatcher().fit_or_load(self.test_corpus, self.test_doc_ids, index_dir))
+
+            # editing one document changes the fingerprint, so it refits
+            changed = self.test_corpus[:3] + ["The weather today is cold"]
+            self.assertFalse(DocumentMatcher().fit_or_load(changed, self.test_doc_ids, index_dir))
+
 
 if __name__ == '__main__':
     unittest.main()
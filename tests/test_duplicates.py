@@ -0,0 +1,61 @@
+"""
+Unit tests for blocked all-pairs near-duplicate detection
+"""
+
+import unittest
+
+import numpy as np
+
+from src.document_matcher import DocumentMatcher
+from src.duplicates import iter_duplicate_clusters, iter_duplicate_pairs
+
+
+class TestDuplicates(unittest.TestCase):
+    """Test cases for duplicate pairs and clusters"""
+
+    def setUp(self):
+        """Corpus with two groups of near-identical stories"""
+        self.test_corpus = [
+            "Oil prices rose sharply on Monday after OPEC cut output",
+            "Python programming is great for data science",
+            "Oil prices rose sharply on Monday after OPEC cut production",
+            "The weather today is sunny and warm",
+            "Machine learning models need training data",
+            "The weather today is sunny and very warm",
+            "Oil prices rose on Monday after OPEC cut output",
+        ]
+        self.test_doc_ids = [f"doc{i}" for i in range(len(self.test_corpus))]
+        self.matcher = DocumentMatcher()
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+    def test_pairs_match_full_product(self):
+        """Blocked pairs equal the thresholded upper triangle of X @ X.T, for any block size"""
+        matrix = self.matcher.corpus_vectors
+        full = (matrix @ matrix.T).toarray()
+        i, j = np.nonzero(np.triu(full >= 0.6, k=1))
+        expected = list(zip(i.tolist(), j.tolist(), full[i, j].tolist()))
+        self.assertTrue(expected)
+
+        for block_size in (1, 2, 3, 100):
+            self.assertEqual(list(iter_duplicate_pairs(matrix, 0.6, block_size)), expected)
+        self.assertEqual(list(iter_duplicate_pairs(matrix, 0.6, 2, n_workers=2)), expected)
+
+    def test_clusters(self):
+        """Pairs are grouped into connected components, removed documents are left out"""
+        clusters = list(self.matcher.find_duplicate_clusters(0.6, block_size=2))
+        self.assertEqual(sorted(clusters), [["doc0", "doc2", "doc6"], ["doc3", "doc5"]])
+
+        # a chain 0-1, 1-2 is one cluster even though 0 and 2 never pair directly
+        chain = [(0, 1, 1.0), (1, 2, 1.0), (4, 5, 1.0)]
+        self.assertEqual(list(iter_duplicate_clusters(iter(chain))), [[0, 1, 2], [4, 5]])
+        # two clusters joined late: rows come out sorted, once the highest row is passed
+        joined = [(0, 7, 1.0), (1, 3, 1.0), (3, 5, 1.0), (5, 7, 1.0), (8, 9, 1.0)]
+        self.assertEqual(list(iter_duplicate_clusters(iter(joined))), [[0, 1, 3, 5, 7], [8, 9]])
+
+        self.matcher.remove_documents(["doc2"])
+        pairs = list(self.matcher.find_duplicates(0.6))
+        self.assertFalse(any("doc2" in pair[:2] for pair in pairs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests for the instrumentation layer
+"""
+
+import json
+import logging
+import unittest
+
+from src.document_matcher import DocumentMatcher
+from src.instrumentation import NULL_RECORDER, MetricsRecorder
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test cases for MetricsRecorder and the matcher's use of it"""
+
+    def setUp(self):
+        """Small corpus"""
+        self.test_corpus = [
+            "This is a document about machine learning and AI",
+            "Python programming is great for data science",
+            "Machine learning models need training data",
+            "The weather today is sunny and warm"
+        ]
+        self.test_doc_ids = ["doc1", "doc2", "doc3", "doc4"]
+
+    def test_matcher_records_stages(self):
+        """Timers, sizes and cache counters are recorded, and results are unchanged"""
+        recorder = MetricsRecorder()
+        matcher = DocumentMatcher(engine="postings", cache_bytes=1 << 20, recorder=recorder)
+        matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        reference = DocumentMatcher()
+        reference.fit_corpus(self.test_corpus, self.test_doc_ids)
+        self.assertIs(reference.recorder, NULL_RECORDER)
+
+        query = "machine learning data"
+        self.assertEqual(matcher.find_similar_documents(query, 50), reference.find_similar_documents(query, 50))
+        matcher.find_similar_documents(query, 90)
+        matcher.find_similar_documents("zzz qqq", 50)
+        list(matcher.find_matches_batch([query, "sunny weather"], 50))
+
+        snapshot = recorder.snapshot()
+        self.assertEqual(set(snapshot["timers"]), {"fit", "vectorize", "score", "threshold", "select"})
+        self.assertEqual(snapshot["timers"]["fit"]["count"], 1)
+        self.assertEqual(snapshot["counters"]["queries"], 5)
+        self.assertEqual(snapshot["counters"]["empty_queries"], 1)
+        self.assertEqual(snapshot["counters"]["cache_hits"], 1)
+        self.assertEqual(snapshot["counters"]["cache_misses"], 1)
+        self.assertEqual(snapshot["values"]["query_nnz"]["count"], 5)
+        self.assertEqual(snapshot["values"]["query_nnz"]["max"], 3)
+        # the batch goes through the postings engine directly, the cached queries don't
+        self.assertEqual(snapshot["values"]["postings_touched"]["count"], 2)
+        self.assertEqual(snapshot["values"]["result_size"]["count"], 4)
+
+    def test_events_and_exports(self):
+        """Events are logged as JSON, snapshots export as JSON and Prometheus text"""
+        recorder = MetricsRecorder(logger=logging.getLogger("nlp.events.test"))
+        matcher = DocumentMatcher(recorder=recorder)
+        with self.assertLogs("nlp.events.test", level="INFO") as logs:
+            matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+            results = matcher.find_matches("machine learning", 50)
+
+        events = [json.loads(line.split(":", 2)[2]) for line in logs.output]
+        self.assertEqual([event["event"] for event in events], ["fit", "query"])
+        self.assertEqual(events[0]["documents"], 4)
+        self.assertEqual(events[1]["matches"], len(results))
+
+        self.assertEqual(json.loads(recorder.to_json()), recorder.snapshot())
+        prometheus = recorder.to_prometheus()
+        self.assertIn('nlp_stage_seconds_count{stage="score"} 1', prometheus)
+        self.assertIn("nlp_queries_total 1", prometheus)
+        self.assertIn("# TYPE nlp_result_size summary", prometheus)
+
+        recorder.reset()
+        self.assertEqual(recorder.snapshot(), NULL_RECORDER.snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
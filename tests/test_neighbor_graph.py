@@ -0,0 +1,96 @@
+"""
+Unit tests for query-by-document and the k-nearest-neighbor graph
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.document_matcher import DocumentMatcher
+from src.neighbor_graph import EMPTY, NeighborGraph
+
+
+class TestNeighborGraph(unittest.TestCase):
+    """Test cases for find_matches_by_id(), find_neighbors() and graph updates"""
+
+    def setUp(self):
+        """Small corpus, no reweighting on updates so the graph is patched in place"""
+        self.test_corpus = [
+            "Oil prices rose sharply on Monday after OPEC cut output",
+            "Python programming is great for data science",
+            "Oil prices rose sharply on Monday after OPEC cut production",
+            "The weather today is sunny and warm",
+            "Machine learning models need training data",
+            "The weather today is sunny and very warm",
+            "Oil prices rose on Monday after OPEC cut output",
+            "Data science and machine learning with Python",
+        ]
+        self.test_doc_ids = [f"doc{i}" for i in range(len(self.test_corpus))]
+        self.matcher = DocumentMatcher(idf_drift_threshold=float("inf"))
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+    def assertGraphEqual(self, graph, expected):
+        np.testing.assert_array_equal(graph.neighbors, expected.neighbors)
+        np.testing.assert_allclose(graph.scores, expected.scores, rtol=1e-6)
+
+    def test_matches_by_id(self):
+        """The stored row gives the same matches as the text, minus the document itself"""
+        by_text = self.matcher.find_matches(self.test_corpus[0], 50)
+        by_id = self.matcher.find_matches_by_id("doc0", 50)
+        self.assertEqual(by_id.doc_id_list(), [d for d in by_text.doc_id_list() if d != "doc0"])
+        np.testing.assert_allclose(by_id.scores, by_text.scores[1:], rtol=1e-6)
+        self.assertEqual(self.matcher.find_matches_by_id("doc0", 0, top_k=2).doc_id_list(), ["doc6", "doc2"])
+        with self.assertRaises(ValueError):
+            self.matcher.find_matches_by_id("missing", 50)
+
+    def test_graph_lookup(self):
+        """Graph lookups equal exact top-k (similarity > 0), for any block size"""
+        for block_size in (1, 3, 100):
+            self.matcher.build_neighbor_graph(k=3, block_size=block_size)
+            for doc_id in self.test_doc_ids:
+                exact = [match for match in self.matcher.find_matches_by_id(doc_id, 0, 3) if match[1] > 0]
+                neighbors = self.matcher.find_neighbors(doc_id).to_list()
+                self.assertEqual([d for d, _ in neighbors], [d for d, _ in exact])
+                np.testing.assert_allclose([s for _, s in neighbors], [s for _, s in exact], rtol=1e-6)
+
+        self.assertEqual(self.matcher.find_neighbors("doc0", top_k=1).doc_id_list(), ["doc6"])
+        with self.assertRaises(ValueError):
+            self.matcher.find_neighbors("doc0", top_k=4)
+
+    def test_incremental_updates(self):
+        """Adding and removing documents patches the graph to what a rebuild gives"""
+        self.matcher.build_neighbor_graph(k=2, block_size=3)
+        self.matcher.add_documents(["Oil prices fell on Monday", "Sunny and warm weather"], ["new0", "new1"])
+        self.matcher.remove_documents(["doc2", "doc5"])
+        patched = self.matcher._graph
+
+        rebuilt = NeighborGraph.build(self.matcher.corpus_vectors, 2, 3, self.matcher._deleted)
+        self.assertGraphEqual(patched, rebuilt)
+        self.assertTrue((patched.neighbors[[2, 5]] == EMPTY).all())
+        self.assertNotIn("doc2", self.matcher.find_neighbors("doc0").doc_id_list())
+
+        # reweighting changes every vector: the graph is rebuilt on the next lookup
+        self.matcher.compact()
+        self.assertIsNone(self.matcher._graph)
+        self.assertEqual(self.matcher.find_neighbors("doc0").doc_id_list()[0], "doc6")
+
+    def test_saved_with_index(self):
+        """The graph is stored with the index and memory-mapped back"""
+        self.matcher.build_neighbor_graph(k=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index")
+            self.matcher.save_index(path)
+            loaded = DocumentMatcher(idf_drift_threshold=float("inf"))
+            loaded.load_index(path)
+            self.assertEqual(loaded.neighbor_graph_k(), 3)
+            self.assertGraphEqual(loaded._graph, self.matcher._graph)
+
+            # updates work on the read-only mapped arrays too
+            loaded.remove_documents(["doc2"])
+            self.assertNotIn("doc2", loaded.find_neighbors("doc0").doc_id_list())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Unit tests for the quantile sketch and sketched percentile thresholds
+"""
+
+import unittest
+
+import numpy as np
+
+from src.document_matcher import DocumentMatcher
+from src.quantile_sketch import QuantileSketch, sketched_matches
+
+
+def rank_error(sorted_values: np.ndarray, value: float, percentile: float) -> float:
+    """How far (as a fraction of n) value's rank is from the percentile's position"""
+    n = len(sorted_values)
+    position = (n - 1) * percentile / 100
+    lowest = np.searchsorted(sorted_values, value, side="left")
+    highest = np.searchsorted(sorted_values, value, side="right") - 1
+    return max(lowest - position, position - highest, 0) / n
+
+
+class TestQuantileSketch(unittest.TestCase):
+    """Test cases for src/quantile_sketch.py"""
+
+    def setUp(self):
+        """Mostly-zero scores, like a real similarity vector"""
+        rng = np.random.default_rng(0)
+        self.scores = rng.random(200_000) ** 3
+        self.scores[rng.random(200_000) < 0.7] = 0.0
+        self.percentiles = [0, 10, 50, 70, 75, 90, 99, 99.9, 100]
+
+    def test_exact_while_small(self):
+        """Test that a sketch that never compacted gives np.percentile's value"""
+        sketch = QuantileSketch(error=0.01)
+        values = self.scores[:300]
+        sketch.update(values[values > 0])
+        sketch.update_repeated(0.0, int(np.count_nonzero(values == 0)))
+        for p in self.percentiles:
+            self.assertEqual(sketch.percentile(p), np.percentile(values, p))
+
+    def test_error_bound_and_merge(self):
+        """Test the rank error of blockwise and merged sketches, and their size"""
+        error = 0.005
+        parts = [QuantileSketch(error, seed=seed) for seed in range(4)]
+        for i, start in enumerate(range(0, len(self.scores), 4096)):
+            block = self.scores[start:start + 4096]
+            non_zero = block[block > 0]
+            parts[i % 4].update(non_zero)
+            parts[i % 4].update_repeated(0.0, len(block) - len(non_zero))
+
+        merged = parts[0]
+        for part in parts[1:]:
+            merged.merge(part)
+        self.assertEqual(merged.n, len(self.scores))
+        self.assertLess(merged.n_retained, 4 * merged.k)
+
+        sorted_scores = np.sort(self.scores)
+        for p in self.percentiles:
+            self.assertLessEqual(rank_error(sorted_scores, merged.percentile(p), p), error)
+
+        with self.assertRaises(ValueError):
+            merged.merge(QuantileSketch(0.01))
+
+    def test_matcher_threshold_error(self):
+        """Test sketched matching against exact selection, in one and two passes"""
+        corpus = [
+            "Oil prices rose sharply on Monday after OPEC cut output",
+            "Python programming is great for data science",
+            "Machine learning models need training data",
+            "The weather today is sunny and warm",
+            "Crude oil futures fell as OPEC output rose",
+            "Data science and machine learning with Python",
+            "Wheat and corn prices rose on the weather forecast",
+            "Sunny weather helps the corn harvest",
+        ]
+        doc_ids = [f"doc{i}" for i in range(len(corpus))]
+        exact = DocumentMatcher()
+        exact.fit_corpus(corpus, doc_ids)
+        sketched = DocumentMatcher(threshold_error=0.01)
+        sketched.fit_corpus(corpus, doc_ids)
+
+        # a handful of documents never fills the sketch, so thresholds are exact
+        for query in ("oil prices OPEC", "machine learning data", "sunny weather corn"):
+            for percentile in (0, 50, 80, 100):
+                for top_k in (None, 2):
+                    expected = exact.find_matches(query, percentile, top_k)
+                    results = sketched.find_matches(query, percentile, top_k)
+                    self.assertEqual(results.threshold, expected.threshold)
+                    self.assertEqual(results.to_list(), expected.to_list())
+
+                    # tiny blocks and buffer: the matches need the second pass
+                    query_vector = exact.vectorizer.transform([query])
+                    indices, scores, threshold, stats = sketched_matches(
+                        exact.corpus_vectors, query_vector, percentile, top_k, block_rows=3, buffer_size=1
+                    )
+                    self.assertEqual(indices.tolist(), expected.indices.tolist())
+                    if len(expected) > 1:
+                        self.assertEqual(stats["passes"], 2)
+
+        sketched.remove_documents(["doc0"])
+        exact.remove_documents(["doc0"])
+        self.assertEqual(sketched.find_matches("oil", 50).to_list(), exact.find_matches("oil", 50).to_list())
+
+        with self.assertRaises(ValueError):
+            DocumentMatcher(threshold_error=0.01, cache_bytes=2 ** 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
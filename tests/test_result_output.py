@@ -0,0 +1,93 @@
+"""
+Unit tests for paginated result output
+"""
+
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.document_matcher import DocumentMatcher
+from src.result_output import iter_pages, output_format, print_page, write_results
+
+
+class TestResultOutput(unittest.TestCase):
+    """Test cases for pages, print_results() paging and the file formats"""
+
+    def setUp(self):
+        """Small corpus and a result with every document in it"""
+        self.test_corpus = [
+            "This is a document about machine learning and AI",
+            "Python programming is great for data science",
+            "Machine learning models need training data",
+            "The weather today is sunny and warm",
+            "Data science uses machine learning",
+        ]
+        self.test_doc_ids = [f"doc{i}" for i in range(len(self.test_corpus))]
+        self.matcher = DocumentMatcher()
+        self.matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+        self.results = self.matcher.find_matches("machine learning data", 0)
+        self.assertEqual(len(self.results), 5)
+
+    def test_pages(self):
+        """Pages are views of the result arrays and cover it in order"""
+        pages = list(iter_pages(self.results, 2))
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+        self.assertTrue(np.shares_memory(pages[1].scores, self.results.scores))
+        self.assertEqual(sum((p.to_list() for p in pages), []), self.results.to_list())
+        self.assertEqual(len(list(iter_pages(self.results, 2, limit=3))), 2)
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            shown = self.matcher.print_results(self.results, 0, page_size=2)
+            self.assertEqual(shown, 2)
+            self.assertEqual(print_page(self.results, shown, 2), 4)
+        listing = [line for line in out.getvalue().splitlines() if "| Similarity:" in line]
+        self.assertEqual([line.split(".")[0].strip() for line in listing], ["1", "2", "3", "4"])
+
+    def test_formats(self):
+        """text / jsonl / csv / npz hold the same matches, limited if asked"""
+        self.assertEqual(output_format("out.CSV"), "csv")
+        self.assertEqual(output_format("out.results"), "text")
+        # bulk.py's restricted set: its own default, and no text/npz
+        self.assertEqual(output_format("out.txt", formats=("jsonl", "csv"), default="jsonl"), "jsonl")
+        with self.assertRaises(ValueError):
+            output_format("out.npz", "npz", formats=("jsonl", "csv"), default="jsonl")
+        expected = self.results.to_list()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.jsonl")
+            self.assertEqual(write_results(self.results, path), 5)
+            with open(path, encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            self.assertEqual([(r["doc_id"], r["similarity"]) for r in rows], expected)
+            self.assertEqual([r["rank"] for r in rows], [1, 2, 3, 4, 5])
+
+            path = os.path.join(tmp, "out.csv")
+            self.assertEqual(write_results(self.results, path, limit=3, page_size=2), 3)
+            with open(path, encoding="utf-8", newline="") as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(rows[0], ["rank", "doc_id", "similarity"])
+            self.assertEqual([r[1] for r in rows[1:]], [doc_id for doc_id, _ in expected[:3]])
+
+            path = os.path.join(tmp, "out.npz")
+            write_results(self.results, path)
+            with np.load(path) as arrays:
+                self.assertEqual(arrays["doc_ids"].tolist(), [doc_id for doc_id, _ in expected])
+                np.testing.assert_array_equal(arrays["scores"], self.results.scores)
+                self.assertEqual(float(arrays["threshold"]), self.results.threshold)
+
+            path = os.path.join(tmp, "out.txt")
+            write_results(self.results, path, percentile=0, page_size=2)
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            self.assertIn("Total matching documents: 5", text)
+            self.assertEqual(text.count("| Similarity:"), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Unit tests for the selection helpers (percentile thresholds and ranking)
+"""
+
+import unittest
+
+import numpy as np
+
+from src.selection import percentile_support, percentile_threshold, percentile_thresholds, select_top
+
+
+class TestSelection(unittest.TestCase):
+    """Test cases for src/selection.py"""
+
+    def setUp(self):
+        """Random scores with plenty of zeros, like a real similarity vector"""
+        rng = np.random.default_rng(0)
+        self.scores = rng.random(1001)
+        self.scores[rng.random(1001) < 0.5] = 0.0
+        self.percentiles = [0, 0.5, 33.3, 50, 70, 90, 99.9, 100]
+
+    def test_threshold_matches_np_percentile(self):
+        """Test that selection gives exactly the np.percentile value"""
+        for p in self.percentiles:
+            self.assertEqual(percentile_threshold(self.scores, p), np.percentile(self.scores, p))
+
+    def test_threshold_with_implicit_zeros(self):
+        """Test that leaving the zeros out and only counting them gives the same threshold"""
+        non_zero = self.scores[self.scores > 0]
+        n_zeros = len(self.scores) - len(non_zero)
+        for p in self.percentiles:
+            self.assertEqual(
+                percentile_threshold(non_zero, p, n_implicit_zeros=n_zeros),
+                np.percentile(self.scores, p)
+            )
+
+    def test_row_wise_thresholds(self):
+        """Test the 2D version with one percentile per row"""
+        rows = np.stack([self.scores, self.scores[::-1], np.sqrt(self.scores)])
+        percentiles = [10, 50, 95]
+        expected = [np.percentile(row, p) for row, p in zip(rows, percentiles)]
+        np.testing.assert_array_equal(percentile_thresholds(rows, percentiles), expected)
+
+    def test_select_top_keeps_ties_in_document_order(self):
+        """Test ordering and the top_k cap when scores tie"""
+        scores = np.array([0.2, 0.5, 0.2, 0.9, 0.2, 0.0])
+
+        indices, kept = select_top(scores, threshold=0.2)
+        self.assertEqual(indices.tolist(), [3, 1, 0, 2, 4])
+        self.assertEqual(kept.tolist(), [0.9, 0.5, 0.2, 0.2, 0.2])
+
+        indices, _ = select_top(scores, threshold=0.0, top_k=3)
+        self.assertEqual(indices.tolist(), [3, 1, 0])
+
+    def test_percentile_support(self):
+        """The percentile only depends on the top percentile_support() values"""
+        for percentile in (0, 12.5, 50, 90, 99.9, 100):
+            top = percentile_support(len(self.scores), percentile)
+            kept = np.sort(self.scores)[-top:]
+            # everything below the top is replaced by the smallest kept value
+            padded = np.concatenate((np.full(len(self.scores) - top, kept[0]), kept))
+            self.assertEqual(np.percentile(padded, percentile), np.percentile(self.scores, percentile))
+        self.assertEqual(percentile_support(0, 50), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
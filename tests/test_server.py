@@ -0,0 +1,105 @@
+"""
+Unit tests for the asyncio query server
+
+Starts the server on a free local port and talks to it with the bundled client
+"""
+
+import asyncio
+import unittest
+
+from src.document_matcher import DocumentMatcher
+from src.server import QueryServer, request_json
+
+
+class TestQueryServer(unittest.TestCase):
+    """Test cases for QueryServer"""
+
+    def setUp(self):
+        """Fit a small matcher"""
+        self.matcher = DocumentMatcher()
+        self.matcher.fit_corpus(
+            [
+                "This is a document about machine learning and AI",
+                "Python programming is great for data science",
+                "Machine learning models need training data",
+                "The weather today is sunny and warm"
+            ],
+            ["doc1", "doc2", "doc3", "doc4"]
+        )
+
+    def run_with_server(self, scenario):
+        """Run scenario(server, port) against a server on a free port"""
+        async def run():
+            server = QueryServer(self.matcher, batch_window=0.05)
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                return await scenario(server, port)
+            finally:
+                await server.close()
+        return asyncio.run(run())
+
+    def test_query_matches_direct_call(self):
+        """Concurrent queries are batched and answer the same as find_matches()"""
+        queries = [
+            {"text": "machine learning", "percentile": 50},
+            {"text": "sunny weather", "percentile": 0, "top_k": 2},
+            {"text": "python data", "percentile": 75},
+        ]
+
+        async def scenario(server, port):
+            responses = await asyncio.gather(*[
+                request_json("POST", "/query", query, port=port) for query in queries
+            ])
+            return responses, server.batches_run
+
+        responses, batches_run = self.run_with_server(scenario)
+
+        # all three arrived inside one batch window
+        self.assertEqual(batches_run, 1)
+        for query, (status, body) in zip(queries, responses):
+            self.assertEqual(status, 200)
+            expected = self.matcher.find_matches(query["text"], query["percentile"], query.get("top_k"))
+            self.assertEqual(body["count"], len(expected))
+            self.assertEqual([tuple(match) for match in body["matches"]], expected.to_list())
+
+    def test_health_and_errors(self):
+        """Health check, bad requests and unknown paths"""
+        async def scenario(server, port):
+            return [
+                await request_json("GET", "/health", port=port),
+                await request_json("POST", "/query", {"percentile": 50}, port=port),
+                await request_json("POST", "/query", {"text": "x", "percentile": 150}, port=port),
+                await request_json("POST", "/query", {"text": "x", "top_k": True}, port=port),
+                await request_json("GET", "/nope", port=port),
+                await request_json("GET", "/metrics", port=port),
+            ]
+
+        health, missing_text, bad_percentile, bad_top_k, unknown, metrics = self.run_with_server(scenario)
+        self.assertEqual(health, (200, {"status": "ok", "documents": 4}))
+        self.assertEqual(missing_text[0], 400)
+        self.assertEqual(bad_percentile[0], 400)
+        self.assertEqual(bad_top_k[0], 400)
+        self.assertEqual(unknown[0], 404)
+        self.assertEqual(metrics[0], 200)
+        self.assertEqual(metrics[1]["server"], {"batches": 0, "queries": 0})
+
+    def test_failed_query_in_batch(self):
+        """A query that fails inside a batch doesn't fail the others batched with it"""
+        async def scenario(server, port):
+            # submit() skips the request validation, so the batch call itself raises
+            return await asyncio.gather(
+                request_json("POST", "/query", {"text": "machine learning", "percentile": 50}, port=port),
+                server.submit("python data", 50, True),
+                return_exceptions=True
+            )
+
+        (status, body), failed = self.run_with_server(scenario)
+        self.assertEqual(status, 200)
+        self.assertEqual([tuple(match) for match in body["matches"]],
+                         self.matcher.find_matches("machine learning", 50).to_list())
+        self.assertIsInstance(failed, ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for cold start: lazy imports, the corpus probe, the startup report,
+the background warm-up
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from src.corpus_loader import nltk_data_dirs, reuters_available
+from src.instrumentation import StartupTimeline
+from src.main import Warmup
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_heavy_modules(code: str, env: dict = None) -> list:
+    """Run code in a fresh interpreter and return which heavy libraries it imported"""
+    script = code + "\nimport sys\nprint(','.join(m for m in ('nltk', 'sklearn') if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        env=dict(os.environ, **(env or {}))
+    ).stdout.strip()
+    return [name for name in output.split(",") if name]
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for the cold start path"""
+
+    def test_imports_are_lazy(self):
+        """Importing the entry point pulls in neither NLTK nor sklearn"""
+        self.assertEqual(imported_heavy_modules("import sys; sys.path.insert(0, 'src'); import main"), [])
+
+    def test_corpus_probe(self):
+        """The probe finds a downloaded corpus on NLTK's search path without importing NLTK"""
+        with tempfile.TemporaryDirectory() as data_dir:
+            with mock.patch.dict(os.environ, {"NLTK_DATA": data_dir}):
+                self.assertEqual(nltk_data_dirs()[0], data_dir)
+                os.makedirs(os.path.join(data_dir, "corpora"))
+                with open(os.path.join(data_dir, "corpora", "reuters.zip"), "wb"):
+                    pass
+                self.assertTrue(reuters_available())
+
+            code = "from src.corpus_loader import CorpusLoader\nCorpusLoader().download_reuters()"
+            self.assertEqual(imported_heavy_modules(code, {"NLTK_DATA": data_dir}), [])
+
+    def test_timeline_report(self):
+        """Phases add up to the total"""
+        timeline = StartupTimeline(start=10.0)
+        timeline.mark("imports", now=10.5)
+        timeline.mark("load index", now=12.0)
+        self.assertEqual(timeline.phases, [("imports", 0.5), ("load index", 1.5)])
+        self.assertEqual(timeline.total(), 2.0)
+        report = timeline.report().splitlines()
+        self.assertEqual(len(report), 4)
+        self.assertIn("75.0%", report[2])
+
+    def test_warmup(self):
+        """Setup runs in the background, result() waits for it and re-raises its errors"""
+        release = threading.Event()
+
+        def slow_build(value, offset=0):
+            release.wait(5)
+            return value + offset
+
+        warmup = Warmup(slow_build, 40, offset=2)
+        self.assertFalse(warmup.ready())
+        release.set()
+        self.assertEqual(warmup.result(), 42)
+        self.assertTrue(warmup.ready())
+
+        def failing_build():
+            raise SystemExit("corpus missing")
+
+        with self.assertRaises(SystemExit):
+            Warmup(failing_build).result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Unit tests for the packed text store
+"""
+
+import os
+import tempfile
+import unittest
+
+from src.corpus_loader import STORE_SOURCE, CorpusLoader
+from src.document_matcher import DocumentMatcher
+from src.text_store import PackedTextStore, build_text_store
+
+
+class TestTextStore(unittest.TestCase):
+    """Test cases for PackedTextStore and the loader using it"""
+
+    def setUp(self):
+        """Write a small store"""
+        self.documents = [
+            ("doc1", "This is a document about machine learning and AI"),
+            ("doc2", ""),
+            ("doc3", "Prix du pétrole: hausse de 3% à Zürich"),
+            ("doc4", "The weather today is sunny and warm"),
+        ]
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "texts")
+        build_text_store(self.path, iter(self.documents), source=STORE_SOURCE)
+
+    def test_random_access(self):
+        """Positional, by-ID, sliced and sequential access all give the original texts"""
+        store = PackedTextStore(self.path)
+        self.addCleanup(store.close)
+        texts = [text for _, text in self.documents]
+
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.doc_ids, ["doc1", "doc2", "doc3", "doc4"])
+        self.assertEqual(store[2], texts[2])
+        self.assertEqual(store[-1], texts[-1])
+        self.assertEqual(store[1:3], texts[1:3])
+        self.assertEqual(list(store), texts)
+        self.assertEqual(store.get("doc3"), texts[2])
+        self.assertEqual([pair for chunk in store.iter_chunks(3) for pair in chunk], self.documents)
+        with self.assertRaises(IndexError):
+            store[4]
+        with self.assertRaises(KeyError):
+            store.get("missing")
+
+    def test_loader_uses_store(self):
+        """With an existing store the loader never touches NLTK, and the matcher fits from it"""
+        loader = CorpusLoader(store_path=self.path)
+        corpus, doc_ids = loader.load_corpus()
+        self.addCleanup(loader.store.close)
+
+        self.assertIsInstance(corpus, PackedTextStore)
+        self.assertEqual(loader.get_document_by_id("doc4"), self.documents[3][1])
+
+        matcher = DocumentMatcher()
+        matcher.fit_corpus(corpus, doc_ids)
+        reference = DocumentMatcher()
+        reference.fit_corpus([text for _, text in self.documents], [doc_id for doc_id, _ in self.documents])
+        self.assertEqual(matcher.fingerprint, reference.fingerprint)
+        self.assertEqual(
+            matcher.find_similar_documents("sunny weather", 50),
+            reference.find_similar_documents("sunny weather", 50)
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
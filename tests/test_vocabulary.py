@@ -0,0 +1,86 @@
+"""
+Unit tests for vocabulary profiles
+"""
+
+import unittest
+
+import numpy as np
+
+from src.document_matcher import DocumentMatcher
+from src.query_encoder import QueryEncoder
+from src.vocabulary import HashingAnalyzer, format_vocabulary_report, vocabulary_report
+
+
+class TestVocabulary(unittest.TestCase):
+    """Test cases for pruned / hashed vocabularies and the profile report"""
+
+    def setUp(self):
+        """Corpus with common, rare and one-off terms"""
+        self.test_corpus = [
+            "Oil prices rose sharply after OPEC cut output 1987",
+            "Crude oil futures fell as OPEC output rose",
+            "Wheat and corn prices rose on the weather forecast",
+            "Sunny weather helps the corn harvest xq17",
+            "Oil and wheat exports from the region fell",
+            "The OPEC meeting on oil output ended early",
+        ]
+        self.test_doc_ids = [f"doc{i}" for i in range(len(self.test_corpus))]
+
+    def test_pruned_profiles(self):
+        """Cuts match TfidfVectorizer's, in fit_corpus() and the streaming fit alike"""
+        items = list(zip(self.test_doc_ids, self.test_corpus))
+        vocabularies = {}
+        for profile in ("min-df-2", "pruned", {"min_df": 2, "max_features": 5}):
+            matcher = DocumentMatcher(vocabulary=profile)
+            matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+            streamed = DocumentMatcher(vocabulary=profile)
+            streamed.fit_corpus_streaming(lambda: (items[i:i + 4] for i in range(0, len(items), 4)))
+
+            self.assertEqual(streamed.vectorizer.vocabulary_, matcher.vectorizer.vocabulary_)
+            np.testing.assert_array_equal(streamed.vectorizer.idf_, matcher.vectorizer.idf_)
+            self.assertNotIn("1987", matcher.vectorizer.vocabulary_)
+            self.assertTrue(QueryEncoder.supports(matcher.vectorizer))
+            vocabularies[str(profile)] = matcher.vectorizer.vocabulary_
+
+        self.assertEqual(len(vocabularies[str({"min_df": 2, "max_features": 5})]), 5)
+        # "the" is in 4 of 6 documents: cut by max_df=0.5, kept without it (no stop word list)
+        self.assertNotIn("the", vocabularies["pruned"])
+        self.assertIn("the", vocabularies["min-df-2"])
+
+        # a cut vocabulary stays as it is when documents are added
+        matcher.add_documents(["oil prices and brand new words"], ["new"])
+        self.assertEqual(matcher.corpus_vectors.shape[1], 5)
+
+    def test_hashed_profile(self):
+        """Hashing caps the width, is stable across instances and falls back to transform()"""
+        self.assertEqual(HashingAnalyzer(8)("Oil OPEC oil"), HashingAnalyzer(8)("oil opec OIL"))
+        matcher = DocumentMatcher(vocabulary={"hash_features": 8})
+        matcher.fit_corpus(self.test_corpus, self.test_doc_ids)
+
+        self.assertLessEqual(matcher.corpus_vectors.shape[1], 8)
+        self.assertFalse(QueryEncoder.supports(matcher.vectorizer))
+        self.assertIn("HashingAnalyzer(n_features=8)", str(matcher._vectorizer_settings()))
+
+        # with enough buckets for no collisions, the ranking is the full vocabulary's
+        wide = DocumentMatcher(vocabulary={"hash_features": 1024})
+        wide.fit_corpus(self.test_corpus, self.test_doc_ids)
+        full = DocumentMatcher()
+        full.fit_corpus(self.test_corpus, self.test_doc_ids)
+        query = "OPEC oil output"
+        self.assertEqual(wide.find_matches(query, 50).doc_id_list(), full.find_matches(query, 50).doc_id_list())
+
+    def test_report(self):
+        """One row per profile, the full vocabulary first with overlap 1"""
+        queries = ["oil output", "corn weather", "wheat prices"]
+        report = vocabulary_report(
+            self.test_corpus, self.test_doc_ids, queries, profiles=("min-df-2", {"max_features": 3}), k=2
+        )
+        self.assertEqual([row["profile"] for row in report][:2], ["full", "min-df-2"])
+        self.assertEqual(report[0]["overlap"], 1.0)
+        self.assertEqual(report[2]["n_terms"], 3)
+        self.assertLess(report[2]["nnz"], report[0]["nnz"])
+        self.assertEqual(len(format_vocabulary_report(report, 2).splitlines()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()